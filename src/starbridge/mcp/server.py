@@ -10,6 +10,8 @@ import base64
 import json
 import os
 import signal
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
 from io import BytesIO
 from typing import Any
 from urllib.parse import ParseResult, urlparse
@@ -82,6 +84,14 @@ class MCPServer:  # noqa: PLR0904
 
         return AggregatedHealth(dependencies=dependencies)
 
+    async def shutdown(self) -> None:
+        """Shut down all services, releasing resources such as connection pools."""
+        for service in self._services:
+            try:
+                await service.shutdown()
+            except Exception:
+                logger.exception("Failed to shut down service %s", service.__class__.__module__)
+
     def get_context(self) -> MCPContext:
         """
         Get a context object for the current request.
@@ -394,8 +404,16 @@ class MCPServer:  # noqa: PLR0904
             os.kill(os.getpid(), signal.SIGINT)
             os.kill(os.getpid(), signal.SIGINT)
 
+        @asynccontextmanager
+        async def lifespan(app: Starlette) -> AsyncGenerator[None, None]:  # noqa: ARG001
+            try:
+                yield
+            finally:
+                await self.shutdown()
+
         return Starlette(
             debug=debug,
+            lifespan=lifespan,
             routes=[
                 Route("/health", endpoint=handle_health, methods=["GET"]),
                 Route("/terminate", endpoint=handle_terminate, methods=["GET"]),
@@ -406,12 +424,15 @@ class MCPServer:  # noqa: PLR0904
 
     async def run_stdio(self) -> None:
         """Run MCP server over stdin/stdout."""
-        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-            await self._server.run(
-                read_stream,
-                write_stream,
-                self._create_initialization_options(),
-            )
+        try:
+            async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+                await self._server.run(
+                    read_stream,
+                    write_stream,
+                    self._create_initialization_options(),
+                )
+        finally:
+            await self.shutdown()
 
     @staticmethod
     def service_classes() -> list[type["MCPBaseService"]]:
@@ -451,7 +472,15 @@ class MCPServer:  # noqa: PLR0904
             list[types.TextContent | types.ImageContent | types.EmbeddedResource]: Tool execution results
 
         """
-        return asyncio.run(MCPServer().tool_call(name, arguments))
+
+        async def tool_call_and_shutdown() -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+            server = MCPServer()
+            try:
+                return await server.tool_call(name, arguments)
+            finally:
+                await server.shutdown()
+
+        return asyncio.run(tool_call_and_shutdown())
 
     @staticmethod
     def resources() -> list[types.Resource]:
@@ -65,6 +65,9 @@ class MCPBaseService(ABC):
     def health(self, context: MCPContext | None = None) -> Health:
         """Get health of this service. Override in subclass."""
 
+    async def shutdown(self) -> None:  # noqa: B027
+        """Release resources held by this service, e.g. connection pools. Override in subclass if needed."""
+
     def tool_list(self, context: MCPContext | None = None) -> list[types.Tool]:  # noqa: ARG002
         """
         Get available tools.
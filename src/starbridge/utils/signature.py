@@ -4,7 +4,8 @@ from __future__ import annotations as _annotations
 
 import re
 from inspect import Parameter, signature
-from typing import TYPE_CHECKING, Any, Literal, cast
+from types import NoneType, UnionType
+from typing import TYPE_CHECKING, Any, Literal, Union, cast, get_args, get_origin
 
 from griffe import Docstring, DocstringSectionKind
 from griffe import Object as GriffeObject
@@ -15,7 +16,7 @@ if TYPE_CHECKING:
 DocstringStyle = Literal["google", "numpy", "sphinx"]
 
 
-def description_and_params(  # noqa: C901
+def description_and_params(  # noqa: C901, PLR0912
     func: Callable[..., Any],
     excluded_params: tuple[str, ...] = ("self", "context"),
 ) -> tuple[str, list, dict[str, dict]]:
@@ -63,13 +64,19 @@ def description_and_params(  # noqa: C901
             continue
 
         param_type = "string"  # default type
-        if param.annotation != Parameter.empty:
-            if param.annotation is str:
+        annotation = param.annotation
+        if get_origin(annotation) in {Union, UnionType}:  # optional parameters are typed as their value
+            args = [arg for arg in get_args(annotation) if arg is not NoneType]
+            annotation = args[0] if len(args) == 1 else annotation
+        if annotation != Parameter.empty:
+            if annotation is str:
                 param_type = "string"
-            elif param.annotation is int:
+            elif annotation is int:
                 param_type = "number"
-            elif param.annotation is bool:
+            elif annotation is bool:
                 param_type = "boolean"
+            elif get_origin(annotation) is list:
+                param_type = "array"
 
         if param.default == Parameter.empty:
             required.append(param.name)
@@ -78,6 +85,9 @@ def description_and_params(  # noqa: C901
             "type": param_type,
             "description": param_desc.get(param.name, f"Parameter {param.name}"),
         }
+        if param_type == "array":
+            item_type = next(iter(get_args(annotation)), str)
+            params[param.name]["items"] = {"type": {int: "number", bool: "boolean"}.get(item_type, "string")}
 
     main_desc = ""
     if main := next((p for p in sections if p.kind == DocstringSectionKind.text), None):
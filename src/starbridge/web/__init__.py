@@ -1,14 +1,28 @@
 """Web module for interacting with the world wide web."""
 
 from .cli import cli
-from .models import Context, GetResult, LinkTarget, Resource, RobotForbiddenError
+from .models import (
+    Context,
+    CrawledPage,
+    GetManyResult,
+    GetResult,
+    HostUnavailableError,
+    LinkTarget,
+    Pagination,
+    Resource,
+    RobotForbiddenError,
+)
 from .service import Service
 from .settings import Settings
 
 __all__ = [
     "Context",
+    "CrawledPage",
+    "GetManyResult",
     "GetResult",
+    "HostUnavailableError",
     "LinkTarget",
+    "Pagination",
     "Resource",
     "RobotForbiddenError",
     "Service",
@@ -0,0 +1,733 @@
+"""Caches used to avoid redundant round trips when interacting with the world wide web."""
+
+import contextlib
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, ClassVar, Generic, TypeVar, cast
+from urllib.parse import urlparse, urlunparse
+
+import httpx
+
+from starbridge.utils import get_logger
+
+logger = get_logger(__name__)
+
+KT = TypeVar("KT")
+VT = TypeVar("VT")
+
+ENCODING_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})  # not valid for decoded body
+MAX_PENDING_ACCESSES = 100  # accesses of rows tracked in memory before written to the database at once
+SQLITE_TIMEOUT = 0.1  # seconds to wait for a lock held by another connection, blocking the event loop meanwhile
+SQLITE_ERRORS = (sqlite3.Error, OSError)  # failures of the database, e.g. locked, corrupt or not writable
+
+
+class TTLCache(Generic[KT, VT]):
+    """
+    In-memory cache bounded by number of entries, expiring entries after their time to live.
+
+    When full, the least recently used entry is evicted. Hits and misses are counted for reporting.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: float) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept, least recently used entries are evicted first
+            default_ttl (float): Time to live in seconds for entries set without explicit ttl
+
+        """
+        self._max_entries = max_entries
+        self._default_ttl = default_ttl
+        self._entries: OrderedDict[KT, tuple[float, VT]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def default_ttl(self) -> float:
+        """Time to live in seconds for entries set without explicit ttl."""
+        return self._default_ttl
+
+    def get(self, key: KT) -> VT | None:
+        """
+        Get the value cached for the key, if present and not expired.
+
+        Args:
+            key (KT): The key to look up
+
+        Returns:
+            VT | None: The cached value, or None if not cached or expired
+
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: KT, value: VT, ttl: float | None = None) -> None:
+        """
+        Cache the value for the key.
+
+        Args:
+            key (KT): The key to cache the value for
+            value (VT): The value to cache
+            ttl (float | None): Time to live in seconds. Defaults to the default ttl of the cache.
+                If not positive, the value is not cached.
+
+        """
+        ttl = self._default_ttl if ttl is None else ttl
+        if ttl <= 0 or self._max_entries <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: object) -> bool:
+        """
+        Check if a value is cached for the key and not expired, without counting a hit or miss.
+
+        Args:
+            key (object): The key to look up
+
+        Returns:
+            bool: True if a value is cached for the key and not expired
+
+        """
+        entry = self._entries.get(cast("KT", key))
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        """
+        Get number of entries, including expired ones not yet evicted.
+
+        Returns:
+            int: Number of entries
+
+        """
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get statistics about the cache.
+
+        Returns:
+            dict[str, int]: Number of entries, maximum number of entries, hits and misses
+
+        """
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def get_ttl_from_headers(headers: httpx.Headers, default_ttl: float, max_ttl: float | None = None) -> float:
+    """
+    Derive how long a response may be cached from its Cache-Control resp. Expires headers.
+
+    Args:
+        headers (httpx.Headers): Headers of the response
+        default_ttl (float): Time to live in seconds if the headers do not specify one
+        max_ttl (float | None): Upper bound for the time to live in seconds, if any
+
+    Returns:
+        float: Time to live in seconds, 0 if the response must not be cached
+
+    """
+    ttl: float = default_ttl
+    cache_control = {
+        directive.strip().split("=", 1)[0].lower(): directive.strip().split("=", 1)[-1].strip('"')
+        for directive in headers.get("cache-control", "").split(",")
+        if directive.strip()
+    }
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    max_age = cache_control.get("s-maxage", cache_control.get("max-age"))
+    if max_age is not None and max_age.isdigit():
+        ttl = int(max_age)
+    elif "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"])
+            date = parsedate_to_datetime(headers["date"]) if "date" in headers else None
+            now = date.timestamp() if date else time.time()
+            ttl = max(0, expires.timestamp() - now)
+        except (TypeError, ValueError):
+            ttl = 0  # RFC 9111: invalid Expires, e.g. "0", means already expired
+    if max_ttl is not None:
+        ttl = min(ttl, max_ttl)
+    return ttl
+
+
+def _get_cache_control(headers: httpx.Headers) -> set[str]:
+    """
+    Get the names of the Cache-Control directives of the headers.
+
+    Args:
+        headers (httpx.Headers): Headers of the response
+
+    Returns:
+        set[str]: Lowercase names of the directives
+
+    """
+    return {
+        directive.strip().split("=", 1)[0].lower()
+        for directive in headers.get("cache-control", "").split(",")
+        if directive.strip()
+    }
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Response stored in the response cache, with the validators needed for revalidation."""
+
+    url: str
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: bytes
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        """Whether the response may be served without revalidation."""
+        return self.expires_at > time.time()
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        """
+        Get the headers to revalidate the response with.
+
+        Returns:
+            dict[str, str]: If-None-Match resp. If-Modified-Since headers, if the response has validators
+
+        """
+        headers = httpx.Headers(self.headers)
+        conditional_headers = {}
+        if "etag" in headers:
+            conditional_headers["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            conditional_headers["If-Modified-Since"] = headers["last-modified"]
+        return conditional_headers
+
+    def to_response(self) -> httpx.Response:
+        """
+        Get as HTTP response.
+
+        Returns:
+            httpx.Response: The response, with the final URL after redirects as its URL
+
+        """
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=httpx.Request("GET", self.url),
+        )
+
+
+class _SQLiteCache:
+    """
+    Base of persistent caches in a table of a SQLite database, bounded by the size of the cached values.
+
+    Rows are keyed by key and track their size and last access. When full, the least recently used rows
+    are evicted first. Accesses are tracked in memory and written in batches, so reads do not write.
+
+    The cache is an optimization only: if the database fails, e.g. as locked by another process or not
+    writable, the failure is logged, and lookups miss resp. values are not stored.
+    """
+
+    _TABLE: ClassVar[str]
+    _COLUMNS: ClassVar[tuple[str, ...]]  # definitions of columns besides key, size and accessed_at
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        """
+        Initialize the cache, opening the database on first use.
+
+        Args:
+            path (Path): Path of the SQLite database, created if not existing
+            max_bytes (int): Maximum size in bytes of cached values, least recently used are evicted first
+
+        """
+        self._path = path
+        self._max_bytes = max_bytes
+        self._connection: sqlite3.Connection | None = None
+        self._accesses: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the connection to the database, creating the database on first use.
+
+        Returns:
+            sqlite3.Connection: The connection
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened resp. created
+            OSError: If the directory of the database cannot be created
+
+        """
+        if self._connection is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=SQLITE_TIMEOUT)
+            try:
+                columns = ", ".join((
+                    "key TEXT PRIMARY KEY",
+                    *self._COLUMNS,
+                    "size INTEGER NOT NULL",
+                    "accessed_at REAL NOT NULL",
+                ))
+                connection.execute(f"CREATE TABLE IF NOT EXISTS {self._TABLE} ({columns})")
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self._TABLE}_accessed_at ON {self._TABLE} (accessed_at)",
+                )
+                connection.commit()
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    def _rollback(self) -> None:
+        """Roll back the changes not committed after a failure, so they are not committed with later ones."""
+        if self._connection is not None:
+            with contextlib.suppress(sqlite3.Error):
+                self._connection.rollback()
+
+    def _select(self, key: str, columns: str) -> tuple[Any, ...] | None:
+        """
+        Select columns of the row for the key, marking it as used.
+
+        Args:
+            key (str): The key to look up
+            columns (str): Comma separated columns to select
+
+        Returns:
+            tuple[Any, ...] | None: Values of the columns, or None if not cached resp. the database failed
+
+        """
+        try:
+            row: tuple[Any, ...] | None = (
+                self._get_connection().execute(f"SELECT {columns} FROM {self._TABLE} WHERE key = ?", (key,)).fetchone()  # noqa: S608
+            )
+        except SQLITE_ERRORS:
+            logger.warning("Failed to look up %s in %s, treating it as not cached", key, self._path, exc_info=True)
+            return None
+        if row is not None:
+            self._accesses[key] = time.time()
+            if len(self._accesses) >= MAX_PENDING_ACCESSES:
+                try:
+                    self._flush_accesses()
+                    self._get_connection().commit()
+                except SQLITE_ERRORS:
+                    logger.warning("Failed to write accesses to %s, skipping them", self._path, exc_info=True)
+                    self._rollback()
+        return row
+
+    def _flush_accesses(self) -> None:
+        """
+        Write the accesses tracked in memory to the database, leaving the commit to the caller.
+
+        The accesses are forgotten also if writing them fails, so they do not pile up while the database fails.
+
+        Raises:
+            sqlite3.Error: If the accesses cannot be written
+            OSError: If the database cannot be opened
+
+        """
+        if self._accesses:
+            try:
+                self._get_connection().executemany(
+                    f"UPDATE {self._TABLE} SET accessed_at = ? WHERE key = ?",  # noqa: S608
+                    [(accessed_at, key) for key, accessed_at in self._accesses.items()],
+                )
+            finally:
+                self._accesses.clear()
+
+    def _insert(self, key: str, values: dict[str, object], size: int) -> None:
+        """
+        Insert or replace the row for the key, evicting least recently used rows until within the maximum size.
+
+        Args:
+            key (str): The key of the row
+            values (dict[str, object]): Values of columns besides key, size and accessed_at
+            size (int): Size in bytes of the cached value
+        """
+        try:
+            self._insert_or_raise(key, values, size)
+        except SQLITE_ERRORS:
+            logger.warning("Failed to store %s in %s, not caching it", key, self._path, exc_info=True)
+            self._rollback()
+
+    def _insert_or_raise(self, key: str, values: dict[str, object], size: int) -> None:
+        """
+        Insert or replace the row for the key, evicting least recently used rows until within the maximum size.
+
+        Args:
+            key (str): The key of the row
+            values (dict[str, object]): Values of columns besides key, size and accessed_at
+            size (int): Size in bytes of the cached value
+
+        Raises:
+            sqlite3.Error: If the database fails
+            OSError: If the database cannot be opened
+
+        """
+        connection = self._get_connection()
+        self._accesses.pop(key, None)
+        if size > self._max_bytes:
+            connection.execute(f"DELETE FROM {self._TABLE} WHERE key = ?", (key,))  # noqa: S608
+            connection.commit()
+            return
+        self._flush_accesses()  # so least recently used rows are evicted first
+        columns = ("key", *values, "size", "accessed_at")
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self._TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",  # noqa: S608
+            (key, *values.values(), size, time.time()),
+        )
+        total = connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self._TABLE}").fetchone()[0]  # noqa: S608
+        if total > self._max_bytes:
+            for evicted_key, evicted_size in connection.execute(
+                f"SELECT key, size FROM {self._TABLE} WHERE key != ? ORDER BY accessed_at",  # noqa: S608
+                (key,),
+            ).fetchall():
+                connection.execute(f"DELETE FROM {self._TABLE} WHERE key = ?", (evicted_key,))  # noqa: S608
+                total -= evicted_size
+                if total <= self._max_bytes:
+                    break
+        connection.commit()
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        self._accesses.clear()
+        try:
+            connection = self._get_connection()
+            connection.execute(f"DELETE FROM {self._TABLE}")  # noqa: S608
+            connection.commit()
+        except SQLITE_ERRORS:
+            logger.warning("Failed to clear %s", self._path, exc_info=True)
+            self._rollback()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        """Close the database, writing accesses tracked in memory before, and reopen it on next use."""
+        if self._connection is not None:
+            try:
+                self._flush_accesses()
+                self._connection.commit()
+            except SQLITE_ERRORS:
+                logger.warning("Failed to write accesses to %s, skipping them", self._path, exc_info=True)
+            finally:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get statistics about the cache.
+
+        Returns:
+            dict[str, int]: Number of entries, bytes of cached values, maximum bytes, hits and misses.
+                Entries and bytes are 0 if the database fails.
+
+        """
+        try:
+            entries, size = (
+                self._get_connection().execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self._TABLE}").fetchone()  # noqa: S608
+            )
+        except SQLITE_ERRORS:
+            logger.warning("Failed to count entries of %s", self._path, exc_info=True)
+            entries, size = 0, 0
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ResponseCache(_SQLiteCache):
+    """
+    Persistent cache of HTTP responses, bounded by the size of the cached content.
+
+    Stale responses are kept, so they can be revalidated using their ETag resp. Last-Modified validators.
+    When full, the least recently used responses are evicted first.
+    """
+
+    _TABLE = "responses"
+    _COLUMNS = (
+        "url TEXT NOT NULL",
+        "status_code INTEGER NOT NULL",
+        "headers TEXT NOT NULL",
+        "content BLOB NOT NULL",
+        "expires_at REAL NOT NULL",
+    )
+
+    def __init__(self, path: Path, max_bytes: int, default_ttl: float) -> None:
+        """
+        Initialize the cache, opening the database on first use.
+
+        Args:
+            path (Path): Path of the SQLite database, created if not existing
+            max_bytes (int): Maximum size in bytes of cached content, least recently used responses are evicted first
+            default_ttl (float): Seconds a response is fresh if it does not specify caching
+
+        """
+        super().__init__(path, max_bytes)
+        self._default_ttl = default_ttl
+        self.revalidations = 0
+
+    @staticmethod
+    def get_key(url: str, accept_language: str) -> str:
+        """
+        Get the key to cache the response for the URL under, normalizing the URL.
+
+        Args:
+            url (str): The URL requested
+            accept_language (str): Accept-Language header value sent, as the response may vary by it
+
+        Returns:
+            str: The key
+
+        """
+        parsed = urlparse(url)
+        normalized = urlunparse((
+            parsed.scheme.lower(),
+            parsed.netloc.lower(),
+            parsed.path or "/",
+            parsed.params,
+            parsed.query,
+            "",  # fragments are not sent to the server
+        ))
+        return f"{normalized} {accept_language}"
+
+    def get(self, key: str) -> CachedResponse | None:
+        """
+        Get the response cached for the key, fresh or stale.
+
+        Counts a hit if the response is fresh, a miss otherwise.
+
+        Args:
+            key (str): The key to look up
+
+        Returns:
+            CachedResponse | None: The cached response, or None if not cached
+
+        """
+        row = self._select(key, "url, status_code, headers, content, expires_at")
+        if row is None:
+            self.misses += 1
+            return None
+        url, status_code, headers, content, expires_at = row
+        cached = CachedResponse(
+            url=url,
+            status_code=status_code,
+            headers=[(name, value) for name, value in json.loads(headers)],
+            content=content,
+            expires_at=expires_at,
+        )
+        if cached.is_fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return cached
+
+    def is_fresh(self, key: str) -> bool:
+        """
+        Check if a fresh response is cached for the key, without counting a hit or miss.
+
+        Args:
+            key (str): The key to look up
+
+        Returns:
+            bool: True if a response is cached for the key and may be served without revalidation
+
+        """
+        row = self._select(key, "expires_at")
+        return row is not None and row[0] > time.time()
+
+    def set(self, key: str, response: httpx.Response) -> None:
+        """
+        Cache the response for the key, if cacheable.
+
+        Only successful responses are cacheable, if neither marked no-store nor varying by anything but the
+        request headers sent, and if either fresh for some time or having validators.
+
+        Args:
+            key (str): The key to cache the response for
+            response (httpx.Response): The response, its body read already
+
+        """
+        if (
+            response.status_code != HTTPStatus.OK
+            or "no-store" in _get_cache_control(response.headers)
+            or response.headers.get("vary", "").strip() == "*"
+        ):
+            return
+        ttl = get_ttl_from_headers(response.headers, self._default_ttl)
+        if ttl <= 0 and "etag" not in response.headers and "last-modified" not in response.headers:
+            return
+        self._store(
+            key,
+            CachedResponse(
+                url=str(response.url),
+                status_code=response.status_code,
+                headers=[
+                    (name, value) for name, value in response.headers.multi_items() if name not in ENCODING_HEADERS
+                ],
+                content=response.content,
+                expires_at=time.time() + ttl,
+            ),
+        )
+
+    def revalidate(self, key: str, cached: CachedResponse, response: httpx.Response) -> CachedResponse:
+        """
+        Refresh the cached response, as the server confirmed it is not modified.
+
+        Args:
+            key (str): The key the response is cached for
+            cached (CachedResponse): The cached response revalidated
+            response (httpx.Response): The 304 Not Modified response of the server
+
+        Returns:
+            CachedResponse: The refreshed response, with headers updated by the ones of the 304 response
+
+        """
+        self.revalidations += 1
+        headers = httpx.Headers(cached.headers)
+        for name, value in response.headers.items():
+            if name not in ENCODING_HEADERS:
+                headers[name] = value
+        refreshed = CachedResponse(
+            url=cached.url,
+            status_code=cached.status_code,
+            headers=list(headers.multi_items()),
+            content=cached.content,
+            expires_at=time.time() + get_ttl_from_headers(headers, self._default_ttl),
+        )
+        self._store(key, refreshed)
+        return refreshed
+
+    def _store(self, key: str, cached: CachedResponse) -> None:
+        """
+        Store the response.
+
+        Args:
+            key (str): The key to store the response under
+            cached (CachedResponse): The response to store
+
+        """
+        self._insert(
+            key,
+            {
+                "url": cached.url,
+                "status_code": cached.status_code,
+                "headers": json.dumps(cached.headers),
+                "content": cached.content,
+                "expires_at": cached.expires_at,
+            },
+            len(cached.content),
+        )
+
+    def clear(self) -> None:
+        """Remove all responses and reset counters."""
+        super().clear()
+        self.revalidations = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get statistics about the cache.
+
+        Returns:
+            dict[str, int]: Number of responses, bytes of cached content, maximum bytes, hits, misses and revalidations
+
+        """
+        return {**super().stats(), "revalidations": self.revalidations}
+
+
+class TransformationCache(_SQLiteCache):
+    """
+    Persistent cache of content transformed to markdown, addressed by the content and the transformation options.
+
+    Transformed content is stored compressed, bounded by its compressed size. When full, the least recently used
+    transformations are evicted first.
+    """
+
+    _TABLE = "transformations"
+    _COLUMNS = ("markdown BLOB NOT NULL",)
+
+    @staticmethod
+    def get_key(content: bytes, options: Mapping[str, object]) -> str:
+        """
+        Get the key to cache the transformation of the content under.
+
+        Args:
+            content (bytes): The content to transform
+            options (Mapping[str, object]): Everything else the transformation depends on, e.g. MIME type and parser
+
+        Returns:
+            str: SHA-256 digest of content and options
+
+        """
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        Get the markdown cached for the key.
+
+        Args:
+            key (str): The key to look up
+
+        Returns:
+            str | None: The markdown, or None if not cached resp. the database failed or is corrupt
+
+        """
+        row = self._select(key, "markdown")
+        if row is None:
+            self.misses += 1
+            return None
+        try:
+            markdown = zlib.decompress(row[0]).decode()
+        except (zlib.error, UnicodeDecodeError):
+            logger.warning("Failed to decompress %s from %s, treating it as not cached", key, self._path, exc_info=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return markdown
+
+    def set(self, key: str, markdown: str) -> None:
+        """
+        Cache the markdown for the key, compressed.
+
+        Args:
+            key (str): The key to cache the markdown for
+            markdown (str): The content transformed to markdown
+
+        """
+        compressed = zlib.compress(markdown.encode())
+        self._insert(key, {"markdown": compressed}, len(compressed))
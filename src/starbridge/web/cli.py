@@ -2,6 +2,7 @@
 
 import asyncio
 import sys
+from pathlib import Path
 from typing import Annotated
 
 import typer
@@ -11,7 +12,7 @@ from rich.text import Text
 
 from starbridge.utils.console import console
 
-from .models import RobotForbiddenError
+from .models import GetManyResult, GetResult, RobotForbiddenError
 from .service import Service
 
 cli = typer.Typer(name="web", help="Web operations")
@@ -44,6 +45,12 @@ def get(  # noqa: PLR0913, PLR0917
             help="if possible transform content to markdown",
         ),
     ] = True,
+    main_content: Annotated[
+        bool,
+        typer.Option(
+            help="transform the main content of HTML pages only, dropping navigation, footers and banners",
+        ),
+    ] = False,
     extract_links: Annotated[
         bool,
         typer.Option(
@@ -72,6 +79,24 @@ def get(  # noqa: PLR0913, PLR0917
             "Defaults to False.",
         ),
     ] = False,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            help="serve from resp. store in the response cache, if enabled",
+        ),
+    ] = True,
+    pages: Annotated[
+        str | None,
+        typer.Option(
+            help="pages of PDF documents to transform only, e.g. 10-20 or 1,3,5-",
+        ),
+    ] = None,
+    sheets: Annotated[
+        str | None,
+        typer.Option(
+            help="sheets of Excel documents to transform only, as comma-separated names",
+        ),
+    ] = None,
 ) -> None:
     """
     Fetch content from the world wide web via HTTP GET.
@@ -82,6 +107,7 @@ def get(  # noqa: PLR0913, PLR0917
         url (str): URL to fetch
         accept_language (str): Accept-Language header value to send in the request
         transform_to_markdown (bool): if possible transform content to markdown
+        main_content (bool): transform the main content of HTML pages only
         extract_links (bool): include extracted links in the response
         additional_context (bool): include additional context in the response
         llms_full_txt (bool): provide llms-full.txt in contexts
@@ -89,20 +115,33 @@ def get(  # noqa: PLR0913, PLR0917
             If False, the agent will respect robots.txt if the environment variable
                 STARBRIDGE_WEB_RESPPECT_ROBOTS_TXT is set to 1.
             Defaults to False
+        cache (bool): serve from resp. store in the response cache, if enabled
+        pages (str | None): pages of PDF documents to transform only
+        sheets (str | None): sheets of Excel documents to transform only
 
     """
-    try:
-        rtn = asyncio.run(
-            Service().get(
+
+    async def get_and_shutdown() -> GetResult:
+        service = Service()
+        try:
+            return await service.get(
                 url=url,
                 accept_language=accept_language,
                 transform_to_markdown=transform_to_markdown,
+                main_content=main_content,
                 extract_links=extract_links,
                 additional_context=additional_context,
                 llms_full_txt=llms_full_txt,
                 force_not_respecting_robots_txt=force_not_respecting_robots_txt,
-            ),
-        )
+                use_cache=cache,
+                pages=pages,
+                sheets=sheets,
+            )
+        finally:
+            await service.shutdown()
+
+    try:
+        rtn = asyncio.run(get_and_shutdown())
         console.print_json(rtn.model_dump_json())
     except RequestException as e:
         text = Text()
@@ -126,3 +165,108 @@ def get(  # noqa: PLR0913, PLR0917
             ),
         )
         sys.exit(1)
+
+
+@cli.command()
+def get_many(  # noqa: PLR0913, PLR0917
+    urls_file: Annotated[
+        Path | None,
+        typer.Argument(
+            help="File with URLs to fetch, one per line. Blank lines and lines starting with # are ignored. "
+            "Reads from stdin if not given.",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    accept_language: Annotated[
+        str,
+        typer.Option(
+            help="Accept-Language header value to send in the requests",
+        ),
+    ] = "en-US,en;q=0.9,de;q=0.8",
+    transform_to_markdown: Annotated[
+        bool,
+        typer.Option(
+            help="if possible transform content to markdown",
+        ),
+    ] = True,
+    main_content: Annotated[
+        bool,
+        typer.Option(
+            help="transform the main content of HTML pages only, dropping navigation, footers and banners",
+        ),
+    ] = False,
+    extract_links: Annotated[
+        bool,
+        typer.Option(
+            help="include extracted links in the responses",
+        ),
+    ] = True,
+    additional_context: Annotated[
+        bool,
+        typer.Option(
+            help="include additional context in the responses",
+        ),
+    ] = True,
+    llms_full_txt: Annotated[
+        bool,
+        typer.Option(
+            help="provide llms-full.txt in contexts",
+        ),
+    ] = False,
+    force_not_respecting_robots_txt: Annotated[
+        bool,
+        typer.Option(
+            "--force-not-respecting-robots-txt",
+            help="Force not respecting robots.txt. If True, the agent will ignore robots.txt.",
+        ),
+    ] = False,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            help="serve from resp. store in the response cache, if enabled",
+        ),
+    ] = True,
+) -> None:
+    """
+    Fetch content of many URLs from the world wide web concurrently, emitting one JSON line per URL.
+
+    Exits with code 1 if fetching any of the URLs failed, after emitting the results of all.
+
+    Args:
+        urls_file (Path | None): File with URLs to fetch, one per line. Reads from stdin if None
+        accept_language (str): Accept-Language header value to send in the requests
+        transform_to_markdown (bool): if possible transform content to markdown
+        main_content (bool): transform the main content of HTML pages only
+        extract_links (bool): include extracted links in the responses
+        additional_context (bool): include additional context in the responses
+        llms_full_txt (bool): provide llms-full.txt in contexts
+        force_not_respecting_robots_txt (bool): do not respect robots.txt
+        cache (bool): serve from resp. store in the response cache, if enabled
+
+    """
+    lines = urls_file.read_text(encoding="utf-8").splitlines() if urls_file else sys.stdin.read().splitlines()
+    urls = [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+    async def get_many_and_shutdown() -> list[GetManyResult]:
+        service = Service()
+        try:
+            return await service.get_many(
+                urls=urls,
+                accept_language=accept_language,
+                transform_to_markdown=transform_to_markdown,
+                main_content=main_content,
+                extract_links=extract_links,
+                additional_context=additional_context,
+                llms_full_txt=llms_full_txt,
+                force_not_respecting_robots_txt=force_not_respecting_robots_txt,
+                use_cache=cache,
+            )
+        finally:
+            await service.shutdown()
+
+    results = asyncio.run(get_many_and_shutdown())
+    for result in results:
+        sys.stdout.write(result.model_dump_json() + "\n")
+    if any(result.error is not None for result in results):
+        sys.exit(1)
@@ -0,0 +1,385 @@
+"""Extraction of links from HTML and markdown, and of the main content from HTML pages, dropping boilerplate."""
+
+import re
+from collections.abc import Iterable, Iterator
+from html.parser import HTMLParser
+from operator import itemgetter
+
+from bs4 import BeautifulSoup, Tag
+
+_LABEL = r"((?:[^\[\]\\]|\\.|\[(?:[^\[\]\\]|\\.)*\])*)"  # allowing one level of nested brackets, e.g. images
+MARKDOWN_FENCED_CODE = re.compile(r"^ {0,3}(`{3,}|~{3,}).*?^ {0,3}\1[^\n]*$", re.MULTILINE | re.DOTALL)
+MARKDOWN_INLINE_CODE = re.compile(r"(`+).+?\1", re.DOTALL)
+MARKDOWN_LIST_ITEM = re.compile(r"^ *(?:[*+-]|\d+\.)[ \t]+")
+MARKDOWN_HEADING = re.compile(r"^ {0,3}#{1,6}(?:[ \t]|$)")
+TAB_LENGTH = 4  # columns of a tab, resp. of the indentation of code blocks and nested lists, as in Python-Markdown
+MARKDOWN_REFERENCE_DEFINITION = re.compile(
+    r"^ {0,3}\[([^\]]+)\]:[ \t]*<?([^\s>]+)>?(?:[ \t]+(?:\"[^\"]*\"|'[^']*'|\([^)]*\)))?[ \t]*$",
+    re.MULTILINE,
+)
+MARKDOWN_LINK = re.compile(
+    rf"(?P<image>!?)\[{_LABEL}\]"
+    r"(?:\(\s*(?:<(?P<bracketed_href>[^<>\n]*)>|(?P<href>(?:[^()\s<>]|\([^()\s]*\))*))"
+    r"(?:\s+(?:\"[^\"]*\"|'[^']*'|\([^)]*\)))?\s*\)"
+    r"|[ ]?\[(?P<reference>[^\]]*)\])?"
+    r"|<(?P<autolink>[a-zA-Z][a-zA-Z0-9+.-]*:[^\s<>]+)>",
+)
+MARKDOWN_IMAGE = re.compile(rf"!\[{_LABEL}\]\([^)]*\)")
+MARKDOWN_EMPHASIS = re.compile(r"\*+|(?<!\w)_+|_+(?!\w)|`+")
+
+BOILERPLATE_TAGS = ("nav", "footer", "aside", "form", "script", "style", "noscript", "iframe", "svg")
+UNLIKELY_CANDIDATES = re.compile(
+    r"banner|breadcrumb|combx|comment|community|consent|cookie|disqus|extra|foot|gdpr|header|legends|menu|modal|"
+    r"nav|newsletter|pager|pagination|popup|promo|related|remark|replies|rss|share|shoutbox|sidebar|skyscraper|"
+    r"social|sponsor|subscribe|tweet|twitter|ad-break|agegate|advert",
+    re.IGNORECASE,
+)
+MAYBE_CANDIDATES = re.compile(r"and|article|body|column|content|main|post|shadow", re.IGNORECASE)
+POSITIVE_HINTS = re.compile(
+    r"article|body|content|entry|hentry|h-entry|main|page|post|text|blog|story",
+    re.IGNORECASE,
+)
+NEGATIVE_HINTS = re.compile(
+    r"-ad-|hidden|^hid$| hid$| hid |^hid |banner|combx|comment|com-|contact|foot|footer|footnote|gdpr|masthead|"
+    r"media|meta|outbrain|promo|related|scroll|share|shoutbox|sidebar|skyscraper|sponsor|shopping|tags|widget",
+    re.IGNORECASE,
+)
+TAG_WEIGHTS = {
+    "article": 10,
+    "main": 10,
+    "div": 5,
+    "section": 3,
+    "pre": 3,
+    "td": 3,
+    "blockquote": 3,
+    "address": -3,
+    "ol": -3,
+    "ul": -3,
+    "dl": -3,
+    "dd": -3,
+    "dt": -3,
+    "li": -3,
+    "h1": -5,
+    "h2": -5,
+    "h3": -5,
+    "h4": -5,
+    "h5": -5,
+    "h6": -5,
+    "th": -5,
+}
+PARAGRAPH_TAGS = ("p", "pre", "td", "blockquote")
+MIN_PARAGRAPH_LENGTH = 25  # shorter paragraphs, e.g. captions or buttons, do not indicate content
+MIN_CANDIDATE_SCORE = 10  # below, the page is not article-like, so it is converted as a whole
+
+
+def _get_classes(tag: Tag) -> str:
+    """
+    Get the classes of the tag.
+
+    Args:
+        tag (Tag): The tag to get the classes of
+
+    Returns:
+        str: The classes separated by spaces, empty if the tag has none
+
+    """
+    return " ".join(value for value in tag.get_attribute_list("class") if value)
+
+
+def _get_class_weight(tag: Tag) -> int:
+    """
+    Weigh the tag by hints on its role in its class and id.
+
+    Args:
+        tag (Tag): The tag to weigh
+
+    Returns:
+        int: Positive for hints on content, negative for hints on boilerplate
+
+    """
+    weight = 0
+    for hint in (_get_classes(tag), tag.get("id")):
+        if not isinstance(hint, str) or not hint:
+            continue
+        if NEGATIVE_HINTS.search(hint):
+            weight -= 25
+        if POSITIVE_HINTS.search(hint):
+            weight += 25
+    return weight
+
+
+def _get_link_density(tag: Tag) -> float:
+    """
+    Get the share of the text of the tag that is anchor text of links.
+
+    Args:
+        tag (Tag): The tag to measure
+
+    Returns:
+        float: Between 0 for no links and 1 for text consisting of links only
+
+    """
+    text_length = len(tag.get_text(strip=True))
+    if not text_length:
+        return 0
+    return sum(len(link.get_text(strip=True)) for link in tag.find_all("a")) / text_length
+
+
+def _remove_boilerplate(soup: BeautifulSoup) -> None:
+    """
+    Remove elements that are boilerplate by their tag, or unlikely to be content by their class and id.
+
+    Args:
+        soup (BeautifulSoup): The parsed HTML content to prune in place
+
+    """
+    for tag in soup.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(True):
+        if not isinstance(tag, Tag) or tag.decomposed or tag.name in {"html", "body", "article", "main"}:
+            continue
+        hint = f"{_get_classes(tag)} {tag.get('id') or ''}"
+        if UNLIKELY_CANDIDATES.search(hint) and not MAYBE_CANDIDATES.search(hint):
+            tag.decompose()
+
+
+def extract_main_content(soup: BeautifulSoup) -> Tag:
+    """
+    Extract the main content of the HTML page, as readability does.
+
+    Boilerplate is removed first. Paragraphs then add to the score of their parent, and half of it to their
+    grandparent, by their length and number of commas. Scores are weighted by tag, class and id, and reduced by
+    the link density of the candidate, so navigation and link lists lose out to text.
+
+    Args:
+        soup (BeautifulSoup): The parsed HTML content, pruned in place
+
+    Returns:
+        Tag: The element with the highest score, preceded by the first heading of the page if outside of it,
+            or the whole page if no element scores as article-like
+
+    """
+    _remove_boilerplate(soup)
+    scores: dict[int, tuple[Tag, float]] = {}
+
+    def add_score(tag: Tag, score: float) -> None:
+        if id(tag) not in scores:
+            scores[id(tag)] = (tag, TAG_WEIGHTS.get(tag.name, 0) + _get_class_weight(tag))
+        scores[id(tag)] = (tag, scores[id(tag)][1] + score)
+
+    for paragraph in soup.find_all(PARAGRAPH_TAGS):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < MIN_PARAGRAPH_LENGTH:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = paragraph.parent
+        if isinstance(parent, Tag) and parent.name != "[document]":
+            add_score(parent, score)
+            grandparent = parent.parent
+            if isinstance(grandparent, Tag) and grandparent.name != "[document]":
+                add_score(grandparent, score / 2)
+
+    candidates = [(tag, score * (1 - _get_link_density(tag))) for tag, score in scores.values()]
+    top, top_score = max(candidates, key=itemgetter(1), default=(soup, 0))
+    if top_score < MIN_CANDIDATE_SCORE:
+        return soup
+    heading = soup.find("h1")
+    if isinstance(heading, Tag) and top.find("h1") is None:
+        top.insert(0, heading.extract())
+    return top
+
+
+class LinkExtractor(HTMLParser):
+    """
+    Streaming extractor of links from HTML, fed in chunks, keeping no more than the link being read.
+
+    As BeautifulSoup does, links within templates, scripts and styles are ignored,
+    and a link is closed by the start of the next one.
+    """
+
+    def __init__(self) -> None:
+        """Initialize without any HTML fed yet."""
+        super().__init__(convert_charrefs=True)
+        self._href: str | None = None
+        self._text: list[str] = []
+        self._template_depth = 0
+        self._links: list[tuple[str, str]] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        """
+        Start reading a link, closing the one being read, if any.
+
+        Args:
+            tag (str): Name of the tag started, lowercased
+            attrs (list[tuple[str, str | None]]): Attributes of the tag
+
+        """
+        if tag == "template":
+            self._template_depth += 1
+        elif tag == "a" and not self._template_depth:
+            self._close_link()
+            hrefs = [value for name, value in attrs if name == "href"]
+            if hrefs:
+                self._href = hrefs[0] or ""
+
+    def handle_endtag(self, tag: str) -> None:
+        """
+        Close the link being read, if any.
+
+        Args:
+            tag (str): Name of the tag ended, lowercased
+
+        """
+        if tag == "template":
+            self._template_depth = max(self._template_depth - 1, 0)
+        elif tag == "a":
+            self._close_link()
+
+    def handle_data(self, data: str) -> None:
+        """
+        Add to the anchor text of the link being read, if any.
+
+        Args:
+            data (str): Text, with character references converted
+
+        """
+        if self._href is not None and not self._template_depth:
+            self._text.append(data)
+
+    def close(self) -> None:
+        """Close the parser, closing the link being read, if any."""
+        super().close()
+        self._close_link()
+
+    def _close_link(self) -> None:
+        """Close the link being read, if any."""
+        if self._href is not None:
+            self._links.append((self._href, "".join(self._text)))
+        self._href = None
+        self._text = []
+
+    def pop_links(self) -> list[tuple[str, str]]:
+        """
+        Pop the links read completely so far.
+
+        Returns:
+            list[tuple[str, str]]: Target and anchor text of each link, in document order
+
+        """
+        links, self._links = self._links, []
+        return links
+
+
+def iter_links(chunks: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Iterate over the links in HTML, read chunk by chunk, without building a tree.
+
+    Args:
+        chunks (Iterable[str]): The HTML content in chunks, e.g. as downloaded
+
+    Yields:
+        tuple[str, str]: Target and anchor text of each link, in document order
+
+    """
+    extractor = LinkExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+        yield from extractor.pop_links()
+    extractor.close()
+    yield from extractor.pop_links()
+
+
+def _get_markdown_text(label: str) -> str:
+    """
+    Get the text of a markdown label as rendered, dropping images, emphasis and escapes.
+
+    Args:
+        label (str): The label of a link in markdown
+
+    Returns:
+        str: The text of the label
+
+    """
+    text = MARKDOWN_EMPHASIS.sub("", MARKDOWN_IMAGE.sub("", label))
+    return re.sub(r"\\(.)", r"\1", text)
+
+
+def _remove_indented_code(text: str) -> str:
+    """
+    Remove indented code blocks from markdown, as parsed by Python-Markdown.
+
+    A block, i.e. the lines following a blank line resp. heading, is code if indented by a tab resp. 4 spaces,
+    up to the first line indented less. Following a list, a block indented less than another 4 spaces is not
+    code, but continues the last item of the list.
+
+    Args:
+        text (str): The markdown content, without fenced code blocks
+
+    Returns:
+        str: The markdown content without indented code blocks
+
+    """
+    lines = []
+    is_block_start = True
+    list_level = 0  # nesting level of the last list item, if the list did not end since
+    code_indent: int | None = None  # indentation of the code block being removed, if any
+    for line in text.expandtabs(TAB_LENGTH).split("\n"):
+        if not line.strip():
+            is_block_start = True
+            lines.append(line)
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if code_indent is not None:
+            if indent >= code_indent:
+                continue
+            code_indent = None
+            is_block_start = True  # the lines indented less start a block of their own
+        if is_block_start:
+            is_block_start = False
+            if indent >= TAB_LENGTH * (list_level + 1):
+                code_indent = TAB_LENGTH * (list_level + 1)
+                continue
+            if indent < TAB_LENGTH and not MARKDOWN_LIST_ITEM.match(line):
+                list_level = 0
+        if MARKDOWN_LIST_ITEM.match(line):
+            list_level = indent // TAB_LENGTH + 1
+        elif MARKDOWN_HEADING.match(line):
+            is_block_start = True
+            list_level = 0
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def iter_markdown_links(text: str) -> Iterator[tuple[str, str]]:
+    """
+    Iterate over the links in markdown, without rendering it to HTML first.
+
+    Inline links, reference links to definitions in the document and autolinks are recognized,
+    links in code are not, as when rendered. Images are not links, but may be labels of links.
+
+    Args:
+        text (str): The markdown content
+
+    Yields:
+        tuple[str, str]: Target and anchor text of each link, in document order
+
+    """
+    text = MARKDOWN_INLINE_CODE.sub("", _remove_indented_code(MARKDOWN_FENCED_CODE.sub("", text)))
+    definitions: dict[str, str] = {}
+    for match in MARKDOWN_REFERENCE_DEFINITION.finditer(text):
+        definitions.setdefault(" ".join(match.group(1).lower().split()), match.group(2))
+    text = MARKDOWN_REFERENCE_DEFINITION.sub("", text)
+    for match in MARKDOWN_LINK.finditer(text):
+        if match["autolink"] is not None:
+            yield match["autolink"], match["autolink"].removeprefix("mailto:")
+            continue
+        if match["image"]:
+            continue
+        label = match.group(2)
+        href = match["bracketed_href"] if match["bracketed_href"] is not None else match["href"]
+        if href is not None:
+            yield href, _get_markdown_text(label)
+            continue
+        reference = " ".join((match["reference"] or label).lower().split())
+        if reference in definitions:
+            yield definitions[reference], _get_markdown_text(label)
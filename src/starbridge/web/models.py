@@ -1,14 +1,22 @@
 """Data type definitions for web interactions."""
 
+from collections.abc import Iterable
+from enum import StrEnum
 from typing import Annotated
 
-from pydantic import AnyHttpUrl, AnyUrl, BaseModel, Field, model_validator
+from pydantic import AnyHttpUrl, AnyUrl, BaseModel, Field, TypeAdapter, model_validator
+
+CompactLinkTarget = tuple[str, int, list[str]]  # URL, occurrences and anchor texts of a link target
 
 
 class RobotForbiddenError(Exception):
     """Exception raised when access to a URL is forbidden by robots.txt."""
 
 
+class HostUnavailableError(Exception):
+    """Exception raised when a host is not requested, as it failed repeatedly and is cooling down."""
+
+
 class MimeType:
     """Constants for commonly used MIME types in web interactions."""
 
@@ -21,7 +29,12 @@ class MimeType:
     OCTET_STREAM = "application/octet-stream"
 
 
-HTML_PARSER = "html.parser"
+class HtmlParser(StrEnum):
+    """Backends for parsing HTML, faster ones requiring the optional parsers extra."""
+
+    HTML_PARSER = "html.parser"
+    LXML = "lxml"
+    SELECTOLAX = "selectolax"
 
 
 class Resource(BaseModel):
@@ -41,6 +54,12 @@ class Resource(BaseModel):
             description="Binary content of the resource. None if the resource has textual content.",
         ),
     ] = None
+    truncated: Annotated[
+        bool,
+        Field(
+            description="Whether the content is incomplete, as the resource exceeded the maximum body size.",
+        ),
+    ] = False
 
     @model_validator(mode="after")
     def check_content_exists(self) -> "Resource":
@@ -80,6 +99,29 @@ class LinkTarget(BaseModel):
         Field(description="Anchor texts of the link target", min_length=1),
     ]
 
+    @staticmethod
+    def from_compact(links: Iterable[CompactLinkTarget]) -> list["LinkTarget"]:
+        """
+        Create link targets from their compact representation, validated in one pass.
+
+        The compact representation is cheap to pass between processes, as pickling models is costly,
+        while validating plain data in one pass is faster than creating URLs and models one by one.
+
+        Args:
+            links (Iterable[CompactLinkTarget]): URL, occurrences and anchor texts of each link target
+
+        Returns:
+            list[LinkTarget]: The link targets, in the same order
+
+        """
+        return _LINK_TARGETS.validate_python([
+            {"url": url, "occurrences": occurrences, "anchor_texts": anchor_texts}
+            for url, occurrences, anchor_texts in links
+        ])
+
+
+_LINK_TARGETS = TypeAdapter(list[LinkTarget])
+
 
 class Context(BaseModel):
     """A model representing additional context information about a web resource or its domain."""
@@ -89,6 +131,17 @@ class Context(BaseModel):
     text: Annotated[str, Field(description="Content of context in markdown format")]
 
 
+class Pagination(BaseModel):
+    """A model representing which part of the text of a resource was returned, and how to get the rest."""
+
+    offset: Annotated[int, Field(description="Offset in characters of the part returned in the full text", ge=0)]
+    total_chars: Annotated[int, Field(description="Number of characters of the full text", ge=0)]
+    next_cursor: Annotated[
+        str | None,
+        Field(description="Cursor to pass to get the next part of the text. None if the text is complete."),
+    ] = None
+
+
 class GetResult(BaseModel):
     """
     A model representing the result of a web resource fetch operation.
@@ -143,3 +196,33 @@ class GetResult(BaseModel):
             description="List of additional context about the URL or it's domain in the response",
         ),
     ] = None
+    pagination: Annotated[
+        Pagination | None,
+        Field(
+            default=None,
+            description="Part of the text returned, if the text exceeded max_chars resp. a cursor was passed",
+        ),
+    ] = None
+
+
+class GetManyResult(BaseModel):
+    """A model representing the outcome of fetching one of many URLs, i.e. its result or the error it failed with."""
+
+    url: Annotated[str, Field(description="URL as requested")]
+    result: Annotated[GetResult | None, Field(description="Result of the get. None if the get failed.")] = None
+    error: Annotated[str | None, Field(description="Error the get failed with. None if the get succeeded.")] = None
+
+
+class CrawledPage(BaseModel):
+    """A model summarizing a page visited while crawling, with its content."""
+
+    url: Annotated[str, Field(description="URL of the page as crawled")]
+    depth: Annotated[int, Field(description="Number of links followed from the seed URL to the page", ge=0)]
+    type: Annotated[str | None, Field(description="MIME type of the content. None if the page failed.")] = None
+    title: Annotated[str | None, Field(description="Title of the page, i.e. its first heading, if any")] = None
+    text: Annotated[
+        str | None,
+        Field(description="Content of the page, as markdown if transformed. None if binary or the page failed."),
+    ] = None
+    link_count: Annotated[int, Field(description="Number of links extracted from the page", ge=0)] = 0
+    error: Annotated[str | None, Field(description="Error fetching the page failed with, if any")] = None
@@ -0,0 +1,553 @@
+"""Scheduling of requests, so hosts are not requested more often than they ask for, nor twice at once."""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any, Generic, TypeVar
+from urllib.parse import urlparse
+
+from starbridge.utils import get_logger
+
+from .models import HostUnavailableError
+
+logger = get_logger(__name__)
+
+MAX_HOSTS_TRACKED = 1024  # beyond, hosts not requested within the maximum interval are forgotten
+LATENCY_WINDOW = 100  # latest latencies of a host its percentiles are taken over
+MIN_LATENCY_SAMPLES = 10  # below, percentiles are not significant, so the configured timeout applies
+
+T = TypeVar("T")
+
+
+class HostScheduler:
+    """
+    Spaces out the starts of requests to the same host, while requests to different hosts run in parallel.
+
+    Requests to a host start in the order they are scheduled, each at least the interval of the host apart.
+    The interval is the configured minimum, raised by the crawl delay the host asks for in its robots.txt.
+    The crawl delay last recorded for a host applies to requests to it if not known otherwise, e.g. while
+    robots.txt is fetched again.
+
+    The latencies of the latest requests to a host are tracked as well, so requests to fast hosts time out
+    sooner than the configured timeout, and requests not responded to in time for the host may be hedged.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_crawl_delay: float,
+        timeout_multiplier: float = 0,
+        min_timeout: float = 0,
+        hedge: bool = False,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            min_interval (float): Minimum seconds between starts of requests to the same host
+            max_crawl_delay (float): Maximum seconds of crawl delay honored, capping excessive ones
+            timeout_multiplier (float): Multiple of the 99th percentile of the latency of a host
+                requests to it time out after. 0 disables adaptive timeouts.
+            min_timeout (float): Minimum seconds of adaptive timeouts
+            hedge (bool): Whether to hedge requests not responded to within the 95th percentile of the latency
+                of the host, unless requests to the host are spaced out
+
+        """
+        self._min_interval = min_interval
+        self._max_crawl_delay = max_crawl_delay
+        self._timeout_multiplier = timeout_multiplier
+        self._min_timeout = min_timeout
+        self._hedge = hedge
+        self._last_start: dict[str, float] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self._crawl_delays: dict[str, float] = {}
+        self.waits = 0
+        self.waited = 0.0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def get_interval(self, crawl_delay: float | None = None) -> float:
+        """
+        Get the minimum seconds between starts of requests to a host.
+
+        Args:
+            crawl_delay (float | None): Crawl delay the host asks for, if any
+
+        Returns:
+            float: The interval
+
+        """
+        return max(self._min_interval, min(crawl_delay or 0, self._max_crawl_delay))
+
+    def is_requested(self, url: str) -> bool:
+        """
+        Check whether a request to the host of the URL started recently, resp. is scheduled to start.
+
+        Args:
+            url (str): The URL to request
+
+        Returns:
+            bool: Whether the host is tracked, so further requests to it are spaced out
+
+        """
+        return _get_host(url) in self._last_start
+
+    def record_crawl_delay(self, url: str, crawl_delay: float | None) -> None:
+        """
+        Record the crawl delay the host of the URL asks for, applied to requests to it if not known otherwise.
+
+        Args:
+            url (str): A URL of the host, e.g. of its robots.txt
+            crawl_delay (float | None): Crawl delay the host asks for, None if it does not ask for one
+
+        """
+        host = _get_host(url)
+        self._crawl_delays.pop(host, None)
+        self._crawl_delays[host] = crawl_delay or 0.0  # most recently recorded last, so evicted last
+        if len(self._crawl_delays) > MAX_HOSTS_TRACKED:
+            del self._crawl_delays[next(iter(self._crawl_delays))]
+
+    def get_crawl_delay(self, url: str) -> float | None:
+        """
+        Get the crawl delay last recorded for the host of the URL.
+
+        Args:
+            url (str): The URL to request
+
+        Returns:
+            float | None: The crawl delay, 0 if the host does not ask for one, or None if not recorded
+
+        """
+        return self._crawl_delays.get(_get_host(url))
+
+    async def wait(self, url: str, crawl_delay: float | None = None) -> None:
+        """
+        Wait until a request to the host of the URL may start, reserving the start for the request.
+
+        Args:
+            url (str): The URL to request
+            crawl_delay (float | None): Crawl delay the host asks for, if known. If None, the crawl delay
+                last recorded for the host applies, if any.
+
+        """
+        host = _get_host(url)
+        if crawl_delay is None:
+            crawl_delay = self._crawl_delays.get(host)
+        now = time.monotonic()
+        last_start = self._last_start.get(host)
+        start = now if last_start is None else max(now, last_start + self.get_interval(crawl_delay))
+        self._last_start[host] = start
+        if len(self._last_start) > MAX_HOSTS_TRACKED:
+            horizon = now - max(self._min_interval, self._max_crawl_delay)
+            self._last_start = {host: started for host, started in self._last_start.items() if started > horizon}
+        if start > now:
+            self.waits += 1
+            self.waited += start - now
+            logger.debug("Waiting %.3fs before requesting %s, spacing out requests to its host", start - now, url)
+            await asyncio.sleep(start - now)
+
+    def record_latency(self, url: str, seconds: float) -> None:
+        """
+        Record the latency of a request to the host of the URL, i.e. the seconds until its response headers.
+
+        Args:
+            url (str): The URL requested
+            seconds (float): The latency, resp. the timeout if the request timed out
+
+        """
+        host = _get_host(url)
+        latencies = self._latencies.pop(host, None) or deque(maxlen=LATENCY_WINDOW)
+        latencies.append(seconds)
+        self._latencies[host] = latencies  # most recently requested last, so evicted last
+        if len(self._latencies) > MAX_HOSTS_TRACKED:
+            del self._latencies[next(iter(self._latencies))]
+
+    def get_latency_percentile(self, url: str, percentile: float) -> float | None:
+        """
+        Get a percentile of the latest latencies of requests to the host of the URL.
+
+        Args:
+            url (str): The URL to request
+            percentile (float): The percentile, between 0 and 100
+
+        Returns:
+            float | None: The latency in seconds, or None if too few requests to the host were recorded
+
+        """
+        latencies = self._latencies.get(_get_host(url))
+        if latencies is None or len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    def get_timeout(self, url: str, timeout: float) -> float:
+        """
+        Get the timeout of a request to the host of the URL, adapted to the latency of the host.
+
+        Args:
+            url (str): The URL to request
+            timeout (float): The configured timeout in seconds, capping the adaptive timeout
+
+        Returns:
+            float: The multiple of the 99th percentile of the latency of the host, within the minimum and the
+                configured timeout, resp. the configured timeout if adaptive timeouts are disabled or too few
+                requests to the host were recorded
+
+        """
+        p99 = self.get_latency_percentile(url, 99) if self._timeout_multiplier else None
+        if p99 is None:
+            return timeout
+        return min(timeout, max(self._min_timeout, p99 * self._timeout_multiplier))
+
+    def get_hedge_delay(self, url: str, crawl_delay: float | None = None) -> float | None:
+        """
+        Get the seconds after which to hedge a request to the host of the URL, if not responded to.
+
+        Args:
+            url (str): The URL to request
+            crawl_delay (float | None): Crawl delay the host asks for, if known. If None, the crawl delay
+                last recorded for the host applies, if any.
+
+        Returns:
+            float | None: The 95th percentile of the latency of the host, or None if requests are not to be hedged,
+                as hedging is disabled, requests to the host are spaced out, or too few were recorded
+
+        """
+        if crawl_delay is None:
+            crawl_delay = self.get_crawl_delay(url)
+        if not self._hedge or self.get_interval(crawl_delay) > 0:
+            return None
+        return self.get_latency_percentile(url, 95)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get statistics about the scheduler.
+
+        Returns:
+            dict[str, Any]: Number of hosts tracked, requests that had to wait and total seconds waited,
+                hosts with latencies known, requests hedged and hedges responded to first
+
+        """
+        return {
+            "hosts": len(self._last_start),
+            "waits": self.waits,
+            "waited": round(self.waited, 3),
+            "latency_hosts": sum(len(latencies) >= MIN_LATENCY_SAMPLES for latencies in self._latencies.values()),
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+        }
+
+
+def _get_host(url: str) -> str:
+    """
+    Get the host of the URL, as requests are scheduled per host.
+
+    Args:
+        url (str): The URL
+
+    Returns:
+        str: The host, including the port if given, lowercased
+
+    """
+    return urlparse(url).netloc.lower()
+
+
+@dataclass
+class _Flight(Generic[T]):
+    """Call in flight, with the number of callers awaiting it."""
+
+    task: asyncio.Task[T]
+    waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls with the same key, so only the first is carried out and all share its outcome.
+
+    The call is carried out as a task of its own, so a caller being cancelled does not cancel it for the others.
+    It is cancelled only if all of its callers are cancelled.
+    """
+
+    def __init__(self) -> None:
+        """Initialize without calls in flight."""
+        self._flights: dict[Hashable, _Flight[T]] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, coroutine_function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call and await the coroutine function, unless a call with the same key is in flight, awaiting that instead.
+
+        Args:
+            key (Hashable): Key identifying calls with the same outcome
+            coroutine_function (Callable[[], Awaitable[T]]): The coroutine function to call if none is in flight
+
+        Returns:
+            T: The outcome of the call in flight, shared by all callers with the same key
+
+        Raises:
+            asyncio.CancelledError: If the caller is cancelled
+
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            logger.debug("Joining call in flight for %s", key)
+        else:
+
+            async def call() -> T:
+                return await coroutine_function()
+
+            flight = self._flights[key] = _Flight(task=asyncio.create_task(call()))
+            self.flights += 1
+            flight.task.add_done_callback(lambda task: self._forget(key, task))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight.task)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Check whether a call with the key is in flight.
+
+        Args:
+            key (Hashable): Key of the call
+
+        Returns:
+            bool: Whether a call with the key is in flight
+
+        """
+        return key in self._flights
+
+    def _forget(self, key: Hashable, task: asyncio.Task[T]) -> None:
+        """
+        Forget the call, unless another call with the same key took its place.
+
+        Args:
+            key (Hashable): Key of the call
+            task (asyncio.Task[T]): Task carrying out the call
+
+        """
+        flight = self._flights.get(key)
+        if flight is not None and flight.task is task:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get statistics about the calls.
+
+        Returns:
+            dict[str, Any]: Number of calls and callers in flight, calls carried out and callers that joined
+                a call in flight
+
+        """
+        return {
+            "in_flight": len(self._flights),
+            "waiters": sum(flight.waiters for flight in self._flights.values()),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+        }
+
+
+class CircuitState(StrEnum):
+    """States of the circuit of a host."""
+
+    CLOSED = "closed"  # requests pass
+    OPEN = "open"  # requests are rejected until the cool-down passed
+    HALF_OPEN = "half_open"  # a single trial request passes, closing resp. opening the circuit again
+
+
+@dataclass
+class _Circuit:
+    """Circuit of a host that failed, with its consecutive failures."""
+
+    state: CircuitState = CircuitState.CLOSED
+    failures: int = 0
+    opened: float = 0.0  # monotonic time the circuit opened at
+    trial: bool = False  # whether the trial request of the half-open circuit is in flight
+
+
+class CircuitBreaker(Generic[T]):
+    """
+    Fails requests to hosts fast while they are down, instead of waiting for each request to time out.
+
+    The circuit of a host opens after consecutive failures, rejecting requests to the host. Once the cool-down
+    passed, the circuit is half-open: a single trial request passes, closing the circuit if it succeeds,
+    opening it again if it fails.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        """
+        Initialize the circuit breaker with all circuits closed.
+
+        Args:
+            failure_threshold (int): Consecutive failures of a host opening its circuit. 0 disables the breaker.
+            cooldown (float): Seconds the circuit of a host stays open before a trial request passes
+
+        """
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._circuits: dict[str, _Circuit] = {}
+        self.trips = 0
+        self.rejected = 0
+
+    def get_state(self, url: str) -> CircuitState:
+        """
+        Get the state of the circuit of the host of the URL.
+
+        Args:
+            url (str): The URL to request
+
+        Returns:
+            CircuitState: The state, half-open once the cool-down of an open circuit passed
+
+        """
+        return self._get_state(self._circuits.get(_get_host(url)))
+
+    def _get_state(self, circuit: _Circuit | None) -> CircuitState:
+        """
+        Get the state of the circuit, as of now.
+
+        Args:
+            circuit (_Circuit | None): The circuit of a host, or None if the host did not fail
+
+        Returns:
+            CircuitState: The state, half-open once the cool-down of an open circuit passed
+
+        """
+        if circuit is None:
+            return CircuitState.CLOSED
+        if circuit.state == CircuitState.OPEN and time.monotonic() - circuit.opened >= self._cooldown:
+            return CircuitState.HALF_OPEN
+        return circuit.state
+
+    def check(self, url: str) -> None:
+        """
+        Check requests to the host of the URL pass, e.g. before requesting further resources of the host.
+
+        Args:
+            url (str): The URL to request
+
+        Raises:
+            HostUnavailableError: If the circuit of the host is open, resp. half-open with the trial request
+                in flight
+
+        """
+        host = _get_host(url)
+        circuit = self._circuits.get(host)
+        state = self._get_state(circuit)
+        if circuit is None or state == CircuitState.CLOSED or (state == CircuitState.HALF_OPEN and not circuit.trial):
+            return
+        self.rejected += 1
+        retry_in = max(0.0, circuit.opened + self._cooldown - time.monotonic())
+        message = (
+            f"Not requesting {url}, as {host} failed {circuit.failures} times in a row and is assumed to be down. "
+            + (
+                f"It is requested again in {retry_in:.0f}s."
+                if state == CircuitState.OPEN
+                else "A trial request to check it is up again is in flight."
+            )
+            + " The assistant can tell the user to try again later."
+        )
+        raise HostUnavailableError(message)
+
+    async def call(
+        self,
+        url: str,
+        coroutine_function: Callable[[], Awaitable[T]],
+        is_failure: Callable[[T | Exception], bool],
+    ) -> T:
+        """
+        Call the coroutine function requesting the URL, unless the circuit of its host rejects requests.
+
+        Args:
+            url (str): The URL to request
+            coroutine_function (Callable[[], Awaitable[T]]): The coroutine function requesting the URL
+            is_failure (Callable[[T | Exception], bool]): Whether the outcome of the call, its result
+                resp. the exception raised, is a failure of the host, e.g. a timeout or server error
+
+        Returns:
+            T: The result of the call
+
+        Raises:
+            HostUnavailableError: If the circuit of the host rejects requests
+
+        """
+        if not self._failure_threshold:
+            return await coroutine_function()
+        self.check(url)
+        host = _get_host(url)
+        circuit = self._circuits.get(host)
+        if circuit is not None and self._get_state(circuit) == CircuitState.HALF_OPEN:
+            logger.info("Sending trial request to %s, as the cool-down of its circuit passed", host)
+            circuit.state = CircuitState.HALF_OPEN
+            circuit.trial = True
+        try:
+            result = await coroutine_function()
+        except Exception as e:
+            self._record(host, is_failure(e))
+            raise
+        finally:
+            if circuit is not None:
+                circuit.trial = False  # also if cancelled, so another trial request may pass
+        self._record(host, is_failure(result))
+        return result
+
+    def _record(self, host: str, failed: bool) -> None:
+        """
+        Record the outcome of a request to the host, opening resp. closing its circuit.
+
+        Args:
+            host (str): The host requested
+            failed (bool): Whether the request failed
+
+        """
+        if not failed:
+            circuit = self._circuits.pop(host, None)
+            if circuit is not None and circuit.state != CircuitState.CLOSED:
+                logger.info("Closed circuit of %s, as it responded again", host)
+            return
+        circuit = self._circuits.pop(host, None) or _Circuit()
+        self._circuits[host] = circuit  # most recently failed last, so evicted last
+        if len(self._circuits) > MAX_HOSTS_TRACKED:
+            del self._circuits[next(iter(self._circuits))]
+        circuit.failures += 1
+        if circuit.state == CircuitState.HALF_OPEN or (
+            circuit.state == CircuitState.CLOSED and circuit.failures >= self._failure_threshold
+        ):
+            self.trips += 1
+            logger.warning(
+                "Opened circuit of %s after %d failures in a row, rejecting requests for %.0fs",
+                host,
+                circuit.failures,
+                self._cooldown,
+            )
+        if circuit.state != CircuitState.CLOSED or circuit.failures >= self._failure_threshold:
+            circuit.state = CircuitState.OPEN
+            circuit.opened = time.monotonic()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get statistics about the circuits.
+
+        Returns:
+            dict[str, Any]: State of the circuit of each host not closed, number of hosts failing with circuits
+                still closed, circuits opened and requests rejected
+
+        """
+        states = {host: self._get_state(circuit) for host, circuit in self._circuits.items()}
+        return {
+            "circuits": {host: state.value for host, state in states.items() if state != CircuitState.CLOSED},
+            "failing": sum(state == CircuitState.CLOSED for state in states.values()),
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
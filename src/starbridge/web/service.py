@@ -1,32 +1,236 @@
 """Handles interaction with the world wide web."""
 
+import asyncio
+import multiprocessing
+import os
+import secrets
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http import HTTPStatus
+from typing import TYPE_CHECKING, TypeVar
+from urllib.parse import urldefrag, urlparse
+
+from httpx import AsyncClient, HTTPError, Response
+
 from starbridge.mcp import MCPBaseService, MCPContext, mcp_tool
 from starbridge.utils import Health, get_logger
 
-from .models import GetResult
+from .cache import ResponseCache, TransformationCache, TTLCache
+from .models import (
+    CompactLinkTarget,
+    CrawledPage,
+    GetManyResult,
+    GetResult,
+    LinkTarget,
+    MimeType,
+    Pagination,
+    Resource,
+)
+from .scheduler import CircuitBreaker, HostScheduler, SingleFlight
 from .settings import Settings
 from .utils import (
-    extract_links_from_response,
+    LlmsTxt,
+    ParsedDocument,
+    RobotsTxt,
+    TruncatedResponse,
+    convert_excel_sheets,
+    convert_pdf_pages,
+    create_http_client,
     get_additional_context_for_url,
+    get_page_numbers,
+    get_pdf_page_count,
     get_respectfully,
+    get_transformation_key,
     is_connected,
+    process_response_compact,
     transform_content,
 )
 
+if TYPE_CHECKING:
+    from multiprocessing.synchronize import Barrier
+
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+WORKER_STARTUP_TIMEOUT = 120  # seconds for all worker processes of a pool to import starbridge, else the pool breaks
+
 
 class Service(MCPBaseService):
     """Service class for web operations."""
 
     _settings: Settings
+    _client: AsyncClient | None
+    _client_loop: asyncio.AbstractEventLoop | None
+    _robots_txt_cache: TTLCache[str, RobotsTxt]
+    _llms_txt_cache: TTLCache[tuple[str, str], LlmsTxt]
+    _pagination_cache: TTLCache[str, GetResult]
+    _response_cache: ResponseCache | None
+    _transformation_cache: TransformationCache | None
+    _scheduler: HostScheduler
+    _circuit_breaker: CircuitBreaker[Response]
+    _fetches: SingleFlight[Response]
+    _robots_txt_fetches: SingleFlight[RobotsTxt]
+    _processes: SingleFlight[GetResult]
+    _transform_pool: ProcessPoolExecutor | None
+    _transform_pool_started: list[Future[int]]
+    _transform_slots: asyncio.Semaphore | None
+    _transform_slots_loop: asyncio.AbstractEventLoop | None
 
     def __init__(self) -> None:
         """Initialize the web service with default settings."""
         super().__init__(Settings)
+        self._client = None
+        self._client_loop = None
+        self._robots_txt_cache = TTLCache(
+            max_entries=self._settings.robots_txt_cache_max_entries,
+            default_ttl=self._settings.robots_txt_cache_ttl,
+        )
+        self._llms_txt_cache = TTLCache(
+            max_entries=self._settings.llms_txt_cache_max_entries,
+            default_ttl=self._settings.llms_txt_cache_ttl,
+        )
+        self._pagination_cache = TTLCache(
+            max_entries=self._settings.pagination_cache_max_entries,
+            default_ttl=self._settings.pagination_cache_ttl,
+        )
+        self._response_cache = (
+            ResponseCache(
+                path=self._settings.response_cache_path,
+                max_bytes=self._settings.response_cache_max_bytes,
+                default_ttl=self._settings.response_cache_ttl,
+            )
+            if self._settings.response_cache
+            else None
+        )
+        self._transformation_cache = (
+            TransformationCache(
+                path=self._settings.transformation_cache_path,
+                max_bytes=self._settings.transformation_cache_max_bytes,
+            )
+            if self._settings.transformation_cache
+            else None
+        )
+        self._scheduler = HostScheduler(
+            min_interval=self._settings.min_request_interval,
+            max_crawl_delay=self._settings.max_crawl_delay,
+            timeout_multiplier=self._settings.adaptive_timeout_multiplier,
+            min_timeout=self._settings.adaptive_timeout_min,
+            hedge=self._settings.hedge_requests,
+        )
+        self._circuit_breaker = CircuitBreaker(
+            failure_threshold=self._settings.circuit_breaker_failures,
+            cooldown=self._settings.circuit_breaker_cooldown,
+        )
+        self._fetches = SingleFlight()
+        self._robots_txt_fetches = SingleFlight()
+        self._processes = SingleFlight()
+        self._transform_pool = None
+        self._transform_pool_started = []
+        self._transform_slots = None
+        self._transform_slots_loop = None
+
+    def _get_client(self) -> AsyncClient:
+        """
+        Get the pooled HTTP client shared by all requests of this service.
+
+        The client is created lazily, as its connection pool is bound to the running event loop.
+
+        Returns:
+            AsyncClient: The shared HTTP client
+
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = create_http_client(
+                http2=self._settings.http2,
+                max_connections=self._settings.max_connections,
+                max_keepalive_connections=self._settings.max_keepalive_connections,
+                keepalive_expiry=self._settings.keepalive_expiry,
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _get_transform_pool(self) -> ProcessPoolExecutor:
+        """
+        Get the pool of worker processes transforming content off the event loop.
+
+        All workers are started when the pool is created, none running a task before all are started,
+        so the transform timeout does not count starting a worker.
+
+        Returns:
+            ProcessPoolExecutor: The pool, created on first use
+
+        """
+        if self._transform_pool is None:
+            context = multiprocessing.get_context("spawn")  # forking a process running an event loop is unsafe
+            self._transform_pool = ProcessPoolExecutor(
+                max_workers=self._settings.transform_workers,
+                mp_context=context,
+                initializer=_wait_for_workers,
+                initargs=(context.Barrier(self._settings.transform_workers),),
+            )
+            self._transform_pool_started = [
+                self._transform_pool.submit(os.getpid) for _ in range(self._settings.transform_workers)
+            ]
+        return self._transform_pool
+
+    def _get_transform_slots(self) -> asyncio.Semaphore:
+        """
+        Get the slots limiting the tasks handed to the pool of worker processes to one per worker.
+
+        As tasks are not queued in the pool, their timeout counts the time they run only.
+        The slots are created lazily, as a semaphore is bound to the running event loop.
+
+        Returns:
+            asyncio.Semaphore: The slots, one per worker process
+
+        """
+        loop = asyncio.get_running_loop()
+        if self._transform_slots is None or self._transform_slots_loop is not loop:
+            self._transform_slots = asyncio.Semaphore(self._settings.transform_workers)
+            self._transform_slots_loop = loop
+        return self._transform_slots
+
+    def _discard_transform_pool(self, pool: ProcessPoolExecutor | None = None) -> None:
+        """
+        Discard the pool of worker processes, terminating its workers, so the next task starts a fresh pool.
+
+        Tasks of other callers still running in the discarded pool fail with BrokenProcessPool,
+        while tasks waiting for a slot are handed to the fresh pool.
+
+        Args:
+            pool (ProcessPoolExecutor | None): The pool to discard, if not the current one
+
+        """
+        pool = pool or self._transform_pool
+        if pool is None:
+            return
+        if pool is self._transform_pool:
+            self._transform_pool = None
+            self._transform_pool_started = []
+        for process in list((pool._processes or {}).values()):  # noqa: SLF001
+            process.terminate()  # workers stuck in a task would not exit otherwise
+        pool.shutdown(wait=False)
+
+    async def shutdown(self) -> None:
+        """Close the shared HTTP client, the persistent caches and the pool of worker processes, if any."""
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+        if self._response_cache is not None:
+            self._response_cache.close()
+        if self._transformation_cache is not None:
+            self._transformation_cache.close()
+        self._discard_transform_pool()
 
     @mcp_tool()
-    def health(self, context: MCPContext | None = None) -> Health:  # noqa: PLR6301, ARG002
+    def health(self, context: MCPContext | None = None) -> Health:  # noqa: ARG002
         """
         Check health of the web service.
 
@@ -34,18 +238,22 @@ class Service(MCPBaseService):
             context (MCPContext | None): MCP context for the operation
 
         Returns:
-            Health: The health status of the web service
+            Health: The health status of the web service, down if offline or while circuits of hosts failing
+                are not closed, listing these circuits
 
         """
+        reasons = []
         if not is_connected():
-            return Health(
-                status=Health.Status.DOWN,
-                reason="No internet connection (cannot reach google.com)",
-            )
+            reasons.append("No internet connection (cannot reach google.com)")
+        if circuits := self._circuit_breaker.stats()["circuits"]:
+            reasons.append(f"circuits of hosts failing: {circuits}")
+        if reasons:
+            reason = ", ".join(reasons)
+            return Health(status=Health.Status.DOWN, reason=reason[0].upper() + reason[1:])
         return Health(status=Health.Status.UP)
 
     @mcp_tool()
-    def info(self, context: MCPContext | None = None) -> dict:  # noqa: PLR6301, ARG002
+    def info(self, context: MCPContext | None = None) -> dict:  # noqa: ARG002
         """
         Info about web environment.
 
@@ -53,10 +261,30 @@ class Service(MCPBaseService):
             context (MCPContext | None): MCP context for the operation
 
         Returns:
-            dict: Information about the web environment
+            dict: Information about the web environment, including hit and miss counters of caches,
+                how often requests waited to space out requests to the same host, how many
+                fetches resp. processing of content were in flight, carried out, or joined by identical requests,
+                and the state of the circuits of hosts failing
 
         """
-        return {}
+        return {
+            "caches": {
+                "robots_txt": self._robots_txt_cache.stats(),
+                "llms_txt": self._llms_txt_cache.stats(),
+                "pagination": self._pagination_cache.stats(),
+                "responses": self._response_cache.stats() if self._response_cache is not None else None,
+                "transformations": (
+                    self._transformation_cache.stats() if self._transformation_cache is not None else None
+                ),
+            },
+            "scheduler": self._scheduler.stats(),
+            "coalescing": {
+                "fetches": self._fetches.stats(),
+                "robots_txt_fetches": self._robots_txt_fetches.stats(),
+                "processes": self._processes.stats(),
+            },
+            "circuit_breaker": self._circuit_breaker.stats(),
+        }
 
     @mcp_tool()
     async def get(  # noqa: PLR0913, PLR0917
@@ -64,10 +292,16 @@ class Service(MCPBaseService):
         url: str,
         accept_language: str = "en-US,en;q=0.9,de;q=0.8",
         transform_to_markdown: bool = True,
+        main_content: bool = False,
         extract_links: bool = True,
         additional_context: bool = True,
         llms_full_txt: bool = False,
         force_not_respecting_robots_txt: bool = False,
+        use_cache: bool = True,
+        pages: str | None = None,
+        sheets: str | None = None,
+        max_chars: int | None = None,
+        cursor: str | None = None,
         context: MCPContext | None = None,  # noqa: ARG002
     ) -> GetResult:
         """
@@ -82,8 +316,10 @@ class Service(MCPBaseService):
             - This includes asks to download a pdf
         Further tips:
             - The agent is to disable transform to markdown, extract links, and additional context in error cases only.
-            - The agent can use this tool to crawl multiple pages. I.e. when asked to crawl a URL use a get call, than
-                look at the top links extracted, follow them, and in the end provide a summary.
+            - When asked to crawl a URL, the agent is to use the crawl tool instead of following extracted links
+                one get call at a time, and in the end provide a summary.
+            - For large documents such as long PDFs, the agent is to set max_chars and get further parts
+                by passing the returned pagination.next_cursor as cursor, as far as needed.
 
         Args:
             url (str): The URL to fetch content from
@@ -92,6 +328,9 @@ class Service(MCPBaseService):
                 The assistant can prompt the user for the language preferred, and set this header accordingly.
             transform_to_markdown (bool, optional): If set will transform content to markdown if possible.
                 Defaults to true. If the transformation is not supported, the content will be returned as is
+            main_content (bool, optional): If set will transform the main content of HTML pages only,
+                dropping navigation, footers, banners and other boilerplate. Defaults to False.
+                The assistant is to set it when interested in the article of a page, not its navigation.
             extract_links (bool, optional): If set will extract links from the content. Defaults to True.
                 Supported for selected content types only
             additional_context (bool, optional): If set will include additional context about the URL
@@ -102,6 +341,18 @@ class Service(MCPBaseService):
                 If False, the agent will respect robots.txt if the environment variable
                 STARBRIDGE_WEB_RESPPECT_ROBOTS_TXT is set to 1.
                 Defaults to False.
+            use_cache (bool, optional): Whether to serve from resp. store in the response cache, if enabled.
+                The assistant is to disable it if the user asks for the latest content. Defaults to True.
+            pages (str | None, optional): Pages of PDF documents to transform only, as comma-separated one-based
+                page numbers resp. ranges thereof, e.g. 10-20 or 1,3,5-. Defaults to None, i.e. all pages.
+                The assistant is to set it when the user asks about specific pages of a long document.
+            sheets (str | None, optional): Sheets of Excel documents to transform only, as comma-separated names.
+                Defaults to None, i.e. all sheets. Each sheet is summarized by its dimensions and column types,
+                followed by its first rows as a table.
+            max_chars (int | None, optional): Maximum number of characters of text to return. If the text is longer,
+                the first part is returned with a cursor to get the next. Defaults to None, i.e. the full text.
+            cursor (str | None, optional): Cursor returned by a previous get of the URL, to get the next part
+                of the text without fetching again. Other arguments but max_chars are ignored. Defaults to None.
             context (MCPContext | None, optional): Context object for request tracking. Defaults to None.
 
         Returns:
@@ -113,6 +364,7 @@ class Service(MCPBaseService):
                 - 'text' (string): the transformed textual content, resp. the original content if no transformation
                     applied
                 - 'blob' (bytes): the binary content of the resource, if the resource has binary content
+                - 'truncated' (bool): whether the content is incomplete, as the resource exceeded the maximum size
             'extracted_links': Optional list of links extracted from the resource, if extract_links=True.
                 Sorted by number of occurrences of a URL in the resource. Each item has:
                 - 'url' (string) the URL of the link
@@ -123,32 +375,632 @@ class Service(MCPBaseService):
                 - 'type' (string) the type of context, e.g. llms_txt for text specifally prepared by a domain for an
                     assistant to read
                 - 'text' (string) the content of the context in markdown format
+            'pagination': Optional part of the text returned (only if the text exceeded max_chars resp. a cursor
+                was passed). Extracted links and additional context are only included with the first part. Has:
+                - 'offset' (int) the offset in characters of the part in the full text
+                - 'total_chars' (int) the number of characters of the full text
+                - 'next_cursor' (string) the cursor to get the next part, if the text is not complete
 
         Raises:
             starbridge.web.RobotForbiddenError: If we are not allowed to crawl the URL autonomously
+            starbridge.web.HostUnavailableError: If the host failed repeatedly, so is not requested until a cool-down
+                passed, unless a fresh response is cached
             requests.exceptions.RequestException: If the HTTP get request failed
-            ValueError: If an invalid format was passed
+            ValueError: If an invalid format, invalid page ranges, unknown sheets or max_chars below 1 were passed,
+                or the cursor expired
 
         """
-        response = await get_respectfully(
+        if max_chars is not None and max_chars < 1:
+            message = f"max_chars must be at least 1, got {max_chars}"
+            raise ValueError(message)
+        if cursor is not None:
+            return self._get_next_part(cursor, max_chars)
+        timings: dict[str, float] = {}
+        started = time.perf_counter()
+        client = self._get_client()
+        respect_robots_txt = (not force_not_respecting_robots_txt) and self._settings.respect_robots_txt
+        fetch_key = (ResponseCache.get_key(url, accept_language), respect_robots_txt, use_cache)
+        fresh = use_cache and self._response_cache is not None and self._response_cache.is_fresh(fetch_key[0])
+        if not fresh:
+            self._circuit_breaker.check(url)  # before looking up additional context, so failing fast
+        additional_context_task = (
+            asyncio.create_task(
+                _timed(
+                    partial(
+                        get_additional_context_for_url,
+                        url=url,
+                        user_agent=self._settings.user_agent,
+                        accept_language=accept_language,
+                        timeout=self._settings.timeout,
+                        full=llms_full_txt,
+                        client=client,
+                        llms_txt_cache=self._llms_txt_cache,
+                        scheduler=self._scheduler,
+                    ),
+                    timings,
+                    "additional_context",
+                ),
+            )
+            if additional_context
+            else None
+        )
+        fetch = partial(
+            get_respectfully,
             url=url,
-            respect_robots_txt=(not force_not_respecting_robots_txt) and self._settings.respect_robots_txt,
+            respect_robots_txt=respect_robots_txt,
             user_agent=self._settings.user_agent,
             accept_language=accept_language,
             timeout=self._settings.timeout,
+            client=client,
+            robots_txt_cache=self._robots_txt_cache,
+            speculative_fetch=self._settings.speculative_fetch,
+            max_body_size=self._settings.max_body_size,
+            max_body_size_per_mime_type=self._settings.max_body_size_per_mime_type,
+            response_cache=self._response_cache if use_cache else None,
+            scheduler=self._scheduler,
+            robots_txt_fetches=self._robots_txt_fetches,
+        )
+        try:
+            response = await _timed(
+                partial(
+                    self._fetches.do,
+                    fetch_key,
+                    fetch if fresh else partial(self._circuit_breaker.call, url, fetch, _is_host_failure),
+                ),
+                timings,
+                "fetch",
+            )
+            processed = await _timed(
+                partial(
+                    self._processes.do,
+                    (*fetch_key, transform_to_markdown, main_content, extract_links, pages, sheets),
+                    partial(
+                        self._process,
+                        response,
+                        transform_to_markdown,
+                        extract_links,
+                        main_content,
+                        pages,
+                        sheets,
+                    ),
+                ),
+                timings,
+                "process",
+            )
+            rtn = processed.model_copy()  # the processed result may be shared with identical requests
+            if additional_context_task is not None:
+                rtn.additional_context = await additional_context_task
+        except BaseException:
+            if additional_context_task is not None:
+                additional_context_task.cancel()
+                await asyncio.gather(additional_context_task, return_exceptions=True)
+            raise
+
+        timings["total"] = time.perf_counter() - started
+        logger.debug(
+            "Timings of getting %s: %s",
+            url,
+            ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()),
         )
-        rtn = GetResult(resource=transform_content(response, transform_to_markdown))
+        if max_chars is not None and rtn.resource.text is not None and len(rtn.resource.text) > max_chars:
+            token = secrets.token_urlsafe(12)
+            self._pagination_cache.set(token, rtn)
+            return _get_part(rtn, token, 0, max_chars, first=True)
+        return rtn
+
+    def _get_next_part(self, cursor: str, max_chars: int | None) -> GetResult:
+        """
+        Get the part of the text of a resource the cursor points to, from the resources returned in parts before.
+
+        Args:
+            cursor (str): Cursor returned with the previous part
+            max_chars (int | None): Maximum number of characters of text to return. If None, the rest of the text.
+
+        Returns:
+            GetResult: The result with the part of the text
+
+        Raises:
+            ValueError: If the cursor is invalid, or the resource is no longer kept
+
+        """
+        token, _, offset = cursor.rpartition(":")
+        result = self._pagination_cache.get(token) if offset.isdigit() else None
+        if result is None:
+            message = f"Cursor {cursor} is invalid or expired, get the URL again without cursor"
+            raise ValueError(message)
+        return _get_part(result, token, int(offset), max_chars, first=False)
+
+    @mcp_tool()
+    async def get_many(  # noqa: PLR0913, PLR0917
+        self,
+        urls: list[str],
+        accept_language: str = "en-US,en;q=0.9,de;q=0.8",
+        transform_to_markdown: bool = True,
+        main_content: bool = False,
+        extract_links: bool = True,
+        additional_context: bool = True,
+        llms_full_txt: bool = False,
+        force_not_respecting_robots_txt: bool = False,
+        use_cache: bool = True,
+        context: MCPContext | None = None,  # noqa: ARG002
+    ) -> list[GetManyResult]:
+        """
+        Fetch many pages from the world wide web via HTTP GET concurrently.
+
+        Should be called by the assistant instead of calling get repeatedly when it already knows several URLs
+            to fetch, e.g. the top links extracted from a page when asked to crawl.
+        Fetches are limited to STARBRIDGE_WEB_MAX_CONCURRENT_REQUESTS overall and
+            STARBRIDGE_WEB_MAX_CONCURRENT_REQUESTS_PER_HOST per host.
+        A URL failing to be fetched, e.g. as forbidden by robots.txt, does not fail the others.
+
+        Args:
+            urls (list[str]): The URLs to fetch content from
+            accept_language (str, optional): Accept-Language header to send as part of the get requests.
+                Defaults to en-US,en;q=0.9,de;q=0.8.
+            transform_to_markdown (bool, optional): If set will transform content to markdown if possible.
+                Defaults to true.
+            main_content (bool, optional): If set will transform the main content of HTML pages only.
+                Defaults to False.
+            extract_links (bool, optional): If set will extract links from the content. Defaults to True.
+            additional_context (bool, optional): If set will include additional context about the URLs
+                or their domains in the response. Defaults to True.
+            llms_full_txt (bool, optional): Whether to include llms-full.txt in additional context. Defaults to False.
+            force_not_respecting_robots_txt (bool, optional): Whether to **not** check robots.txt.
+                Defaults to False.
+            use_cache (bool, optional): Whether to serve from resp. store in the response cache, if enabled.
+                Defaults to True.
+            context (MCPContext | None, optional): Context object for request tracking. Defaults to None.
+
+        Returns:
+            list of one item per URL, in the order requested. Each item has:
+                - 'url' (string) the URL as requested
+                - 'result' the result as returned by get, if the URL was fetched successfully
+                - 'error' (string) the error the get failed with, if not
+
+        """
+        semaphore = asyncio.Semaphore(self._settings.max_concurrent_requests)
+        host_semaphores: defaultdict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self._settings.max_concurrent_requests_per_host),
+        )
+
+        async def get_one(url: str) -> GetManyResult:
+            async with host_semaphores[urlparse(url).netloc.lower()], semaphore:
+                try:
+                    result = await self.get(
+                        url=url,
+                        accept_language=accept_language,
+                        transform_to_markdown=transform_to_markdown,
+                        main_content=main_content,
+                        extract_links=extract_links,
+                        additional_context=additional_context,
+                        llms_full_txt=llms_full_txt,
+                        force_not_respecting_robots_txt=force_not_respecting_robots_txt,
+                        use_cache=use_cache,
+                    )
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("Failed to get %s: %s", url, e)
+                    return GetManyResult(url=url, error=f"{type(e).__name__}: {e}")
+                return GetManyResult(url=url, result=result)
+
+        return list(await asyncio.gather(*(get_one(url) for url in urls)))
+
+    @mcp_tool()
+    async def crawl(  # noqa: PLR0913, PLR0917
+        self,
+        url: str,
+        max_depth: int = 1,
+        max_pages: int = 10,
+        same_origin: bool = True,
+        url_prefix: str | None = None,
+        main_content: bool = False,
+        accept_language: str = "en-US,en;q=0.9,de;q=0.8",
+        force_not_respecting_robots_txt: bool = False,
+        use_cache: bool = True,
+        context: MCPContext | None = None,  # noqa: ARG002
+    ) -> list[CrawledPage]:
+        """
+        Crawl the world wide web breadth-first, starting from the given URL and following extracted links.
+
+        Should be called by the assistant when the user asks to crawl a URL, a site or parts of it,
+            instead of following extracted links one get call at a time.
+        Each level of pages is fetched concurrently, as by get_many. Links are followed in order of their
+            occurrences on a page, each URL is visited once, ignoring fragments.
+
+        Args:
+            url (str): The seed URL to start crawling from
+            max_depth (int, optional): Maximum number of links to follow from the seed URL. Defaults to 1,
+                i.e. the seed URL and the pages it links to.
+            max_pages (int, optional): Maximum number of pages to visit, including the seed URL. Defaults to 10.
+                Capped by STARBRIDGE_WEB_CRAWL_MAX_PAGES.
+            same_origin (bool, optional): Whether to only follow links to the scheme and host of the seed URL.
+                Defaults to True.
+            url_prefix (str | None, optional): If set, only links starting with this prefix are followed,
+                e.g. https://example.com/docs/. Defaults to None.
+            main_content (bool, optional): If set will return the main content of HTML pages only,
+                dropping navigation, footers, banners and other boilerplate. Defaults to False.
+            accept_language (str, optional): Accept-Language header to send as part of the get requests.
+                Defaults to en-US,en;q=0.9,de;q=0.8.
+            force_not_respecting_robots_txt (bool, optional): Whether to **not** check robots.txt.
+                Defaults to False.
+            use_cache (bool, optional): Whether to serve from resp. store in the response cache, if enabled.
+                Defaults to True.
+            context (MCPContext | None, optional): Context object for request tracking. Defaults to None.
 
-        if extract_links:
-            rtn.extracted_links = extract_links_from_response(response)
+        Returns:
+            list of pages visited, in breadth-first order. Each item has:
+                - 'url' (string) the URL of the page as crawled
+                - 'depth' (int) the number of links followed from the seed URL to the page
+                - 'type' (string) the MIME type of the content
+                - 'title' (string) the title of the page, i.e. its first heading, if any
+                - 'text' (string) the content of the page, as markdown if possible
+                - 'link_count' (int) the number of links extracted from the page
+                - 'error' (string) the error fetching the page failed with, if any
 
-        if additional_context:
-            rtn.additional_context = await get_additional_context_for_url(
-                url=url,
-                user_agent=self._settings.user_agent,
+        """
+        max_pages = min(max_pages, self._settings.crawl_max_pages)
+        seed = urldefrag(url).url
+        origin = urlparse(seed)[:2]
+        seen = {seed}
+        frontier = [seed]
+        pages: list[CrawledPage] = []
+        for depth in range(max_depth + 1):
+            frontier = frontier[: max_pages - len(pages)]
+            if not frontier:
+                break
+            results = await self.get_many(
+                urls=frontier,
                 accept_language=accept_language,
-                timeout=self._settings.timeout,
-                full=llms_full_txt,
+                main_content=main_content,
+                additional_context=False,
+                force_not_respecting_robots_txt=force_not_respecting_robots_txt,
+                use_cache=use_cache,
             )
+            frontier = []
+            for item in results:
+                pages.append(_get_crawled_page(item, depth))
+                if item.result is None or depth == max_depth:
+                    continue
+                seen.add(urldefrag(str(item.result.resource.url)).url)  # final URL after redirects
+                for link in item.result.extracted_links or []:
+                    target = urldefrag(str(link.url)).url
+                    if (
+                        target in seen
+                        or (same_origin and urlparse(target)[:2] != origin)
+                        or (url_prefix and not target.startswith(url_prefix))
+                    ):
+                        continue
+                    seen.add(target)
+                    frontier.append(target)
+        return pages
 
-        return rtn
+    async def _process(  # noqa: PLR0913, PLR0917
+        self,
+        response: Response,
+        transform_to_markdown: bool,
+        extract_links: bool,
+        main_content: bool = False,
+        pages: str | None = None,
+        sheets: str | None = None,
+    ) -> GetResult:
+        """
+        Process the response of a get into its result, off the event loop if worker processes are configured.
+
+        Content exceeding the maximum task size, or failing to be processed in time, is returned as is.
+        Content converted to markdown before is taken from the transformation cache, if enabled.
+        PDF documents are converted in chunks of pages across the worker processes,
+        Excel documents sheet by sheet with rows and columns capped.
+
+        Args:
+            response (Response): The HTTP response to process
+            transform_to_markdown (bool): Whether to transform content to markdown if possible
+            extract_links (bool): Whether to extract links from the content
+            main_content (bool): Whether to transform the main content of HTML only
+            pages (str | None): Page ranges of PDF documents to transform only, if any
+            sheets (str | None): Names of the sheets of Excel documents to transform only, if any
+
+        Returns:
+            GetResult: The result without additional context
+
+        """
+        if len(response.content) > self._settings.transform_max_task_size:
+            logger.warning(
+                "Content of %s exceeds %d bytes, returning as is",
+                response.url,
+                self._settings.transform_max_task_size,
+            )
+            return GetResult(resource=transform_content(response, transform_to_markdown=False))
+
+        key = (
+            get_transformation_key(
+                response,
+                self._settings.html_parser,
+                main_content,
+                pages,
+                sheets,
+                self._settings.excel_max_rows or None,
+                self._settings.excel_max_columns or None,
+            )
+            if self._transformation_cache is not None and transform_to_markdown
+            else None
+        )
+        markdown = self._transformation_cache.get(key) if self._transformation_cache and key else None
+        cached = markdown is not None
+        try:
+            processed = await self._transform(
+                response,
+                transform_to_markdown,
+                extract_links,
+                main_content,
+                pages,
+                sheets,
+                markdown,
+            )
+        except (TimeoutError, BrokenProcessPool):
+            logger.exception("Failed to process content of %s in worker process, returning as is", response.url)
+            processed = None
+        if processed is None:
+            return GetResult(resource=transform_content(response, transform_to_markdown=False))
+        resource, extracted_links = processed
+
+        if self._transformation_cache and key and not cached and resource.type == MimeType.TEXT_MARKDWON:
+            self._transformation_cache.set(key, resource.text or "")
+        return GetResult(
+            resource=resource,
+            extracted_links=LinkTarget.from_compact(extracted_links) if extracted_links is not None else None,
+        )
+
+    async def _transform(  # noqa: PLR0913, PLR0917
+        self,
+        response: Response,
+        transform_to_markdown: bool,
+        extract_links: bool,
+        main_content: bool,
+        pages: str | None,
+        sheets: str | None,
+        markdown: str | None,
+    ) -> tuple[Resource, list[CompactLinkTarget] | None] | None:
+        """
+        Transform content and extract links, in worker processes if configured and not converted already.
+
+        Args:
+            response (Response): The HTTP response to process
+            transform_to_markdown (bool): Whether to transform content to markdown if possible
+            extract_links (bool): Whether to extract links from the content
+            main_content (bool): Whether to transform the main content of HTML only
+            pages (str | None): Page ranges of PDF documents to transform only, if any
+            sheets (str | None): Names of the sheets of Excel documents to transform only, if any
+            markdown (str | None): The content converted to markdown already, if cached
+
+        Returns:
+            tuple[Resource, list[CompactLinkTarget] | None] | None: Processed content, and extracted links
+                if requested, or None if the PDF resp. Excel document cannot be converted
+
+        """
+        document = ParsedDocument(response)
+        convert = transform_to_markdown and markdown is None and not isinstance(response, TruncatedResponse)
+        if (
+            convert
+            and document.content_type == MimeType.APPLICATION_PDF
+            and (pages or self._settings.transform_workers > 0)
+        ):
+            markdown = await self._convert_pdf(response, pages)
+            if markdown is None:
+                return None
+        elif convert and document.content_type == MimeType.APPLICATION_OPENXML_EXCEL:
+            markdown = await self._convert_excel(response, sheets)
+            if markdown is None:
+                return None
+        args = (
+            response,
+            transform_to_markdown,
+            extract_links,
+            self._settings.html_parser,
+            markdown,
+            main_content,
+            self._settings.max_extracted_links or None,
+        )
+        if self._settings.transform_workers == 0 or (
+            markdown is not None and not (extract_links and document.has_links)
+        ):
+            return process_response_compact(*args)
+        return await self._run_in_pool(process_response_compact, *args)
+
+    async def _convert_pdf(self, response: Response, pages: str | None) -> str | None:
+        """
+        Convert the selected pages of a PDF document to markdown, fanning out chunks of pages to worker processes.
+
+        Args:
+            response (Response): The HTTP response containing the PDF document
+            pages (str | None): Page ranges to convert only, e.g. 10-20. If None, all pages.
+
+        Returns:
+            str | None: The markdown of the pages in order, or None if the document cannot be converted
+
+        """
+        page_count = get_pdf_page_count(response)
+        if page_count is None:
+            return None
+        selected = get_page_numbers(pages, page_count) if pages else list(range(page_count))
+        if self._settings.transform_workers == 0:
+            return convert_pdf_pages(response, selected)
+        chunk_count = min(self._settings.transform_workers, -(-len(selected) // self._settings.pdf_pages_per_task))
+        chunks = [
+            selected[i * len(selected) // chunk_count : (i + 1) * len(selected) // chunk_count]
+            for i in range(chunk_count)
+        ]
+        parts = await asyncio.gather(*(self._run_in_pool(convert_pdf_pages, response, chunk) for chunk in chunks))
+        return None if any(part is None for part in parts) else "".join(part or "" for part in parts)
+
+    async def _convert_excel(self, response: Response, sheets: str | None) -> str | None:
+        """
+        Convert the selected sheets of an Excel document to markdown, in a worker process if configured.
+
+        Args:
+            response (Response): The HTTP response containing the Excel document
+            sheets (str | None): Comma-separated names of the sheets to convert only. If None, all sheets.
+
+        Returns:
+            str | None: The markdown of the sheets in order, or None if the document cannot be converted
+
+        """
+        args = (
+            response,
+            [name.strip() for name in sheets.split(",") if name.strip()] if sheets else None,
+            self._settings.excel_max_rows or None,
+            self._settings.excel_max_columns or None,
+        )
+        if self._settings.transform_workers == 0:
+            return convert_excel_sheets(*args)
+        return await self._run_in_pool(convert_excel_sheets, *args)
+
+    async def _run_in_pool(self, function: Callable[..., T], *args: object) -> T:
+        """
+        Run the function in the pool of worker processes, giving up after it ran for the transform timeout.
+
+        The timeout starts once a worker process is started and free to run the function, not while waiting for one.
+        If the pool was discarded while the function ran, as another task timed out or crashed a worker,
+        the function is run once more in the fresh pool.
+
+        Args:
+            function (Callable[..., T]): The function to run, picklable as are its arguments and result
+            *args (object): The arguments to call the function with
+
+        Returns:
+            T: The result of the function
+
+        Raises:
+            TimeoutError: If the function did not complete in time
+            BrokenProcessPool: If a worker process crashed running the function
+
+        """
+        retried = False
+        async with self._get_transform_slots():
+            while True:
+                pool = self._get_transform_pool()
+                started = asyncio.gather(*(asyncio.wrap_future(future) for future in self._transform_pool_started))
+                try:
+                    await asyncio.shield(started)  # not cancelled with the caller, as shared with other callers
+                    return await asyncio.wait_for(
+                        asyncio.get_running_loop().run_in_executor(pool, function, *args),
+                        timeout=self._settings.transform_timeout,
+                    )
+                except BrokenProcessPool:
+                    if pool is not self._transform_pool and not retried:
+                        retried = True
+                        continue
+                    self._discard_transform_pool(pool)
+                    raise
+                except TimeoutError:
+                    self._discard_transform_pool(pool)  # terminate the worker stuck in the function
+                    raise
+
+
+def _wait_for_workers(barrier: "Barrier") -> None:
+    """
+    Initialize a worker process, waiting until all workers of its pool are started.
+
+    Args:
+        barrier (Barrier): Barrier shared by the workers of the pool
+
+    """
+    barrier.wait(WORKER_STARTUP_TIMEOUT)
+
+
+def _is_host_failure(outcome: Response | Exception) -> bool:
+    """
+    Check whether the outcome of fetching a URL indicates its host is down.
+
+    Args:
+        outcome (Response | Exception): The response, resp. the exception fetching failed with
+
+    Returns:
+        bool: True for connection errors, timeouts and server errors, also if failing to fetch robots.txt
+
+    """
+    if isinstance(outcome, Response):
+        return outcome.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+    return isinstance(outcome, HTTPError) or isinstance(outcome.__cause__, HTTPError)
+
+
+def _get_part(result: GetResult, token: str, offset: int, max_chars: int | None, first: bool) -> GetResult:
+    """
+    Get the part of the text of the result starting at the offset, preferably ending at a line break.
+
+    Args:
+        result (GetResult): The result with the full text
+        token (str): Token the result is kept under for getting further parts
+        offset (int): Offset in characters of the part in the full text
+        max_chars (int | None): Maximum number of characters of the part. If None, the rest of the text.
+        first (bool): Whether to include extracted links and additional context, as for the first part
+
+    Returns:
+        GetResult: The result with the part of the text
+
+    """
+    text = result.resource.text or ""
+    end = len(text) if max_chars is None else min(offset + max_chars, len(text))
+    if end < len(text):
+        line_break = text.rfind("\n", offset + (end - offset) // 2, end)
+        if line_break != -1:
+            end = line_break + 1  # avoid cutting lines, unless they make up more than half of the part
+        elif end == offset:
+            end += 1  # always make progress
+    return GetResult(
+        resource=result.resource.model_copy(update={"text": text[offset:end]}),
+        extracted_links=result.extracted_links if first else None,
+        additional_context=result.additional_context if first else None,
+        pagination=Pagination(
+            offset=offset,
+            total_chars=len(text),
+            next_cursor=f"{token}:{end}" if end < len(text) else None,
+        ),
+    )
+
+
+def _get_crawled_page(item: GetManyResult, depth: int) -> CrawledPage:
+    """
+    Summarize the outcome of getting a page while crawling.
+
+    Args:
+        item (GetManyResult): The outcome of getting the page
+        depth (int): Number of links followed from the seed URL to the page
+
+    Returns:
+        CrawledPage: The page summarized, with its textual content
+
+    """
+    if item.result is None:
+        return CrawledPage(url=item.url, depth=depth, error=item.error)
+    resource = item.result.resource
+    title = next(
+        (line.lstrip("#").strip() for line in (resource.text or "").splitlines() if line.startswith("# ")),
+        None,
+    )
+    return CrawledPage(
+        url=item.url,
+        depth=depth,
+        type=resource.type,
+        title=title if resource.type == MimeType.TEXT_MARKDWON else None,
+        text=resource.text,
+        link_count=item.result.get_link_count(),
+    )
+
+
+async def _timed(coroutine_function: Callable[[], Awaitable[T]], timings: dict[str, float], stage: str) -> T:
+    """
+    Call and await the coroutine function, recording the wall-clock time taken.
+
+    Args:
+        coroutine_function (Callable[[], Awaitable[T]]): The coroutine function to call and await
+        timings (dict[str, float]): Timings per stage to record the time taken into
+        stage (str): Name of the stage to record the time taken for
+
+    Returns:
+        T: The result of the coroutine function
+
+    """
+    started = time.perf_counter()
+    try:
+        return await coroutine_function()
+    finally:
+        timings[stage] = time.perf_counter() - started
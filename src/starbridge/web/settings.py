@@ -1,5 +1,6 @@
 """Settings used for interacting with the world wide web."""
 
+from pathlib import Path
 from typing import Annotated
 
 from pydantic import Field
@@ -7,6 +8,8 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from starbridge import __project_name__, __version__
 
+from .models import HtmlParser, MimeType
+
 
 class Settings(BaseSettings):
     """Settings for web module."""
@@ -35,3 +38,367 @@ class Settings(BaseSettings):
     ]
 
     timeout: Annotated[int, Field(default=60, description="Timeout for web requests.")]
+
+    max_body_size: Annotated[
+        int,
+        Field(
+            default=50 * 1024 * 1024,
+            ge=0,
+            description="Maximum size in bytes of a response body to download, unless specified per MIME type. "
+            "Larger bodies are truncated, aborting the download.",
+        ),
+    ]
+
+    max_body_size_per_mime_type: Annotated[
+        dict[str, int],
+        Field(
+            default_factory=lambda: {
+                MimeType.TEXT_HTML: 10 * 1024 * 1024,
+                MimeType.TEXT_MARKDWON: 10 * 1024 * 1024,
+                MimeType.TEXT_PLAIN: 10 * 1024 * 1024,
+                MimeType.APPLICATION_PDF: 100 * 1024 * 1024,
+            },
+            description="Maximum size in bytes of a response body to download per MIME type, "
+            'overriding the general maximum, e.g. {"application/pdf": 104857600}.',
+        ),
+    ]
+
+    max_concurrent_requests: Annotated[
+        int,
+        Field(
+            default=10,
+            ge=1,
+            description="Maximum number of URLs fetched concurrently when getting many URLs.",
+        ),
+    ]
+
+    max_concurrent_requests_per_host: Annotated[
+        int,
+        Field(
+            default=2,
+            ge=1,
+            description="Maximum number of URLs of the same host fetched concurrently when getting many URLs.",
+        ),
+    ]
+
+    crawl_max_pages: Annotated[
+        int,
+        Field(
+            default=100,
+            ge=1,
+            description="Maximum number of pages a single crawl visits, capping the maximum requested.",
+        ),
+    ]
+
+    min_request_interval: Annotated[
+        float,
+        Field(
+            default=0.0,
+            ge=0,
+            description="Minimum seconds between starts of requests to the same host. "
+            "Raised by the Crawl-delay resp. Request-rate of the host's robots.txt, if respected.",
+        ),
+    ]
+
+    max_crawl_delay: Annotated[
+        float,
+        Field(
+            default=30.0,
+            ge=0,
+            description="Maximum seconds of Crawl-delay resp. Request-rate honored, capping excessive ones.",
+        ),
+    ]
+
+    adaptive_timeout_multiplier: Annotated[
+        float,
+        Field(
+            default=4.0,
+            ge=0,
+            description="Multiple of the 99th percentile of the latency of a host after which requests to it "
+            "time out, between the minimum adaptive timeout and the timeout. Applies once enough requests "
+            "to the host were made. 0 disables adaptive timeouts.",
+        ),
+    ]
+
+    adaptive_timeout_min: Annotated[
+        float,
+        Field(
+            default=5.0,
+            ge=0,
+            description="Minimum seconds of adaptive timeouts, so fast hosts are given leeway for slow responses.",
+        ),
+    ]
+
+    hedge_requests: Annotated[
+        bool,
+        Field(
+            default=False,
+            description="Whether to send a second request if a host has not responded within the 95th percentile "
+            "of its latency, using the response arriving first. Hosts with a crawl delay resp. minimum request "
+            "interval are not sent hedged requests.",
+        ),
+    ]
+
+    circuit_breaker_failures: Annotated[
+        int,
+        Field(
+            default=5,
+            ge=0,
+            description="Number of failures in a row, i.e. connection errors, timeouts or server errors, "
+            "after which a host is assumed to be down, failing requests to it fast. 0 disables the circuit breaker.",
+        ),
+    ]
+
+    circuit_breaker_cooldown: Annotated[
+        float,
+        Field(
+            default=30.0,
+            ge=0,
+            description="Seconds a host assumed to be down is not requested, before a trial request checks "
+            "whether it is up again.",
+        ),
+    ]
+
+    speculative_fetch: Annotated[
+        bool,
+        Field(
+            default=True,
+            description="Whether to start fetching a page while robots.txt of its site is still being fetched, "
+            "discarding the page if robots.txt disallows fetching it. Only applies if robots.txt is not cached.",
+        ),
+    ]
+
+    max_extracted_links: Annotated[
+        int,
+        Field(
+            default=0,
+            ge=0,
+            description="Maximum number of links extracted from a page, keeping the most frequent ones "
+            "and dropping the others, e.g. to bound the size of results of pages with huge numbers of links. "
+            "0 keeps all links.",
+        ),
+    ]
+
+    transform_workers: Annotated[
+        int,
+        Field(
+            default=2,
+            ge=0,
+            description="Number of worker processes transforming content to markdown and extracting links "
+            "off the event loop. 0 transforms within the event loop.",
+        ),
+    ]
+
+    pdf_pages_per_task: Annotated[
+        int,
+        Field(
+            default=8,
+            ge=1,
+            description="Minimum number of pages of a PDF document converted per worker process, "
+            "so small documents are not split across workers.",
+        ),
+    ]
+
+    excel_max_rows: Annotated[
+        int,
+        Field(
+            default=1000,
+            ge=0,
+            description="Maximum number of rows of a sheet of an Excel document converted to markdown, "
+            "including the header. Further rows are counted in the summary of the sheet only. 0 converts all rows.",
+        ),
+    ]
+
+    excel_max_columns: Annotated[
+        int,
+        Field(
+            default=50,
+            ge=0,
+            description="Maximum number of columns of a sheet of an Excel document converted to markdown. "
+            "0 converts all columns.",
+        ),
+    ]
+
+    transform_max_task_size: Annotated[
+        int,
+        Field(
+            default=64 * 1024 * 1024,
+            ge=0,
+            description="Maximum size in bytes of content to transform. Larger content is returned as is.",
+        ),
+    ]
+
+    transform_timeout: Annotated[
+        int,
+        Field(
+            default=60,
+            ge=1,
+            description="Seconds after which transforming content in a worker process is given up, "
+            "returning the content as is.",
+        ),
+    ]
+
+    html_parser: Annotated[
+        HtmlParser,
+        Field(
+            default=HtmlParser.HTML_PARSER,
+            description="Backend for parsing HTML, i.e. html.parser, lxml or selectolax. "
+            "Falls back to html.parser if the backend is not installed, see the parsers extra.",
+        ),
+    ]
+
+    http2: Annotated[
+        bool,
+        Field(
+            default=True,
+            description="Whether to negotiate HTTP/2 with origins supporting it.",
+        ),
+    ]
+
+    max_connections: Annotated[
+        int,
+        Field(
+            default=100,
+            ge=1,
+            description="Maximum number of concurrent connections of the shared HTTP client.",
+        ),
+    ]
+
+    max_keepalive_connections: Annotated[
+        int,
+        Field(
+            default=20,
+            ge=0,
+            description="Maximum number of idle connections the shared HTTP client keeps alive for reuse.",
+        ),
+    ]
+
+    keepalive_expiry: Annotated[
+        float,
+        Field(
+            default=30.0,
+            ge=0,
+            description="Seconds an idle connection of the shared HTTP client is kept alive.",
+        ),
+    ]
+
+    robots_txt_cache_ttl: Annotated[
+        int,
+        Field(
+            default=3600,
+            ge=0,
+            description="Seconds to cache robots.txt of a site if its response does not specify caching. "
+            "0 disables caching.",
+        ),
+    ]
+
+    robots_txt_cache_max_entries: Annotated[
+        int,
+        Field(
+            default=1024,
+            ge=0,
+            description="Maximum number of sites to cache robots.txt for, least recently used are evicted first.",
+        ),
+    ]
+
+    llms_txt_cache_ttl: Annotated[
+        int,
+        Field(
+            default=3600,
+            ge=0,
+            description="Seconds to cache the outcome of looking up llms.txt resp. llms-full.txt of a site "
+            "if its response does not specify caching. 0 disables caching.",
+        ),
+    ]
+
+    llms_txt_cache_max_entries: Annotated[
+        int,
+        Field(
+            default=1024,
+            ge=0,
+            description="Maximum number of llms.txt resp. llms-full.txt lookups to cache, "
+            "least recently used are evicted first.",
+        ),
+    ]
+
+    pagination_cache_ttl: Annotated[
+        int,
+        Field(
+            default=600,
+            ge=0,
+            description="Seconds to keep the full text of a resource returned in parts, "
+            "so further parts are returned without fetching and transforming again.",
+        ),
+    ]
+
+    pagination_cache_max_entries: Annotated[
+        int,
+        Field(
+            default=64,
+            ge=0,
+            description="Maximum number of resources to keep the full text of, least recently used are evicted first.",
+        ),
+    ]
+
+    response_cache: Annotated[
+        bool,
+        Field(
+            default=True,
+            description="Whether to cache responses on disk, serving fresh ones from the cache "
+            "and revalidating stale ones using their ETag resp. Last-Modified headers.",
+        ),
+    ]
+
+    response_cache_path: Annotated[
+        Path,
+        Field(
+            default_factory=lambda: Path.home() / ".cache" / __project_name__ / "web" / "responses.sqlite3",
+            description="Path of the SQLite database to cache responses in.",
+        ),
+    ]
+
+    response_cache_max_bytes: Annotated[
+        int,
+        Field(
+            default=256 * 1024 * 1024,
+            ge=0,
+            description="Maximum size in bytes of cached responses, least recently used are evicted first.",
+        ),
+    ]
+
+    response_cache_ttl: Annotated[
+        int,
+        Field(
+            default=0,
+            ge=0,
+            description="Seconds a cached response is served without revalidation if it does not specify caching. "
+            "0 revalidates such responses on every request.",
+        ),
+    ]
+
+    transformation_cache: Annotated[
+        bool,
+        Field(
+            default=True,
+            description="Whether to cache content transformed to markdown on disk, "
+            "keyed by a hash of the content, so identical documents are converted once.",
+        ),
+    ]
+
+    transformation_cache_path: Annotated[
+        Path,
+        Field(
+            default_factory=lambda: Path.home() / ".cache" / __project_name__ / "web" / "transformations.sqlite3",
+            description="Path of the SQLite database to cache transformed content in.",
+        ),
+    ]
+
+    transformation_cache_max_bytes: Annotated[
+        int,
+        Field(
+            default=128 * 1024 * 1024,
+            ge=0,
+            description="Maximum size in bytes of cached transformed content after compression, "
+            "least recently used are evicted first.",
+        ),
+    ]
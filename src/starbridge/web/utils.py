@@ -1,30 +1,81 @@
 """Utility functions for web-related operations like URL handling, content transformation, and link extraction."""
 
+import asyncio
+import heapq
+import time
 import warnings
+from collections.abc import AsyncGenerator, Coroutine, Iterator, Mapping
+from contextlib import asynccontextmanager, closing
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import cache, cached_property
 from http import HTTPStatus
+from importlib.util import find_spec
+from io import BytesIO
+from typing import TYPE_CHECKING, Any
 from urllib.parse import urljoin, urlparse, urlunparse
 
 import httpx
 import markdown
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 from httpx import AsyncClient, HTTPError
 from markdownify import ATX, MarkdownConverter
 from protego import Protego
 from pydantic import AnyHttpUrl
 
+from starbridge import __version__
 from starbridge.utils import get_logger
 
+from .cache import ENCODING_HEADERS, ResponseCache, TransformationCache, TTLCache, get_ttl_from_headers
+from .extraction import extract_main_content, iter_links, iter_markdown_links
 from .models import (
-    HTML_PARSER,
+    CompactLinkTarget,
     Context,
+    HtmlParser,
     LinkTarget,
     MimeType,
     Resource,
     RobotForbiddenError,
 )
+from .scheduler import HostScheduler, SingleFlight
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+
+    _has_selectolax = True
+except ImportError:
+    _has_selectolax = False
+
+if TYPE_CHECKING:
+    from markitdown import MarkItDown
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
 
 logger = get_logger(__name__)
 
+ROBOTS_TXT_MAX_TTL = 24 * 60 * 60  # RFC 9309: cached robots.txt should not be used for more than 24 hours
+LLMS_TXT_FAILURE_TTL = 60  # connection failures and server errors are transient, so retry soon
+
+_has_lxml = find_spec("lxml") is not None
+
+LINK_EXTRACTION_CHUNK_SIZE = 64 * 1024  # characters of HTML fed to the incremental link extractor at once
+EXCEL_MAX_ROWS = 1000  # per sheet, further rows are counted only
+EXCEL_MAX_COLUMNS = 50  # per sheet
+EXCEL_CELL_TYPES: tuple[tuple[type | tuple[type, ...], str], ...] = (
+    (bool, "boolean"),  # before numbers, as booleans are integers
+    ((int, float), "number"),
+    (datetime, "datetime"),  # before dates, as datetimes are dates
+    (date, "date"),
+    (timedelta, "duration"),
+    (str, "text"),
+)
+
+TRANSFORMED_MIME_TYPES = frozenset({
+    MimeType.TEXT_HTML,
+    MimeType.APPLICATION_PDF,
+    MimeType.APPLICATION_OPENXML_WORD,
+    MimeType.APPLICATION_OPENXML_EXCEL,
+})
+
 
 def is_connected() -> bool:
     """
@@ -43,12 +94,405 @@ def is_connected() -> bool:
     return False
 
 
-async def get_respectfully(
+def create_http_client(
+    http2: bool = True,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+) -> AsyncClient:
+    """
+    Create a pooled HTTP client meant to be shared across requests.
+
+    Args:
+        http2 (bool): Whether to negotiate HTTP/2 with origins supporting it
+        max_connections (int): Maximum number of concurrent connections
+        max_keepalive_connections (int): Maximum number of idle connections kept alive for reuse
+        keepalive_expiry (float): Seconds an idle connection is kept alive
+
+    Returns:
+        AsyncClient: The HTTP client, to be closed by the caller when no longer needed.
+
+    """
+    return AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+@asynccontextmanager
+async def _use_client(client: AsyncClient | None) -> AsyncGenerator[AsyncClient, None]:
+    """
+    Use the given shared client, or a short-lived one if none is given.
+
+    Args:
+        client (AsyncClient | None): Shared client owned by the caller
+
+    Yields:
+        AsyncClient: The shared client, resp. a short-lived client closed on exit
+
+    """
+    if client is not None:
+        yield client
+        return
+    async with AsyncClient() as short_lived_client:
+        yield short_lived_client
+
+
+@dataclass(frozen=True)
+class RobotsTxt:
+    """Outcome of fetching the robots.txt of a site, kept parsed so it can be cached and reused."""
+
+    url: str
+    status_code: int
+    text: str = ""
+    parser: Protego | None = None
+
+    @classmethod
+    def from_response(cls, url: str, response: httpx.Response) -> "RobotsTxt":
+        """
+        Create from the response of fetching the robots.txt.
+
+        Args:
+            url (str): URL of the robots.txt file
+            response (httpx.Response): The HTTP response of fetching the robots.txt file
+
+        Returns:
+            RobotsTxt: The outcome, including the parsed robots.txt if available
+
+        """
+        if HTTPStatus.BAD_REQUEST <= response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR:
+            return cls(url=url, status_code=response.status_code)
+        text = response.text
+        processed_robot_txt = "\n".join(line for line in text.splitlines() if not line.strip().startswith("#"))
+        return cls(url=url, status_code=response.status_code, text=text, parser=Protego.parse(processed_robot_txt))
+
+    def get_crawl_delay(self, user_agent: str) -> float | None:
+        """
+        Get the seconds to wait between requests the site asks for, by Crawl-delay resp. Request-rate.
+
+        Args:
+            user_agent (str): User agent string to get the delay for
+
+        Returns:
+            float | None: The larger of both delays, or None if the site asks for none
+
+        """
+        if self.parser is None:
+            return None
+        delays = [self.parser.crawl_delay(user_agent)]
+        if request_rate := self.parser.request_rate(user_agent):
+            delays.append(request_rate.seconds / request_rate.requests)
+        return max((delay for delay in delays if delay), default=None)
+
+    def ensure_allowed(self, url: str, user_agent: str) -> None:
+        """
+        Ensure the user agent is allowed to crawl the URL.
+
+        Args:
+            url (str): Website URL to check
+            user_agent (str): User agent string to check permissions for
+
+        Raises:
+            RobotForbiddenError: If crawling is not allowed according to the robots.txt file.
+
+        """
+        if self.status_code in {HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN}:
+            message = (
+                f"When fetching robots.txt ({self.url}), received status {self.status_code} "
+                "so assuming that autonomous fetching is not allowed, the user can try manually "
+                "fetching by using the fetch prompt"
+            )
+            logger.error(message)
+            raise RobotForbiddenError(message)
+        if self.parser is None or self.parser.can_fetch(str(url), user_agent):
+            return
+        message = (
+            f"The sites robots.txt ({self.url}), specifies that autonomous fetching of this page is not allowed, "
+            f"<useragent>{user_agent}</useragent>\n"
+            f"<url>{url}</url>\n"
+            f"<robots>\n{self.text}\n</robots>\n"
+            f"The assistant must let the user know that it failed to view the page. "
+            "The assistant may provide further guidance based on the above information.\n"
+            f"The assistant can tell the user that they can try manually fetching the page "
+            "by using the fetch prompt within their UI."
+        )
+        logger.error(message)
+        raise RobotForbiddenError(message)
+
+
+class TruncatedResponse(httpx.Response):
+    """Response with its body cut off at the maximum body size, so its content is incomplete."""
+
+
+def _log_transfer(response: httpx.Response, decoded_size: int) -> None:
+    """
+    Log the bytes transferred for the body of the response, compressed resp. decompressed, at debug level.
+
+    Compression is negotiated by the HTTP client, which advertises br and zstd besides gzip and deflate
+    if brotli resp. zstandard are installed.
+
+    Args:
+        response (httpx.Response): The response as streamed, with its Content-Encoding header
+        decoded_size (int): Size in bytes of the body decompressed
+
+    """
+    transferred = response.num_bytes_downloaded
+    logger.debug(
+        "Transferred %s: %d bytes %s, %d bytes decompressed, %.0f%% saved",
+        response.url,
+        transferred,
+        response.headers.get("Content-Encoding", "identity"),
+        decoded_size,
+        100 * (1 - transferred / decoded_size) if decoded_size else 0,
+    )
+
+
+async def _send_timed(
+    http_client: AsyncClient,
+    url: str,
+    headers: dict[str, str],
+    timeout: float,
+    scheduler: HostScheduler | None,
+) -> httpx.Response:
+    """
+    Send a GET request for the URL, recording the seconds until the response headers as latency of its host.
+
+    Args:
+        http_client (AsyncClient): HTTP client to use
+        url (str): The URL to fetch
+        headers (dict[str, str]): Headers to send
+        timeout (float): Request timeout in seconds
+        scheduler (HostScheduler | None): Scheduler to record the latency with, if any
+
+    Returns:
+        httpx.Response: The response, with its body to be streamed and the response to be closed by the caller
+
+    Raises:
+        TimeoutException: If the host did not respond in time
+
+    """
+    started = time.monotonic()
+    try:
+        response = await http_client.send(
+            http_client.build_request("GET", url, headers=headers, timeout=timeout),
+            stream=True,
+            follow_redirects=True,
+        )
+    except httpx.TimeoutException:
+        if scheduler is not None:
+            scheduler.record_latency(url, time.monotonic() - started)  # so slow hosts are given more time
+        raise
+    if scheduler is not None:
+        scheduler.record_latency(url, time.monotonic() - started)
+    return response
+
+
+async def _send_hedged(  # noqa: PLR0913, PLR0917
+    http_client: AsyncClient,
+    url: str,
+    headers: dict[str, str],
+    timeout: float,
+    scheduler: HostScheduler | None,
+    hedge_delay: float | None,
+) -> httpx.Response:
+    """
+    Send a GET request for the URL, sending a second one if not responded to in time, using the first response.
+
+    Args:
+        http_client (AsyncClient): HTTP client to use
+        url (str): The URL to fetch
+        headers (dict[str, str]): Headers to send
+        timeout (float): Request timeout in seconds
+        scheduler (HostScheduler | None): Scheduler to record latencies and hedges with, if any
+        hedge_delay (float | None): Seconds after which to send the second request. If None, no second request.
+
+    Returns:
+        httpx.Response: The first response, with its body to be streamed and the response to be closed by the caller
+
+    Raises:
+        HTTPError: If all requests sent failed, the error of the last one
+
+    """
+    if scheduler is None or hedge_delay is None:
+        return await _send_timed(http_client, url, headers, timeout, scheduler)
+    attempts = [asyncio.create_task(_send_timed(http_client, url, headers, timeout, scheduler))]
+    winner: asyncio.Task[httpx.Response] | None = None
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=hedge_delay)
+        if not done:
+            logger.debug("Hedging request of %s, not responded to within %.3fs", url, hedge_delay)
+            scheduler.hedges += 1
+            attempts.append(asyncio.create_task(_send_timed(http_client, url, headers, timeout, scheduler)))
+        pending = set(attempts)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((attempt for attempt in attempts if attempt in done and not attempt.exception()), None)
+            if winner is not None or not pending:
+                break
+        if winner is None:
+            return attempts[-1].result()  # raises the error of the last request
+        if winner is not attempts[0]:
+            scheduler.hedges_won += 1
+        return winner.result()
+    finally:
+        losers = [attempt for attempt in attempts if attempt is not winner]
+        for attempt in losers:
+            attempt.cancel()
+        for outcome in await asyncio.gather(*losers, return_exceptions=True):
+            if isinstance(outcome, httpx.Response):
+                await outcome.aclose()
+
+
+async def _get_capped(  # noqa: PLR0913, PLR0917
+    http_client: AsyncClient,
+    url: str,
+    headers: dict[str, str],
+    timeout: int,
+    max_body_size: int | None,
+    max_body_size_per_mime_type: Mapping[str, int] | None,
+    scheduler: HostScheduler | None = None,
+    crawl_delay: float | None = None,
+) -> httpx.Response:
+    """
+    Get URL, streaming the body and aborting once it exceeds the maximum body size for its MIME type.
+
+    If a scheduler is given, the timeout is adapted to the latency of the host, and the request hedged
+    if configured.
+
+    Args:
+        http_client (AsyncClient): HTTP client to use
+        url (str): The URL to fetch
+        headers (dict[str, str]): Headers to send
+        timeout (int): Request timeout in seconds, capping the adaptive timeout
+        max_body_size (int | None): Maximum size in bytes of the decoded body, unless specified per MIME type.
+            If None, the body is not limited.
+        max_body_size_per_mime_type (Mapping[str, int] | None): Maximum size in bytes of the decoded body per
+            normalized MIME type, overriding max_body_size
+        scheduler (HostScheduler | None): Scheduler tracking the latencies of hosts, if any
+        crawl_delay (float | None): Crawl delay the host asks for, if known
+
+    Returns:
+        httpx.Response: The response, a TruncatedResponse if its body was cut off
+
+    """
+    response = await _send_hedged(
+        http_client,
+        url,
+        headers,
+        scheduler.get_timeout(url, timeout) if scheduler is not None else timeout,
+        scheduler,
+        scheduler.get_hedge_delay(url, crawl_delay) if scheduler is not None else None,
+    )
+    try:
+        limit = (max_body_size_per_mime_type or {}).get(_get_normalized_content_type(response), max_body_size)
+        chunks: list[bytes] = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if limit is not None and size > limit:
+                break
+    finally:
+        await response.aclose()
+    _log_transfer(response, size)
+    content = b"".join(chunks)
+    response_class = httpx.Response
+    if limit is not None and size > limit:
+        logger.warning("Body of %s exceeds maximum of %d bytes, truncated", url, limit)
+        content = content[:limit]
+        response_class = TruncatedResponse
+    return response_class(
+        status_code=response.status_code,
+        headers=[(name, value) for name, value in response.headers.multi_items() if name not in ENCODING_HEADERS],
+        content=content,
+        request=response.request,
+        history=response.history,
+        extensions=response.extensions,
+    )
+
+
+async def _get_cached(  # noqa: PLR0913, PLR0917
+    http_client: AsyncClient,
+    url: str,
+    headers: dict[str, str],
+    timeout: int,
+    max_body_size: int | None,
+    max_body_size_per_mime_type: Mapping[str, int] | None,
+    response_cache: ResponseCache | None,
+    scheduler: HostScheduler | None = None,
+    crawl_delay: float | None = None,
+    allowed: asyncio.Future[None] | None = None,
+) -> httpx.Response:
+    """
+    Get URL from the response cache if fresh, revalidating it if stale, fetching it otherwise.
+
+    Args:
+        http_client (AsyncClient): HTTP client to use
+        url (str): The URL to fetch
+        headers (dict[str, str]): Headers to send
+        timeout (int): Request timeout in seconds
+        max_body_size (int | None): Maximum size in bytes of the decoded body, unless specified per MIME type
+        max_body_size_per_mime_type (Mapping[str, int] | None): Maximum size in bytes of the decoded body per
+            normalized MIME type, overriding max_body_size
+        response_cache (ResponseCache | None): Cache of responses to use. If None, the URL is always fetched
+        scheduler (HostScheduler | None): Scheduler to wait for before requesting the host, and to adapt the
+            timeout to the latency of the host, if any
+        crawl_delay (float | None): Crawl delay the host asks for, if known
+        allowed (asyncio.Future[None] | None): Awaited before storing the response in the response cache,
+            e.g. resolved once robots.txt allows crawling the URL fetched speculatively, if any
+
+    Returns:
+        httpx.Response: The response, a TruncatedResponse if its body was cut off
+
+    """
+    key = ResponseCache.get_key(url, headers.get("Accept-Language", "")) if response_cache is not None else None
+    cached = response_cache.get(key) if response_cache is not None and key is not None else None
+    if cached is not None and cached.is_fresh:
+        logger.debug("Serving %s from response cache", url)
+        return cached.to_response()
+
+    if scheduler is not None:
+        await scheduler.wait(url, crawl_delay)
+    response = await _get_capped(
+        http_client,
+        url,
+        {**headers, **cached.get_conditional_headers()} if cached is not None else headers,
+        timeout,
+        max_body_size,
+        max_body_size_per_mime_type,
+        scheduler,
+        crawl_delay,
+    )
+    if response_cache is None or key is None:
+        return response
+    if allowed is not None:
+        await allowed
+    if cached is not None and response.status_code == HTTPStatus.NOT_MODIFIED:
+        logger.debug("Serving %s from response cache, revalidated", url)
+        return response_cache.revalidate(key, cached, response).to_response()
+    if not isinstance(response, TruncatedResponse):
+        response_cache.set(key, response)
+    return response
+
+
+async def get_respectfully(  # noqa: PLR0913, PLR0917
     url: str,
     user_agent: str,
     accept_language: str,
     timeout: int,
     respect_robots_txt: bool = True,
+    client: AsyncClient | None = None,
+    robots_txt_cache: TTLCache[str, RobotsTxt] | None = None,
+    speculative_fetch: bool = False,
+    max_body_size: int | None = None,
+    max_body_size_per_mime_type: Mapping[str, int] | None = None,
+    response_cache: ResponseCache | None = None,
+    scheduler: HostScheduler | None = None,
+    robots_txt_fetches: SingleFlight[RobotsTxt] | None = None,
 ) -> httpx.Response:
     """
     Fetch URL with proper headers and robot.txt checking.
@@ -59,24 +503,87 @@ async def get_respectfully(
         accept_language (str): Accept-Language header value
         timeout (int): Request timeout in seconds
         respect_robots_txt (bool): Whether to respect robots.txt files when interacting with the web as an agent
+        client (AsyncClient | None): Shared HTTP client to use. If None, a short-lived client is used
+        robots_txt_cache (TTLCache[str, RobotsTxt] | None): Cache of robots.txt per site to use, if any
+        speculative_fetch (bool): Whether to start fetching the URL while robots.txt is still being fetched,
+            discarding the response if robots.txt disallows crawling. Not applied if robots.txt is cached,
+            nor if the host is already requested while the crawl delay it asks for is not known yet.
+        max_body_size (int | None): Maximum size in bytes of the body to download, unless specified per MIME type.
+            Larger bodies are truncated. If None, the body is not limited.
+        max_body_size_per_mime_type (Mapping[str, int] | None): Maximum size in bytes of the body to download
+            per MIME type, overriding max_body_size
+        response_cache (ResponseCache | None): Persistent cache of responses to serve fresh responses from
+            and revalidate stale ones with, if any
+        scheduler (HostScheduler | None): Scheduler spacing out requests to the same host, robots.txt
+            included, honoring the crawl delay asked for by its robots.txt if respected and known, and adapting
+            the timeout to the latency of the host, if any
+        robots_txt_fetches (SingleFlight[RobotsTxt] | None): Fetches of robots.txt in flight to join, so
+            concurrent requests to the same site fetch its robots.txt once, if any
 
     Returns:
-        httpx.Response: The HTTP response from the requested URL.
+        httpx.Response: The HTTP response from the requested URL, a TruncatedResponse if its body was cut off.
 
     """
-    async with AsyncClient() as client:
-        if respect_robots_txt:
-            await _ensure_allowed_to_crawl(url=url, user_agent=user_agent)
+    async with _use_client(client) as http_client:
+
+        def fetch(
+            crawl_delay: float | None = None,
+            allowed: asyncio.Future[None] | None = None,
+        ) -> Coroutine[Any, Any, httpx.Response]:
+            return _get_cached(
+                http_client,
+                str(url),
+                headers={
+                    "User-Agent": user_agent,
+                    "Accept-Language": accept_language,
+                },
+                timeout=timeout,
+                max_body_size=max_body_size,
+                max_body_size_per_mime_type=max_body_size_per_mime_type,
+                response_cache=response_cache,
+                scheduler=scheduler,
+                crawl_delay=crawl_delay,
+                allowed=allowed,
+            )
 
-        return await client.get(
-            str(url),
-            headers={
-                "User-Agent": user_agent,
-                "Accept-Language": accept_language,
-            },
-            follow_redirects=True,
-            timeout=timeout,
+        if not respect_robots_txt:
+            return await fetch()
+
+        robots_txt_url = _get_robots_txt_url(url)
+        is_robots_txt_cached = robots_txt_cache is not None and robots_txt_url in robots_txt_cache
+        # the speculative request is spaced out by the crawl delay last recorded for the host. If none is,
+        # only the first request to the host may be speculative, not those spaced out resp. waiting for robots.txt
+        crawl_delay = scheduler.get_crawl_delay(url) if scheduler is not None else None
+        is_host_requested = scheduler is not None and (
+            scheduler.is_requested(url) or (robots_txt_fetches is not None and robots_txt_url in robots_txt_fetches)
         )
+        allowed: asyncio.Future[None] = asyncio.get_running_loop().create_future()  # stored only once resolved
+        speculative_response = (
+            asyncio.create_task(fetch(crawl_delay, allowed))
+            if speculative_fetch and not is_robots_txt_cached and (crawl_delay is not None or not is_host_requested)
+            else None
+        )
+        started = time.perf_counter()
+        try:
+            robots_txt = await _ensure_allowed_to_crawl(
+                url=url,
+                user_agent=user_agent,
+                client=http_client,
+                robots_txt_cache=robots_txt_cache,
+                scheduler=scheduler,
+                robots_txt_fetches=robots_txt_fetches,
+            )
+        except BaseException:
+            if speculative_response is not None:
+                speculative_response.cancel()
+                await asyncio.gather(speculative_response, return_exceptions=True)
+            raise
+        logger.debug("Checked robots.txt for %s in %.3fs", url, time.perf_counter() - started)
+        allowed.set_result(None)
+
+        if speculative_response is not None:
+            return await speculative_response
+        return await fetch(robots_txt.get_crawl_delay(user_agent))
 
 
 def _get_robots_txt_url(url: str) -> str:
@@ -95,7 +602,15 @@ def _get_robots_txt_url(url: str) -> str:
     return urlunparse((parsed.scheme, parsed.netloc, "/robots.txt", "", "", ""))
 
 
-async def _ensure_allowed_to_crawl(url: str, user_agent: str, timeout: int = 5) -> None:
+async def _ensure_allowed_to_crawl(  # noqa: PLR0913, PLR0917
+    url: str,
+    user_agent: str,
+    timeout: int = 5,
+    client: AsyncClient | None = None,
+    robots_txt_cache: TTLCache[str, RobotsTxt] | None = None,
+    scheduler: HostScheduler | None = None,
+    robots_txt_fetches: SingleFlight[RobotsTxt] | None = None,
+) -> RobotsTxt:
     """
     Ensure allowed to crawl the URL by the user agent according to the robots.txt file.
 
@@ -103,6 +618,14 @@ async def _ensure_allowed_to_crawl(url: str, user_agent: str, timeout: int = 5)
         url (str): Website URL to check
         user_agent (str): User agent string to check permissions for
         timeout (int): Request timeout in seconds
+        client (AsyncClient | None): Shared HTTP client to use. If None, a short-lived client is used
+        robots_txt_cache (TTLCache[str, RobotsTxt] | None): Cache of robots.txt per site to use, if any
+        scheduler (HostScheduler | None): Scheduler to wait for before requesting the host, and to record
+            the crawl delay asked for with, if any
+        robots_txt_fetches (SingleFlight[RobotsTxt] | None): Fetches of robots.txt in flight to join, if any
+
+    Returns:
+        RobotsTxt: The robots.txt of the site, e.g. to honor the crawl delay it asks for
 
     Raises:
         RobotForbiddenError: If crawling is not allowed according to the robots.txt file.
@@ -111,48 +634,45 @@ async def _ensure_allowed_to_crawl(url: str, user_agent: str, timeout: int = 5)
     logger.debug("Checking if allowed to crawl %s", url)
     robot_txt_url = _get_robots_txt_url(url)
 
-    async with AsyncClient() as client:
-        try:
-            response = await client.get(
+    async def fetch_robots_txt() -> RobotsTxt:
+        if scheduler is not None:
+            await scheduler.wait(robot_txt_url)
+        async with _use_client(client) as http_client:
+            try:
+                response = await http_client.get(
+                    robot_txt_url,
+                    headers={"User-Agent": user_agent},
+                    follow_redirects=True,
+                    timeout=timeout,
+                )
+            except HTTPError as e:
+                message = (
+                    f"Failed to fetch robots.txt {robot_txt_url} due to a connection issue, "
+                    "thereby defensively assuming we are not allowed to access the url we "
+                    "want."
+                )
+                logger.exception(message)
+                raise RobotForbiddenError(message) from e
+        robots_txt = RobotsTxt.from_response(robot_txt_url, response)
+        if scheduler is not None:
+            scheduler.record_crawl_delay(robot_txt_url, robots_txt.get_crawl_delay(user_agent))
+        if robots_txt_cache is not None and response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR:
+            robots_txt_cache.set(
                 robot_txt_url,
-                headers={"User-Agent": user_agent},
-                follow_redirects=True,
-                timeout=timeout,
-            )
-        except HTTPError as e:
-            message = (
-                f"Failed to fetch robots.txt {robot_txt_url} due to a connection issue, "
-                "thereby defensively assuming we are not allowed to access the url we "
-                "want."
-            )
-            logger.exception(message)
-            raise RobotForbiddenError(message) from e
-        if response.status_code in {HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN}:
-            message = (
-                f"When fetching robots.txt ({robot_txt_url}), received status {response.status_code} "
-                "so assuming that autonomous fetching is not allowed, the user can try manually "
-                "fetching by using the fetch prompt"
+                robots_txt,
+                get_ttl_from_headers(response.headers, robots_txt_cache.default_ttl, ROBOTS_TXT_MAX_TTL),
             )
-            logger.error(message)
-            raise RobotForbiddenError(message)
-        if HTTPStatus.BAD_REQUEST <= response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR:
-            return
-        robot_txt = response.text
-    processed_robot_txt = "\n".join(line for line in robot_txt.splitlines() if not line.strip().startswith("#"))
-    robot_parser = Protego.parse(processed_robot_txt)
-    if not robot_parser.can_fetch(str(url), user_agent):
-        message = (
-            f"The sites robots.txt ({robot_txt_url}), specifies that autonomous fetching of this page is not allowed, "
-            f"<useragent>{user_agent}</useragent>\n"
-            f"<url>{url}</url>\n"
-            f"<robots>\n{robot_txt}\n</robots>\n"
-            f"The assistant must let the user know that it failed to view the page. "
-            "The assistant may provide further guidance based on the above information.\n"
-            f"The assistant can tell the user that they can try manually fetching the page "
-            "by using the fetch prompt within their UI."
+        return robots_txt
+
+    robots_txt = robots_txt_cache.get(robot_txt_url) if robots_txt_cache is not None else None
+    if robots_txt is None:
+        robots_txt = (
+            await robots_txt_fetches.do(robot_txt_url, fetch_robots_txt)
+            if robots_txt_fetches is not None
+            else await fetch_robots_txt()
         )
-        logger.error(message)
-        raise RobotForbiddenError(message)
+    robots_txt.ensure_allowed(url, user_agent)
+    return robots_txt
 
 
 def _get_normalized_content_type(response: httpx.Response) -> str:
@@ -197,28 +717,125 @@ def _get_normalized_content_type(response: httpx.Response) -> str:
     return content_type
 
 
-def _get_markdown_from_html(html: str) -> str:
+@cache
+def get_available_html_parser(html_parser: HtmlParser) -> HtmlParser:
+    """
+    Get the HTML parser to use, falling back to html.parser if the requested one is not installed.
+
+    Args:
+        html_parser (HtmlParser): The requested HTML parser
+
+    Returns:
+        HtmlParser: The requested HTML parser if installed, html.parser otherwise
+
+    """
+    if (html_parser == HtmlParser.LXML and not _has_lxml) or (
+        html_parser == HtmlParser.SELECTOLAX and not _has_selectolax
+    ):
+        logger.warning(
+            "HTML parser %s not installed, falling back to %s. Install the parsers extra to use it.",
+            html_parser,
+            HtmlParser.HTML_PARSER,
+        )
+        return HtmlParser.HTML_PARSER
+    return html_parser
+
+
+class ParsedDocument:
+    """
+    Response with its content type normalized, parsing its content on first use only.
+
+    Shared by content transformation and link extraction, so each response is parsed at most once.
+    """
+
+    def __init__(self, response: httpx.Response, html_parser: HtmlParser = HtmlParser.HTML_PARSER) -> None:
+        """
+        Initialize without parsing yet.
+
+        Args:
+            response (httpx.Response): The HTTP response to parse
+            html_parser (HtmlParser): Backend for parsing HTML, falling back to html.parser if not installed
+
+        """
+        self.response = response
+        self.content_type = _get_normalized_content_type(response)
+        self.html_parser = get_available_html_parser(html_parser)
+
+    @property
+    def has_links(self) -> bool:
+        """Whether links can be extracted from the content, i.e. it is HTML or markdown."""
+        return self.content_type in {MimeType.TEXT_HTML, MimeType.TEXT_MARKDWON}
+
+    @cached_property
+    def html(self) -> str:
+        """HTML content, with markdown content rendered to HTML first."""
+        if self.content_type == MimeType.TEXT_MARKDWON:
+            return markdown.markdown(self.response.text)
+        return self.response.text
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        """
+        HTML content parsed with BeautifulSoup, as required for conversion to markdown.
+
+        With selectolax, scripts and styles are pruned by lexbor first,
+        so BeautifulSoup, backed by lxml if installed, only builds the tree of what is converted.
+        """
+        if self.html_parser == HtmlParser.SELECTOLAX:
+            self._lexbor.strip_tags(["script", "style"])
+            return BeautifulSoup(
+                self._lexbor.html or "",
+                HtmlParser.LXML if _has_lxml else HtmlParser.HTML_PARSER,
+            )
+        return BeautifulSoup(self.html, self.html_parser)
+
+    @cached_property
+    def _lexbor(self) -> "LexborHTMLParser":
+        """HTML content parsed with selectolax."""
+        return LexborHTMLParser(self.html)
+
+    def links(self) -> Iterator[tuple[str, str]]:
+        """
+        Iterate over the links in the HTML resp. markdown content.
+
+        Markdown is tokenized directly, without rendering it to HTML. With selectolax, the links are selected
+        from the tree parsed by lexbor. Otherwise, the downloaded content is fed to a link extractor
+        chunk by chunk, so no tree is built for extracting links.
+
+        Yields:
+            tuple[str, str]: Target and anchor text of each link, in document order
+
+        """
+        if self.content_type == MimeType.TEXT_MARKDWON:
+            yield from iter_markdown_links(self.response.text)
+        elif self.html_parser == HtmlParser.SELECTOLAX:
+            for node in self._lexbor.css("a[href]"):
+                yield node.attributes.get("href") or "", node.text(deep=True)
+        else:
+            yield from iter_links(self.response.iter_text(LINK_EXTRACTION_CHUNK_SIZE))
+
+
+def _get_markdown_from_html(soup: Tag) -> str:
     """
     Get markdown from HTML content.
 
     Args:
-        html (str): The HTML content to convert
+        soup (Tag): The parsed HTML content to convert, resp. the element with its main content
 
     Returns:
         str: The converted markdown content
 
     """
-    return MarkdownConverter(heading_style=ATX, strip=["img"]).convert_soup(
-        BeautifulSoup(html, HTML_PARSER),
-    )
+    return MarkdownConverter(heading_style=ATX, strip=["img"]).convert_soup(soup)
 
 
-def _get_markdown_from_pdf(response: httpx.Response) -> str | None:
+def _get_markdown_from_pdf(response: httpx.Response, pages: list[int] | None = None) -> str | None:
     """
     Get markdown from PDF content.
 
     Args:
         response (httpx.Response): HTTP response containing PDF document
+        pages (list[int] | None): Zero-based numbers of the pages to convert, in order. If None, all pages.
 
     Returns:
         str | None: Markdown string if conversion is successful, None otherwise
@@ -230,12 +847,120 @@ def _get_markdown_from_pdf(response: httpx.Response) -> str | None:
             import pymupdf4llm  # noqa: PLC0415
             from pymupdf import Document as PyMuPDFDocument  # noqa: PLC0415
 
-            return pymupdf4llm.to_markdown(PyMuPDFDocument(None, response.content), show_progress=False)
+            return pymupdf4llm.to_markdown(PyMuPDFDocument(None, response.content), pages=pages, show_progress=False)
     except Exception:
         logger.exception("Failed to convert PDF to markdown")
         return None
 
 
+def convert_pdf_pages(response: httpx.Response, pages: list[int]) -> str | None:
+    """
+    Convert the given pages of a PDF document to markdown, e.g. a chunk of pages in a worker process.
+
+    Args:
+        response (httpx.Response): HTTP response containing PDF document
+        pages (list[int]): Zero-based numbers of the pages to convert, in order
+
+    Returns:
+        str | None: Markdown string if conversion is successful, None otherwise
+
+    """
+    return _get_markdown_from_pdf(response, pages)
+
+
+def get_pdf_page_count(response: httpx.Response) -> int | None:
+    """
+    Get the number of pages of a PDF document, without converting it.
+
+    Args:
+        response (httpx.Response): HTTP response containing PDF document
+
+    Returns:
+        int | None: Number of pages, or None if the document cannot be opened
+
+    """
+    try:
+        from pymupdf import Document as PyMuPDFDocument  # noqa: PLC0415
+
+        with PyMuPDFDocument(None, response.content) as document:
+            return document.page_count
+    except Exception:
+        logger.exception("Failed to open PDF")
+        return None
+
+
+def get_page_numbers(pages: str, page_count: int) -> list[int]:
+    """
+    Get the numbers of the pages selected by page ranges, e.g. 10-20 or 1,3,5-.
+
+    Args:
+        pages (str): Comma-separated one-based page numbers resp. ranges thereof, open-ended ranges allowed
+        page_count (int): Number of pages of the document, pages beyond are ignored
+
+    Returns:
+        list[int]: Zero-based numbers of the pages selected, in order of the document and without duplicates
+
+    Raises:
+        ValueError: If the page ranges are invalid, or select no page of the document
+
+    """
+    selected: set[int] = set()
+    for page_range in pages.replace(" ", "").split(","):
+        first, separator, last = page_range.partition("-")
+        if not first.isdigit() or (last and not last.isdigit()) or int(first) < 1:
+            message = f"Invalid page range '{page_range}' in '{pages}', expected e.g. 10-20 or 1,3,5-"
+            raise ValueError(message)
+        end = (int(last) if last else page_count) if separator else int(first)
+        selected.update(range(int(first) - 1, min(end, page_count)))
+    if not selected:
+        message = f"Pages '{pages}' select no page of the document, which has {page_count} pages"
+        raise ValueError(message)
+    return sorted(selected)
+
+
+@cache
+def _get_markitdown() -> "MarkItDown":
+    """
+    Get the MarkItDown converter shared by all conversions.
+
+    Returns:
+        MarkItDown: The converter
+
+    """
+    from markitdown import MarkItDown  # noqa: PLC0415, performance
+
+    return MarkItDown()
+
+
+def _get_markdown_with_markitdown(response: httpx.Response, mime_type: str, extension: str) -> str | None:
+    """
+    Convert already downloaded document content to markdown using MarkItDown.
+
+    Args:
+        response (httpx.Response): HTTP response containing the document
+        mime_type (str): MIME type of the document
+        extension (str): File extension of the document, including the leading dot
+
+    Returns:
+        Markdown string if conversion successful, None otherwise
+
+    """
+    from markitdown import StreamInfo  # noqa: PLC0415, performance
+
+    try:
+        return (
+            _get_markitdown()
+            .convert_stream(
+                BytesIO(response.content),
+                stream_info=StreamInfo(mimetype=mime_type, extension=extension, url=str(response.url)),
+            )
+            .text_content
+        )
+    except Exception:
+        logger.exception("Failed to convert %s to markdown", mime_type)
+        return None
+
+
 def _get_markdown_from_word(response: httpx.Response) -> str | None:
     """
     Convert Word document content to markdown.
@@ -247,32 +972,252 @@ def _get_markdown_from_word(response: httpx.Response) -> str | None:
         Markdown string if conversion successful, None otherwise
 
     """
-    from markitdown import MarkItDown  # noqa: PLC0415, performance
+    return _get_markdown_with_markitdown(response, MimeType.APPLICATION_OPENXML_WORD, ".docx")
+
+
+def _get_cell_type(value: object) -> str | None:
+    """
+    Get the type of the value of a cell, as summarized per column.
 
-    rtn = MarkItDown().convert(str(response.url))
-    return rtn.text_content
+    Args:
+        value (object): The value of the cell, as read by openpyxl
 
+    Returns:
+        str | None: The type, e.g. text or number, or None if the cell is empty
 
-def _get_markdown_from_excel(response: httpx.Response) -> str | None:
     """
-    Convert Excel document content to markdown.
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, datetime) and value.time() == datetime.min.time():
+        return "date"  # Excel has no date type, so dates are read as datetimes at midnight
+    return next((name for types, name in EXCEL_CELL_TYPES if isinstance(value, types)), type(value).__name__)
+
+
+def _format_cell(value: object) -> str:
+    """
+    Format the value of a cell for a markdown table.
 
     Args:
-        response: HTTP response containing Excel document
+        value (object): The value of the cell, as read by openpyxl
 
     Returns:
-        Markdown string if conversion successful, None otherwise
+        str: The value on a single line, with pipes escaped
 
     """
-    from markitdown import MarkItDown  # noqa: PLC0415, performance
+    if value is None:
+        return ""
+    if isinstance(value, datetime) and value.time() == datetime.min.time():
+        value = value.date()  # as summarized per column
+    text = value.isoformat() if isinstance(value, date) else str(value)
+    return " ".join(text.split()).replace("|", "\\|")
+
+
+def _get_markdown_from_sheet(sheet: "ReadOnlyWorksheet", max_rows: int | None, max_columns: int | None) -> str:
+    """
+    Convert a sheet to a markdown table, preceded by a summary of its dimensions and column types.
+
+    Rows are streamed, so no more than the rows converted are kept in memory.
+    The first row not empty is taken as header. Rows beyond the maximum are counted only.
+
+    Args:
+        sheet (ReadOnlyWorksheet): The sheet of a workbook opened in read-only mode
+        max_rows (int | None): Maximum number of rows to convert, including the header. If None, all rows.
+        max_columns (int | None): Maximum number of columns to convert. If None, all columns.
+
+    Returns:
+        str: The summary and table in markdown
+
+    """
+    from openpyxl.utils import get_column_letter  # noqa: PLC0415, performance
+
+    rows: list[tuple[object, ...]] = []
+    row_count = column_count = 0
+    for row in sheet.iter_rows(values_only=True):
+        last = max((i + 1 for i, value in enumerate(row) if _get_cell_type(value) is not None), default=0)
+        if not last:
+            continue  # empty rows are skipped, as are empty trailing cells
+        row_count += 1
+        column_count = max(column_count, last)
+        if max_rows is None or len(rows) < max_rows:
+            rows.append(row[: min(last, max_columns or last)])
+        elif sheet.max_row is not None:
+            break  # the dimensions are known, so further rows need not be counted
+    if not rows:
+        return f"## {sheet.title}\n\nEmpty sheet."
+
+    row_count = max(row_count, sheet.max_row or 0)
+    column_count = max(column_count, sheet.max_column or 0)
+    width = min(max(len(row) for row in rows), max_columns or column_count)
+    table = [[_format_cell(row[i]) if i < len(row) else "" for i in range(width)] for row in rows]
+    names = [name or get_column_letter(i + 1) for i, name in enumerate(table[0])]
+    types = []
+    for i in range(width):
+        column_types = {_get_cell_type(row[i]) for row in rows[1:] if i < len(row)} - {None}
+        types.append(column_types.pop() if len(column_types) == 1 else "mixed" if column_types else "empty")
+
+    dimensions = f"Dimensions: {row_count} rows x {column_count} columns"
+    if (len(rows), width) != (row_count, column_count):
+        dimensions += f", showing the first {len(rows)} rows and {width} columns"
+    lines = [
+        f"## {sheet.title}",
+        "",
+        dimensions,
+        "",
+        "Column types: " + ", ".join(f"{name} ({type_})" for name, type_ in zip(names, types, strict=True)),
+        "",
+        "| " + " | ".join(names) + " |",
+        "|" + " --- |" * width,
+    ]
+    lines.extend("| " + " | ".join(cells) + " |" for cells in table[1:])
+    return "\n".join(lines)
+
+
+def _get_markdown_from_excel(
+    response: httpx.Response,
+    sheets: list[str] | None = None,
+    max_rows: int | None = EXCEL_MAX_ROWS,
+    max_columns: int | None = EXCEL_MAX_COLUMNS,
+) -> str | None:
+    """
+    Convert Excel document content to markdown, streaming the rows of each sheet.
+
+    Args:
+        response (httpx.Response): HTTP response containing Excel document
+        sheets (list[str] | None): Names of the sheets to convert, in order. If None, all sheets.
+        max_rows (int | None): Maximum number of rows to convert per sheet, including the header. If None, all rows.
+        max_columns (int | None): Maximum number of columns to convert per sheet. If None, all columns.
+
+    Returns:
+        str | None: Markdown string if conversion is successful, None otherwise
+
+    Raises:
+        ValueError: If a sheet selected is not in the workbook
+
+    """
+    from openpyxl import load_workbook  # noqa: PLC0415, performance
+
+    try:
+        workbook = load_workbook(BytesIO(response.content), read_only=True, data_only=True)
+    except Exception:
+        logger.exception("Failed to open Excel document")
+        return None
+    with closing(workbook):  # workbooks opened in read-only mode keep the archive open
+        missing = [name for name in sheets or [] if name not in workbook.sheetnames]
+        if missing:
+            message = (
+                f"Sheets {', '.join(missing)} not found in the workbook, which has sheets "
+                f"{', '.join(workbook.sheetnames)}"
+            )
+            raise ValueError(message)
+        try:
+            return "\n\n".join(
+                _get_markdown_from_sheet(workbook[name], max_rows, max_columns)
+                for name in sheets or workbook.sheetnames
+            )
+        except Exception:
+            logger.exception("Failed to convert Excel document to markdown")
+            return None
+
+
+def convert_excel_sheets(
+    response: httpx.Response,
+    sheets: list[str] | None,
+    max_rows: int | None,
+    max_columns: int | None,
+) -> str | None:
+    """
+    Convert the given sheets of an Excel document to markdown, with rows and columns capped per sheet.
+
+    Args:
+        response (httpx.Response): HTTP response containing Excel document
+        sheets (list[str] | None): Names of the sheets to convert, in order. If None, all sheets.
+        max_rows (int | None): Maximum number of rows to convert per sheet, including the header. If None, all rows.
+        max_columns (int | None): Maximum number of columns to convert per sheet. If None, all columns.
+
+    Returns:
+        str | None: Markdown string if conversion is successful, None otherwise
+
+    Raises:
+        ValueError: If a sheet selected is not in the workbook
+
+    """
+    return _get_markdown_from_excel(response, sheets, max_rows, max_columns)
+
+
+def _get_markdown(document: ParsedDocument, main_content: bool = False) -> str | None:
+    """
+    Convert content to markdown.
+
+    Args:
+        document (ParsedDocument): The response to convert, parsed on demand
+        main_content (bool): Whether to convert the main content of HTML only, pruning the parsed document
+
+    Returns:
+        str | None: The markdown, or None if the content type is not supported or conversion failed
+
+    """
+    match document.content_type:
+        case MimeType.TEXT_HTML:
+            return _get_markdown_from_html(extract_main_content(document.soup) if main_content else document.soup)
+        case MimeType.APPLICATION_PDF:
+            return _get_markdown_from_pdf(document.response) or None
+        case MimeType.APPLICATION_OPENXML_WORD:
+            return _get_markdown_from_word(document.response) or None
+        case MimeType.APPLICATION_OPENXML_EXCEL:
+            return _get_markdown_from_excel(document.response) or None
+    return None
+
+
+def get_transformation_key(  # noqa: PLR0913, PLR0917
+    response: httpx.Response,
+    html_parser: HtmlParser,
+    main_content: bool = False,
+    pages: str | None = None,
+    sheets: str | None = None,
+    max_rows: int | None = None,
+    max_columns: int | None = None,
+) -> str | None:
+    """
+    Get the key to cache the transformation of the content to markdown under.
+
+    Only the content, its MIME type and what else affects the transformation are considered,
+    so the same document served from different URLs shares the key.
 
-    rtn = MarkItDown().convert(str(response.url))
-    return rtn.text_content
+    Args:
+        response (httpx.Response): The HTTP response with the content to transform
+        html_parser (HtmlParser): Backend for parsing HTML
+        main_content (bool): Whether the main content of HTML is converted only
+        pages (str | None): Page ranges of PDF converted only, if any
+        sheets (str | None): Names of the sheets of Excel converted only, if any
+        max_rows (int | None): Maximum number of rows of Excel converted per sheet, if capped
+        max_columns (int | None): Maximum number of columns of Excel converted per sheet, if capped
+
+    Returns:
+        str | None: The key, or None if the content is not converted to markdown
+
+    """
+    content_type = _get_normalized_content_type(response)
+    if content_type not in TRANSFORMED_MIME_TYPES:
+        return None
+    return TransformationCache.get_key(
+        response.content,
+        {
+            "type": content_type,
+            "html_parser": html_parser if content_type == MimeType.TEXT_HTML else None,
+            "main_content": main_content and content_type == MimeType.TEXT_HTML,
+            "pages": pages.replace(" ", "") if pages and content_type == MimeType.APPLICATION_PDF else None,
+            "excel": (sheets, max_rows, max_columns) if content_type == MimeType.APPLICATION_OPENXML_EXCEL else None,
+            "version": __version__,
+        },
+    )
 
 
 def transform_content(
     response: httpx.Response,
     transform_to_markdown: bool = True,
+    document: ParsedDocument | None = None,
+    markdown: str | None = None,
+    main_content: bool = False,
 ) -> Resource:
     """
     Process response according to requested format.
@@ -280,45 +1225,29 @@ def transform_content(
     Args:
         response (httpx.Response): The HTTP response to process
         transform_to_markdown (bool): Whether to attempt converting content to markdown
+        document (ParsedDocument | None): The response parsed, if already shared with link extraction
+        markdown (str | None): The content converted to markdown already, e.g. cached, so conversion is skipped
+        main_content (bool): Whether to convert the main content of HTML only, dropping navigation, footers,
+            banners and other boilerplate
 
     Returns:
         Resource: Processed content as a Resource object
 
     """
-    content_type = _get_normalized_content_type(response)
-
-    if transform_to_markdown:
-        match content_type:
-            case MimeType.TEXT_HTML:
-                return Resource(
-                    url=AnyHttpUrl(str(response.url)),
-                    type=MimeType.TEXT_MARKDWON,
-                    text=_get_markdown_from_html(response.text),
-                )
-            case MimeType.APPLICATION_PDF:
-                md = _get_markdown_from_pdf(response)
-                if md:
-                    return Resource(
-                        url=AnyHttpUrl(str(response.url)),
-                        type=MimeType.TEXT_MARKDWON,
-                        text=md,
-                    )
-            case MimeType.APPLICATION_OPENXML_WORD:
-                md = _get_markdown_from_word(response)
-                if md:
-                    return Resource(
-                        url=AnyHttpUrl(str(response.url)),
-                        type=MimeType.TEXT_MARKDWON,
-                        text=md,
-                    )
-            case MimeType.APPLICATION_OPENXML_EXCEL:
-                md = _get_markdown_from_excel(response)
-                if md:
-                    return Resource(
-                        url=AnyHttpUrl(str(response.url)),
-                        type=MimeType.TEXT_MARKDWON,
-                        text=md,
-                    )
+    document = document or ParsedDocument(response)
+    content_type = document.content_type
+    truncated = isinstance(response, TruncatedResponse)
+
+    # truncated documents other than HTML are corrupt, so conversion would fail
+    if transform_to_markdown and (not truncated or content_type == MimeType.TEXT_HTML):
+        markdown = markdown if markdown is not None else _get_markdown(document, main_content)
+        if markdown is not None:
+            return Resource(
+                url=AnyHttpUrl(str(response.url)),
+                type=MimeType.TEXT_MARKDWON,
+                text=markdown,
+                truncated=truncated,
+            )
 
     if any(
         mime_type in content_type
@@ -332,81 +1261,245 @@ def transform_content(
             url=AnyHttpUrl(str(response.url)),
             type=content_type,
             text=response.text,
+            truncated=truncated,
         )
     return Resource(
         url=AnyHttpUrl(str(response.url)),
         type=content_type,
         blob=response.content,
+        truncated=truncated,
     )
 
 
-def _extract_links_from_html(html: str, url: str) -> list[LinkTarget]:
+def process_response(  # noqa: PLR0913, PLR0917
+    response: httpx.Response,
+    transform_to_markdown: bool = True,
+    extract_links: bool = True,
+    html_parser: HtmlParser = HtmlParser.HTML_PARSER,
+    markdown: str | None = None,
+    main_content: bool = False,
+    max_links: int | None = None,
+) -> tuple[Resource, list[LinkTarget] | None]:
     """
-    Extract links from HTML content.
+    Transform content of the response and extract links from it.
 
     Args:
-        html (str): The HTML content to extract links from
-        url (str): The base URL for resolving relative links
+        response (httpx.Response): The HTTP response to process
+        transform_to_markdown (bool): Whether to attempt converting content to markdown
+        extract_links (bool): Whether to extract links from the content
+        html_parser (HtmlParser): Backend for parsing HTML
+        markdown (str | None): The content converted to markdown already, e.g. cached, so conversion is skipped
+        main_content (bool): Whether to convert the main content of HTML only. Links are extracted from all content.
+        max_links (int | None): Maximum number of links to extract, the most frequent ones. If None, all are kept.
 
     Returns:
-        list[LinkTarget]: List of extracted links with metadata
+        tuple[Resource, list[LinkTarget] | None]: Processed content, and extracted links if requested
 
     """
-    soup = BeautifulSoup(html, HTML_PARSER)
-    seen_urls: dict[str, LinkTarget] = {}
+    resource, extracted_links = process_response_compact(
+        response,
+        transform_to_markdown,
+        extract_links,
+        html_parser,
+        markdown,
+        main_content,
+        max_links,
+    )
+    return resource, LinkTarget.from_compact(extracted_links) if extracted_links is not None else None
+
+
+def process_response_compact(  # noqa: PLR0913, PLR0917
+    response: httpx.Response,
+    transform_to_markdown: bool = True,
+    extract_links: bool = True,
+    html_parser: HtmlParser = HtmlParser.HTML_PARSER,
+    markdown: str | None = None,
+    main_content: bool = False,
+    max_links: int | None = None,
+) -> tuple[Resource, list[CompactLinkTarget] | None]:
+    """
+    Transform content of the response and extract links from it, returning links in compact representation.
+
+    Meant to be run in a worker process, as arguments and result are picklable, and cheap to pickle.
+
+    Args:
+        response (httpx.Response): The HTTP response to process
+        transform_to_markdown (bool): Whether to attempt converting content to markdown
+        extract_links (bool): Whether to extract links from the content
+        html_parser (HtmlParser): Backend for parsing HTML
+        markdown (str | None): The content converted to markdown already, e.g. cached, so conversion is skipped
+        main_content (bool): Whether to convert the main content of HTML only. Links are extracted from all content.
+        max_links (int | None): Maximum number of links to extract, the most frequent ones. If None, all are kept.
+
+    Returns:
+        tuple[Resource, list[CompactLinkTarget] | None]: Processed content, and extracted links if requested
+
+    """
+    document = ParsedDocument(response, html_parser)
+    extracted_links = (
+        _extract_links_from_document(document, str(response.url), max_links) if extract_links else None
+    )  # before pruning
+    return transform_content(response, transform_to_markdown, document, markdown, main_content), extracted_links
+
+
+def _extract_links_from_document(
+    document: ParsedDocument,
+    url: str,
+    max_links: int | None = None,
+) -> list[CompactLinkTarget]:
+    """
+    Extract links from HTML resp. markdown content.
+
+    Occurrences and anchor texts are counted per URL, so only the links kept are validated later on.
 
-    for link in soup.find_all("a", href=True):
-        href = link.get("href")
-        abs_url = urljoin(url, href)
+    Args:
+        document (ParsedDocument): The response to extract links from, parsed on demand
+        url (str): The base URL for resolving relative links
+        max_links (int | None): Maximum number of links to keep, the most frequent ones. If None, all are kept.
+
+    Returns:
+        list[CompactLinkTarget]: Extracted links in compact representation, sorted by occurrences descending
+
+    """
+    joined: dict[str, str] = {}  # relative links tend to repeat, e.g. in navigation
+    occurrences: dict[str, int] = {}
+    anchor_texts: dict[str, list[str]] = {}
+
+    if not document.has_links:
+        return []
+    for href, text in document.links():
+        abs_url = joined.get(href)
+        if abs_url is None:
+            abs_url = joined[href] = urljoin(url, href)
         if abs_url.startswith(("http://", "https://")):  # ignore non-http(s) links
-            anchor_text = link.get_text().strip()
+            anchor_text = text.strip()
             if not anchor_text:
                 continue
-            if abs_url in seen_urls:
-                if anchor_text not in seen_urls[abs_url].anchor_texts:
-                    seen_urls[abs_url].anchor_texts.append(anchor_text)
-                seen_urls[abs_url].occurrences += 1
+            if abs_url in occurrences:
+                if anchor_text not in anchor_texts[abs_url]:
+                    anchor_texts[abs_url].append(anchor_text)
+                occurrences[abs_url] += 1
             else:
-                seen_urls[abs_url] = LinkTarget(
-                    url=AnyHttpUrl(abs_url),
-                    occurrences=1,
-                    anchor_texts=[anchor_text],
-                )
-
-    # Sort by occurrences in descending order
-    return sorted(seen_urls.values(), key=lambda x: x.occurrences, reverse=True)
+                occurrences[abs_url] = 1
+                anchor_texts[abs_url] = [anchor_text]
+
+    # Sort by occurrences in descending order, keeping the order of first occurrence for links as frequent
+    kept = (
+        sorted(occurrences, key=occurrences.__getitem__, reverse=True)
+        if max_links is None or max_links >= len(occurrences)
+        else heapq.nlargest(max_links, occurrences, key=occurrences.__getitem__)
+    )
+    return [(abs_url, occurrences[abs_url], anchor_texts[abs_url]) for abs_url in kept]
 
 
 def extract_links_from_response(
     response: httpx.Response,
+    document: ParsedDocument | None = None,
+    max_links: int | None = None,
 ) -> list[LinkTarget]:
     """
     Extract links from HTML content.
 
     Args:
         response (httpx.Response): The HTTP response to extract links from.
+        document (ParsedDocument | None): The response parsed, if already shared with content transformation
+        max_links (int | None): Maximum number of links to keep, the most frequent ones. If None, all are kept.
 
     Returns:
         list[LinkTarget]: List of extracted links with their metadata.
 
     """
-    match _get_normalized_content_type(response):
-        case MimeType.TEXT_HTML:
-            return _extract_links_from_html(response.text, str(response.url))
-        case MimeType.TEXT_MARKDWON:
-            return _extract_links_from_html(
-                markdown.markdown(response.text),
-                str(response.url),
-            )
-    return []
+    document = document or ParsedDocument(response)
+    return LinkTarget.from_compact(_extract_links_from_document(document, str(response.url), max_links))
+
+
+@dataclass(frozen=True)
+class LlmsTxt:
+    """Outcome of looking up the llms.txt resp. llms-full.txt of a site, kept so misses can be cached as well."""
+
+    url: str
+    text: str | None = None
+
+    def to_context(self) -> Context | None:
+        """
+        Get as additional context.
+
+        Returns:
+            Context | None: The context, or None if the site does not provide the file
+
+        """
+        if self.text is None:
+            return None
+        return Context(type="llms_txt", url=AnyHttpUrl(self.url), text=self.text)
+
+
+async def _get_llms_txt(  # noqa: PLR0913, PLR0917
+    llms_txt_url: str,
+    user_agent: str,
+    accept_language: str,
+    timeout: int,
+    http_client: AsyncClient,
+    llms_txt_cache: TTLCache[tuple[str, str], LlmsTxt] | None,
+    scheduler: HostScheduler | None = None,
+) -> LlmsTxt:
+    """
+    Look up the llms.txt resp. llms-full.txt of a site.
+
+    Args:
+        llms_txt_url (str): URL of the llms.txt resp. llms-full.txt file
+        user_agent (str): User agent string to use for requests
+        accept_language (str): Accept-Language header value
+        timeout (int): Request timeout in seconds
+        http_client (AsyncClient): HTTP client to use
+        llms_txt_cache (TTLCache[tuple[str, str], LlmsTxt] | None): Cache of lookups to use, if any
+        scheduler (HostScheduler | None): Scheduler to wait for before requesting the host, if any
 
+    Returns:
+        LlmsTxt: The outcome of the lookup, with text None if the site does not provide the file
 
-async def get_additional_context_for_url(
+    """
+    cache_key = (llms_txt_url, accept_language)
+    if llms_txt_cache is not None and (llms_txt := llms_txt_cache.get(cache_key)) is not None:
+        return llms_txt
+    if scheduler is not None:
+        await scheduler.wait(llms_txt_url)
+    try:
+        response = await http_client.get(
+            llms_txt_url,
+            headers={
+                "User-Agent": user_agent,
+                "Accept-Language": accept_language,
+            },
+            follow_redirects=True,
+            timeout=timeout,
+        )
+    except HTTPError:
+        logger.warning("Failed to fetch %s", llms_txt_url)
+        response = None
+    if response is not None and response.status_code == HTTPStatus.OK:
+        llms_txt = LlmsTxt(url=llms_txt_url, text=response.text)
+    else:
+        llms_txt = LlmsTxt(url=llms_txt_url)
+    if llms_txt_cache is not None:
+        if response is None or response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            ttl = min(LLMS_TXT_FAILURE_TTL, llms_txt_cache.default_ttl)
+        elif response.status_code == HTTPStatus.OK:
+            ttl = get_ttl_from_headers(response.headers, llms_txt_cache.default_ttl)
+        else:
+            ttl = llms_txt_cache.default_ttl
+        llms_txt_cache.set(cache_key, llms_txt, ttl)
+    return llms_txt
+
+
+async def get_additional_context_for_url(  # noqa: PLR0913, PLR0917
     url: str,
     user_agent: str,
     accept_language: str = "en-US,en;q=0.9,de;q=0.8",
     timeout: int = 5,
     full: bool = False,
+    client: AsyncClient | None = None,
+    llms_txt_cache: TTLCache[tuple[str, str], LlmsTxt] | None = None,
+    scheduler: HostScheduler | None = None,
 ) -> list[Context]:
     """
     Get additional context for the url.
@@ -417,58 +1510,31 @@ async def get_additional_context_for_url(
         accept_language (str): Accept-Language header value
         timeout (int): Request timeout in seconds
         full (bool): Whether to try fetching llms-full.txt first
+        client (AsyncClient | None): Shared HTTP client to use. If None, a short-lived client is used
+        llms_txt_cache (TTLCache[tuple[str, str], LlmsTxt] | None): Cache of llms.txt lookups per site to use,
+            if any. Misses and connection failures are cached as well.
+        scheduler (HostScheduler | None): Scheduler spacing out requests to the same host, if any
 
     Returns:
         List of Context objects with additional information
 
     """
-    rtn = []
-    async with AsyncClient() as client:
-        if full:
-            llms_full_txt_url = _get_llms_txt_url(url, True)
-            try:
-                response = await client.get(
-                    llms_full_txt_url,
-                    headers={
-                        "User-Agent": user_agent,
-                        "Accept-Language": accept_language,
-                    },
-                    follow_redirects=True,
-                    timeout=timeout,
-                )
-                if response.status_code == HTTPStatus.OK:
-                    rtn.append(
-                        Context(
-                            type="llms_txt",
-                            url=AnyHttpUrl(llms_full_txt_url),
-                            text=response.text,
-                        ),
-                    )
-            except HTTPError:
-                logger.exception("Failed to fetch llms-full.txt %s", llms_full_txt_url)
-        if len(rtn) == 0:
-            llms_txt_url = _get_llms_txt_url(url, False)
-            try:
-                response = await client.get(
-                    llms_txt_url,
-                    headers={
-                        "User-Agent": user_agent,
-                        "Accept-Language": accept_language,
-                    },
-                    follow_redirects=True,
-                    timeout=timeout,
-                )
-                if response.status_code == HTTPStatus.OK:
-                    rtn.append(
-                        Context(
-                            type="llms_txt",
-                            url=AnyHttpUrl(llms_txt_url),
-                            text=response.text,
-                        ),
-                    )
-            except HTTPError:
-                logger.warning("Failed to fetch llms.txt %s", llms_txt_url)
-    return rtn
+    llms_txt_urls = [_get_llms_txt_url(url, True)] if full else []
+    llms_txt_urls.append(_get_llms_txt_url(url, False))
+    async with _use_client(client) as http_client:
+        for llms_txt_url in llms_txt_urls:
+            llms_txt = await _get_llms_txt(
+                llms_txt_url=llms_txt_url,
+                user_agent=user_agent,
+                accept_language=accept_language,
+                timeout=timeout,
+                http_client=http_client,
+                llms_txt_cache=llms_txt_cache,
+                scheduler=scheduler,
+            )
+            if (context := llms_txt.to_context()) is not None:
+                return [context]
+    return []
 
 
 def _get_llms_txt_url(url: str, full: bool = True) -> str:
@@ -20,6 +20,18 @@ def pytest_collection_modifyitems(config, items) -> None:
                 item.add_marker(skip_me)
 
 
+@pytest.fixture(autouse=True)
+def web_cache_paths(tmp_path, monkeypatch) -> None:
+    """Keep the persistent caches of the web module in the temporary directory of the test.
+
+    Args:
+        tmp_path: The temporary directory of the test.
+        monkeypatch: The monkeypatch fixture.
+    """
+    monkeypatch.setenv("STARBRIDGE_WEB_RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORMATION_CACHE_PATH", str(tmp_path / "transformations.sqlite3"))
+
+
 @pytest.fixture(scope="session")
 def docker_compose_file(pytestconfig) -> str:
     """Get the path to the docker compose file.
@@ -0,0 +1,204 @@
+"""Tests for caches of the web module."""
+
+import sqlite3
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+from starbridge.web.cache import ResponseCache, TransformationCache, TTLCache, get_ttl_from_headers
+
+TIME_MONOTONIC = "starbridge.web.cache.time.monotonic"
+
+
+def test_web_cache_hit_and_miss_counted() -> None:
+    """Check hits and misses are counted."""
+    cache: TTLCache[str, str] = TTLCache(max_entries=2, default_ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", "A")
+    assert cache.get("a") == "A"
+    assert cache.stats() == {"entries": 1, "max_entries": 2, "hits": 1, "misses": 1}
+
+
+def test_web_cache_evicts_least_recently_used() -> None:
+    """Check least recently used entry is evicted when full."""
+    cache: TTLCache[str, str] = TTLCache(max_entries=2, default_ttl=60)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_web_cache_expires_entries() -> None:
+    """Check entries expire after their time to live."""
+    cache: TTLCache[str, str] = TTLCache(max_entries=2, default_ttl=60)
+    with patch(TIME_MONOTONIC, return_value=1000.0):
+        cache.set("a", "A", ttl=10)
+        cache.set("b", "B", ttl=0)
+    with patch(TIME_MONOTONIC, return_value=1005.0):
+        assert cache.get("a") == "A"
+    with patch(TIME_MONOTONIC, return_value=1011.0):
+        assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert len(cache) == 0
+
+
+def test_web_cache_ttl_from_headers() -> None:
+    """Check time to live is derived from Cache-Control and Expires headers."""
+    assert get_ttl_from_headers(httpx.Headers(), 42) == 42
+    assert get_ttl_from_headers(httpx.Headers({"Cache-Control": "public, max-age=600"}), 42) == 600
+    assert get_ttl_from_headers(httpx.Headers({"Cache-Control": "max-age=600, s-maxage=60"}), 42) == 60
+    assert get_ttl_from_headers(httpx.Headers({"Cache-Control": "max-age=600"}), 42, max_ttl=100) == 100
+    assert get_ttl_from_headers(httpx.Headers({"Cache-Control": "no-store"}), 42) == 0
+    assert (
+        get_ttl_from_headers(
+            httpx.Headers({"Date": "Wed, 21 Oct 2015 07:28:00 GMT", "Expires": "Wed, 21 Oct 2015 08:28:00 GMT"}),
+            42,
+        )
+        == 3600
+    )
+    assert get_ttl_from_headers(httpx.Headers({"Expires": "0"}), 42) == 0
+
+
+def _get_response(url: str, content: bytes, headers: dict[str, str]) -> httpx.Response:
+    return httpx.Response(200, headers=headers, content=content, request=httpx.Request("GET", url))
+
+
+def test_web_cache_responses_persisted_and_revalidated(tmp_path: Path) -> None:
+    """Check responses are persisted, stale ones kept for revalidation, and uncacheable ones skipped."""
+    cache = ResponseCache(path=tmp_path / "responses.sqlite3", max_bytes=1024, default_ttl=0)
+    key = ResponseCache.get_key("HTTPS://Example.com#fragment", "en")
+    assert key == ResponseCache.get_key("https://example.com/", "en")
+    cache.set(key, _get_response("https://example.com/", b"fresh", {"Cache-Control": "max-age=60"}))
+    cache.set("no-store", _get_response("https://example.com/", b"x", {"Cache-Control": "no-store, max-age=60"}))
+    cache.set("no-validators", _get_response("https://example.com/", b"x", {}))
+    cache.set("stale", _get_response("https://example.com/stale", b"stale", {"ETag": '"v1"', "Date": "x"}))
+    cache.close()
+
+    cache = ResponseCache(path=tmp_path / "responses.sqlite3", max_bytes=1024, default_ttl=0)
+    cached = cache.get(key)
+    assert cached is not None
+    assert cached.is_fresh
+    assert cached.to_response().content == b"fresh"
+    assert cache.get("no-store") is None
+    assert cache.get("no-validators") is None
+    stale = cache.get("stale")
+    assert stale is not None
+    assert not stale.is_fresh
+    assert stale.get_conditional_headers() == {"If-None-Match": '"v1"'}
+    not_modified = httpx.Response(304, headers={"Cache-Control": "max-age=60", "ETag": '"v1"'})
+    refreshed = cache.revalidate("stale", stale, not_modified)
+    assert refreshed.is_fresh
+    assert refreshed.to_response().content == b"stale"
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": 10,
+        "max_bytes": 1024,
+        "hits": 1,
+        "misses": 3,
+        "revalidations": 1,
+    }
+
+
+def test_web_cache_responses_evicted_by_bytes(tmp_path: Path) -> None:
+    """Check least recently used responses are evicted when exceeding the maximum bytes."""
+    cache = ResponseCache(path=tmp_path / "responses.sqlite3", max_bytes=10, default_ttl=60)
+    with patch("starbridge.web.cache.time.time", side_effect=range(100, 200)):
+        cache.set("a", _get_response("https://example.com/a", b"aaaa", {}))
+        cache.set("b", _get_response("https://example.com/b", b"bbbb", {}))
+        assert cache.get("a") is not None
+        cache.set("c", _get_response("https://example.com/c", b"cccc", {}))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        cache.set("d", _get_response("https://example.com/d", b"d" * 11, {}))
+        assert cache.get("d") is None
+    assert cache.stats()["bytes"] == 8
+
+
+def test_web_cache_responses_missed_and_skipped_if_path_unwritable(tmp_path: Path, caplog) -> None:
+    """Check a database that cannot be created is treated as empty, logging the failures."""
+    (tmp_path / "file").write_text("not a directory")
+    cache = ResponseCache(path=tmp_path / "file" / "responses.sqlite3", max_bytes=1024, default_ttl=60)
+    cache.set("a", _get_response("https://example.com/a", b"aaaa", {}))
+    assert cache.get("a") is None
+    assert not cache.is_fresh("a")
+    assert cache.stats()["entries"] == 0
+    cache.clear()
+    cache.close()
+    assert "Failed to store a" in caplog.text
+    assert "Failed to look up a" in caplog.text
+
+
+def test_web_cache_responses_missed_and_skipped_while_locked(tmp_path: Path) -> None:
+    """Check a database locked by another connection is treated as empty, and usable once unlocked."""
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(path=path, max_bytes=1024, default_ttl=60)
+    cache.set("a", _get_response("https://example.com/a", b"aaaa", {}))
+    lock = sqlite3.connect(path)
+    lock.execute("BEGIN EXCLUSIVE")
+    cache.set("b", _get_response("https://example.com/b", b"bbbb", {}))
+    assert cache.get("a") is None
+    lock.rollback()
+    lock.close()
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    cache.close()
+
+
+def test_web_cache_accesses_written_in_batches(tmp_path: Path) -> None:
+    """Check reads do not write to the database, accesses being written on insert resp. close."""
+    path = tmp_path / "transformations.sqlite3"
+    cache = TransformationCache(path=path, max_bytes=1024)
+    with patch("starbridge.web.cache.time.time", side_effect=range(100, 200)):
+        cache.set("a", "a")
+        cache.set("b", "b")
+        changes = cache._get_connection().total_changes
+        assert cache.get("a") == "a"
+        assert cache._get_connection().total_changes == changes
+        cache.close()
+    reopened = TransformationCache(path=path, max_bytes=1024)
+    assert reopened._get_connection().execute("SELECT key FROM transformations ORDER BY accessed_at").fetchall() == [
+        ("b",),
+        ("a",),
+    ]
+    reopened.close()
+
+
+def test_web_cache_transformations_addressed_by_content_and_options(tmp_path: Path) -> None:
+    """Check transformations are keyed by content and options, and stored compressed."""
+    cache = TransformationCache(path=tmp_path / "transformations.sqlite3", max_bytes=1024)
+    key = TransformationCache.get_key(b"%PDF", {"type": "application/pdf", "version": "1"})
+    assert key == TransformationCache.get_key(b"%PDF", {"version": "1", "type": "application/pdf"})
+    assert key != TransformationCache.get_key(b"%PDF", {"type": "application/pdf", "version": "2"})
+    assert key != TransformationCache.get_key(b"%PDF-1.7", {"type": "application/pdf", "version": "1"})
+    assert cache.get(key) is None
+    markdown = "# Headline\n\n" + "Lorem ipsum " * 100
+    cache.set(key, markdown)
+    assert cache.get(key) == markdown
+    stats = cache.stats()
+    assert stats["bytes"] < len(markdown)
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_web_cache_transformations_missed_if_corrupt_or_locked(tmp_path: Path) -> None:
+    """Check corrupt resp. locked transformations are treated as not cached."""
+    path = tmp_path / "transformations.sqlite3"
+    cache = TransformationCache(path=path, max_bytes=1024)
+    cache.set("a", "a")
+    cache._get_connection().execute("UPDATE transformations SET markdown = ? WHERE key = ?", (b"corrupt", "a"))
+    cache._get_connection().commit()
+    assert cache.get("a") is None
+    cache.set("a", "a")
+    lock = sqlite3.connect(path)
+    lock.execute("BEGIN EXCLUSIVE")
+    assert cache.get("a") is None
+    cache.set("b", "b")
+    lock.rollback()
+    lock.close()
+    assert cache.get("a") == "a"
+    assert cache.get("b") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 3)
+    cache.close()
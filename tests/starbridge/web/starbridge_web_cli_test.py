@@ -8,7 +8,7 @@ import pytest
 from typer.testing import CliRunner
 
 from starbridge.cli import cli
-from starbridge.web import GetResult
+from starbridge.web import GetManyResult, GetResult
 
 GET_TEST_HTML_URL = "https://starbridge.readthedocs.io/en/latest/"
 GET_LLMS_TXT_URL = "https://docs.zapier.com/"
@@ -212,3 +212,35 @@ def test_web_cli_get_forbidden_ignored(runner) -> None:
     )
     assert "Where software is built" in result.output
     assert result.exit_code == 0
+
+
+def _mock_site(request: httpx.Request) -> httpx.Response:
+    """Serve a mock site, disallowing /private/ by robots.txt."""
+    if request.url.path == "/robots.txt":
+        return httpx.Response(200, text="User-agent: *\nDisallow: /private/\n")
+    return httpx.Response(200, html=f"<h1>{request.url.path}</h1>")
+
+
+@patch(
+    "starbridge.web.service.create_http_client",
+    side_effect=lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(_mock_site)),
+)
+def test_web_cli_get_many_emits_jsonl_with_partial_results(mock_create_http_client, runner) -> None:
+    """Check getting many URLs read from stdin emits one JSON line per URL, including failures."""
+    result = runner.invoke(
+        cli,
+        ["web", "get-many", "--no-additional-context"],
+        input="# docs\nhttps://example.com/a\n\nhttps://example.com/private/b\nhttps://example.org/c\n",
+    )
+    results = [GetManyResult.model_validate_json(line) for line in result.stdout.splitlines()]
+    assert [item.url for item in results] == [
+        "https://example.com/a",
+        "https://example.com/private/b",
+        "https://example.org/c",
+    ]
+    assert results[0].result is not None
+    assert "# /a" in (results[0].result.resource.text or "")
+    assert results[1].error is not None
+    assert results[1].error.startswith("RobotForbiddenError")
+    assert results[2].result is not None
+    assert result.exit_code == 1
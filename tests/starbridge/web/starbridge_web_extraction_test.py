@@ -0,0 +1,192 @@
+"""Tests for extraction of the main content of the web module."""
+
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import markdown
+import pytest
+from bs4 import BeautifulSoup, Tag
+
+from starbridge.web.extraction import iter_links, iter_markdown_links
+from starbridge.web.models import MimeType
+from starbridge.web.utils import (
+    extract_links_from_response,
+    get_transformation_key,
+    process_response,
+    transform_content,
+)
+
+ARTICLE_URL = "https://example.com/blog/post"
+HTML_FIXTURE = Path(__file__).parent.parent.parent / "fixtures" / "starbridge.html"
+MARKDOWN_LINKS_FIXTURE = Path(__file__).parent.parent.parent / "fixtures" / "starbridge_links.md"
+PARAGRAPH = (
+    "Starbridge integrates Claude with the world wide web, Confluence, Google and more, "
+    "so the assistant can fetch, read and summarize content on behalf of the user. "
+)
+MARKDOWN = """# Links
+
+See [the docs](https://example.com/docs "Docs") and [**bold** link](/bold_path(1)), [ref][r1], [Ref 2][] and [shortcut].
+Badge: [![Build](https://img.shields.io/badge.svg)](https://ci.example.com) ![Image](/image.png)
+Autolinks <https://example.com/auto> and <mailto:user@example.com>, code `[code](/code)`, [undefined][none].
+Escaped \\[not a link\\] and [snake_case_label](/snake).
+
+```
+[fenced](/fenced)
+```
+
+[r1]: https://example.com/r1
+[ref 2]: <https://example.com/r2> 'Title'
+[Shortcut]: /shortcut
+"""
+ARTICLE_HTML = f"""<html><head><title>Post</title></head><body>
+<div id="cookie-banner">We use cookies to improve your experience, accept all cookies to continue.</div>
+<header class="site-header"><a href="/">Home</a></header>
+<nav><ul><li><a href="/blog">Blog</a></li><li><a href="/about">About</a></li></ul></nav>
+<h1>Bridging the stars</h1>
+<div class="sidebar"><p>Popular posts you might like as well, handpicked by our editors.</p></div>
+<div class="post-body">
+<p>{PARAGRAPH}</p>
+<p>{PARAGRAPH} See the <a href="/docs">documentation</a> for details.</p>
+<p>{PARAGRAPH}</p>
+</div>
+<div class="related"><p><a href="/blog/other">Another post, also worth reading, with a long title</a></p></div>
+<footer><p>Copyright 2025, all rights reserved, imprint and privacy policy.</p></footer>
+</body></html>"""
+
+
+def _get_response(html: str) -> httpx.Response:
+    return httpx.Response(200, html=html, request=httpx.Request("GET", ARTICLE_URL))
+
+
+def test_web_extraction_main_content_drops_boilerplate() -> None:
+    """Check the main content keeps the article and its title, but drops navigation, banners and footers."""
+    resource, extracted_links = process_response(_get_response(ARTICLE_HTML), extract_links=True, main_content=True)
+    assert resource.type == MimeType.TEXT_MARKDWON
+    text = resource.text or ""
+    assert text.lstrip().startswith("# Bridging the stars")
+    assert text.count("Starbridge integrates Claude") == 3
+    assert "[documentation](/docs)" in text
+    for boilerplate in ("cookies", "Home", "About", "Popular posts", "Another post", "Copyright"):
+        assert boilerplate not in text
+    assert {str(link.url) for link in extracted_links or []} >= {
+        "https://example.com/about",
+        "https://example.com/blog/other",
+    }  # links are extracted from all content
+
+    full = transform_content(_get_response(ARTICLE_HTML)).text or ""
+    assert "Copyright" in full
+    assert len(text) < len(full)
+
+
+def test_web_extraction_main_content_of_fixture() -> None:
+    """Check the main content of a real page keeps all its sections, but drops its navigation and footer."""
+    response = _get_response(HTML_FIXTURE.read_text(encoding="utf-8"))
+    text = transform_content(response, main_content=True).text or ""
+    assert text.lstrip().startswith("# ⭐ Starbridge")
+    for heading in ("Example Prompts", "Setup", "MCP Server", "CLI", "Operational Excellence", "Further Reading"):
+        assert f"## {heading}" in text
+    for boilerplate in ("Getting-Started", "Google-Drive", "Release-Notes", "Discussions"):
+        assert boilerplate not in text
+
+    full = transform_content(response).text or ""
+    assert "Release-Notes" in full
+    assert "Discussions" in full
+
+
+def test_web_extraction_main_content_falls_back_to_page_without_article() -> None:
+    """Check pages without article-like content are converted as a whole, boilerplate removed."""
+    html = "<html><body><nav><a href='/'>Home</a></nav><h1>Status</h1><p>All systems operational.</p></body></html>"
+    text = transform_content(_get_response(html), main_content=True).text or ""
+    assert "All systems operational." in text
+    assert "# Status" in text
+    assert "Home" not in text
+
+
+def test_web_extraction_main_content_cached_separately() -> None:
+    """Check the main content is cached under another key than the full content."""
+    response = _get_response(ARTICLE_HTML)
+    assert get_transformation_key(response, "html.parser", main_content=True) != get_transformation_key(
+        response,
+        "html.parser",
+    )
+
+
+def test_web_extraction_links_streamed_in_any_chunks() -> None:
+    """Check links are extracted alike however the HTML is chunked, ignoring templates and scripts."""
+    html = (
+        "<script>document.write('<a href=\"/tracking\">Tracking</a>');</script>"
+        "<p><a href='/a'>A &amp; <b>bold</b></a> <a href=/b>B<a href='/c'>C</a>"
+        "<template><a href='/template'>Template</a></template><a name='anchor'>Anchor</a><a href>Self</a>"
+    )
+    expected = [("/a", "A & bold"), ("/b", "B"), ("/c", "C"), ("", "Self")]
+    assert list(iter_links([html])) == expected
+    assert list(iter_links(html)) == expected  # fed one character at a time
+
+
+def test_web_extraction_links_without_building_tree() -> None:
+    """Check links are extracted without parsing the HTML into a tree, keeping the most frequent only."""
+    html = "".join(f"<a href='/page/{i % 7}'>Page {i % 7}</a>" for i in range(10_000))
+    response = httpx.Response(200, html=f"<html><body>{html}</body></html>", request=httpx.Request("GET", ARTICLE_URL))
+    with patch("starbridge.web.utils.BeautifulSoup", wraps=BeautifulSoup) as mock_beautiful_soup:
+        links = extract_links_from_response(response, max_links=3)
+        assert mock_beautiful_soup.call_count == 0
+    assert [(str(link.url), link.occurrences) for link in links] == [
+        ("https://example.com/page/0", 1429),
+        ("https://example.com/page/1", 1429),
+        ("https://example.com/page/2", 1429),
+    ]
+    assert len(extract_links_from_response(response)) == 7
+
+
+def test_web_extraction_markdown_links_as_rendered() -> None:
+    """Check links are extracted from markdown directly as from markdown rendered to HTML."""
+    links = list(iter_markdown_links(MARKDOWN))
+    assert links == list(iter_links([markdown.markdown(MARKDOWN)]))
+    assert [href for href, _ in links] == [
+        "https://example.com/docs",
+        "/bold_path(1)",
+        "https://example.com/r1",
+        "https://example.com/r2",
+        "/shortcut",
+        "https://ci.example.com",
+        "https://example.com/auto",
+        "mailto:user@example.com",
+        "/snake",
+    ]
+
+
+def _get_rendered_links(text: str) -> list[tuple[str, str]]:
+    soup = BeautifulSoup(markdown.markdown(text), "html.parser")
+    return [
+        (str(a["href"]), " ".join(a.get_text().split())) for a in soup.find_all("a", href=True) if isinstance(a, Tag)
+    ]
+
+
+@pytest.mark.parametrize("text", [MARKDOWN, MARKDOWN_LINKS_FIXTURE.read_text(encoding="utf-8")])
+def test_web_extraction_markdown_links_as_parsed_from_rendered_html(text: str) -> None:
+    """Check links are extracted from markdown as parsed by BeautifulSoup from markdown rendered to HTML."""
+    assert list(iter_markdown_links(text)) == _get_rendered_links(text)
+
+
+def test_web_extraction_markdown_links_skip_indented_code() -> None:
+    """Check links in code indented by spaces resp. tabs are skipped, unless continuing list items."""
+    hrefs = [href for href, _ in iter_markdown_links(MARKDOWN_LINKS_FIXTURE.read_text(encoding="utf-8"))]
+    assert "/docs/restart" in hrefs
+    assert "https://example.com/docs/nested item" in hrefs
+    assert not [href for href in hrefs if "code" in href]
+
+
+def test_web_extraction_markdown_links_without_rendering() -> None:
+    """Check links are extracted from markdown responses without rendering them to HTML."""
+    response = httpx.Response(
+        200,
+        text=MARKDOWN,
+        headers={"Content-Type": "text/markdown"},
+        request=httpx.Request("GET", "https://example.com/llms-full.txt"),
+    )
+    with patch("starbridge.web.utils.markdown.markdown") as mock_markdown:
+        links = extract_links_from_response(response)
+        mock_markdown.assert_not_called()
+    assert links[0].anchor_texts == ["the docs"]
+    assert "https://example.com/shortcut" in {str(link.url) for link in links}
@@ -0,0 +1,180 @@
+"""Tests for scheduling of requests of the web module."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from starbridge.web import HostUnavailableError
+from starbridge.web.scheduler import CircuitBreaker, CircuitState, HostScheduler, SingleFlight
+
+
+def test_web_scheduler_interval_raised_by_crawl_delay() -> None:
+    """Check the interval is the minimum, raised by the crawl delay up to the maximum honored."""
+    scheduler = HostScheduler(min_interval=1, max_crawl_delay=10)
+    assert scheduler.get_interval() == 1
+    assert scheduler.get_interval(0.5) == 1
+    assert scheduler.get_interval(5) == 5
+    assert scheduler.get_interval(3600) == 10
+
+
+@pytest.mark.asyncio
+async def test_web_scheduler_spaces_out_requests_per_host() -> None:
+    """Check requests to the same host are spaced out in order, while other hosts are not held up."""
+    scheduler = HostScheduler(min_interval=1, max_crawl_delay=10)
+    with (
+        patch("starbridge.web.scheduler.time.monotonic", return_value=100.0),
+        patch("starbridge.web.scheduler.asyncio.sleep", new_callable=AsyncMock) as mock_sleep,
+    ):
+        await scheduler.wait("https://example.com/a")
+        await scheduler.wait("https://example.com/b")
+        await scheduler.wait("https://EXAMPLE.com/c", crawl_delay=5)
+        await scheduler.wait("https://example.org/d")
+    assert [call.args[0] for call in mock_sleep.await_args_list] == [1, 6]
+    assert scheduler.stats() == {
+        "hosts": 2,
+        "waits": 2,
+        "waited": 7,
+        "latency_hosts": 0,
+        "hedges": 0,
+        "hedges_won": 0,
+    }
+
+
+def test_web_scheduler_adapts_timeouts_and_hedges_to_latency_per_host() -> None:
+    """Check timeouts and hedge delays follow the latency percentiles of a host, once enough are recorded."""
+    scheduler = HostScheduler(min_interval=0, max_crawl_delay=10, timeout_multiplier=4, min_timeout=1, hedge=True)
+    url = "https://example.com/page"
+    for _ in range(9):
+        scheduler.record_latency(url, 0.1)
+    assert scheduler.get_timeout(url, 60) == 60
+    assert scheduler.get_hedge_delay(url) is None
+    for latency in [0.1] * 90 + [0.5] * 9:
+        scheduler.record_latency(url, latency)
+    assert scheduler.get_latency_percentile(url, 95) == pytest.approx(0.5)
+    assert scheduler.get_timeout(url, 60) == 2
+    assert scheduler.get_timeout(url, 1.5) == pytest.approx(1.5)
+    assert scheduler.get_hedge_delay(url) == pytest.approx(0.5)
+    assert scheduler.get_hedge_delay(url, crawl_delay=1) is None
+    assert scheduler.get_timeout("https://example.org/", 60) == 60
+    for _ in range(100):
+        scheduler.record_latency(url, 0.01)
+    assert scheduler.get_timeout(url, 60) == 1
+    assert scheduler.stats()["latency_hosts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_web_scheduler_single_flight_coalesces_concurrent_calls() -> None:
+    """Check concurrent calls with the same key share one call, while calls with other keys are carried out."""
+    calls: list[str] = []
+    release = asyncio.Event()
+
+    async def call(key: str) -> str:
+        calls.append(key)
+        await release.wait()
+        return key.upper()
+
+    flight: SingleFlight[str] = SingleFlight()
+    tasks = [asyncio.create_task(flight.do(key, lambda key=key: call(key))) for key in ("a", "a", "b", "a")]
+    await asyncio.sleep(0)
+    assert flight.stats() == {"in_flight": 2, "waiters": 4, "flights": 2, "coalesced": 2}
+    release.set()
+    assert await asyncio.gather(*tasks) == ["A", "A", "B", "A"]
+    assert calls == ["a", "b"]
+    assert flight.stats() == {"in_flight": 0, "waiters": 0, "flights": 2, "coalesced": 2}
+
+    assert await flight.do("a", lambda: call("a")) == "A"
+    assert calls == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_web_scheduler_single_flight_shares_errors_and_survives_cancelled_callers() -> None:
+    """Check errors are raised to all callers, and a call is cancelled only once all of its callers are."""
+    release = asyncio.Event()
+
+    async def fail() -> None:
+        await release.wait()
+        message = "failed"
+        raise ValueError(message)
+
+    flight: SingleFlight[None] = SingleFlight()
+    first = asyncio.create_task(flight.do("key", fail))
+    second = asyncio.create_task(flight.do("key", fail))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    with pytest.raises(ValueError, match="failed"):
+        await second
+    assert first.cancelled()
+
+    release.clear()
+    only = asyncio.create_task(flight.do("key", fail))
+    await asyncio.sleep(0)
+    only.cancel()
+    await asyncio.sleep(0)
+    assert flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_web_scheduler_circuit_breaker_opens_after_failures_and_closes_after_trial() -> None:
+    """Check a host failing in a row is rejected fast until the cool-down passed, then tried once to close."""
+    breaker: CircuitBreaker[int] = CircuitBreaker(failure_threshold=2, cooldown=30)
+    url = "https://example.com/page"
+    release = asyncio.Event()
+
+    def is_failure(outcome: int | Exception) -> bool:
+        return isinstance(outcome, Exception) or outcome >= 500
+
+    async def respond(status: int) -> int:
+        await release.wait()
+        return status
+
+    release.set()
+    with patch("starbridge.web.scheduler.time.monotonic", return_value=100.0) as monotonic:
+        assert await breaker.call(url, lambda: respond(503), is_failure) == 503
+        assert breaker.get_state(url) == CircuitState.CLOSED
+        with pytest.raises(ConnectionError):
+            await breaker.call(url, AsyncMock(side_effect=ConnectionError), is_failure)
+        assert breaker.get_state(url) == CircuitState.OPEN
+        with pytest.raises(HostUnavailableError, match="requested again in 30s"):
+            await breaker.call("https://EXAMPLE.com/other", lambda: respond(200), is_failure)
+        assert await breaker.call("https://example.org/", lambda: respond(200), is_failure) == 200
+
+        monotonic.return_value = 130.0
+        assert breaker.get_state(url) == CircuitState.HALF_OPEN
+        release.clear()
+        trial = asyncio.create_task(breaker.call(url, lambda: respond(503), is_failure))
+        await asyncio.sleep(0)
+        with pytest.raises(HostUnavailableError, match="trial request"):
+            breaker.check(url)
+        release.set()
+        assert await trial == 503
+        assert breaker.get_state(url) == CircuitState.OPEN
+
+        monotonic.return_value = 160.0
+        assert await breaker.call(url, lambda: respond(200), is_failure) == 200
+        assert breaker.get_state(url) == CircuitState.CLOSED
+    assert breaker.stats() == {"circuits": {}, "failing": 0, "trips": 2, "rejected": 2}
+
+
+@pytest.mark.asyncio
+async def test_web_scheduler_circuit_breaker_releases_trial_if_cancelled() -> None:
+    """Check a trial request cancelled lets another trial request pass, and a disabled breaker never rejects."""
+    breaker: CircuitBreaker[int] = CircuitBreaker(failure_threshold=1, cooldown=0)
+    url = "https://example.com/page"
+    with pytest.raises(ConnectionError):
+        await breaker.call(url, AsyncMock(side_effect=ConnectionError), lambda _: True)
+    trial = asyncio.create_task(breaker.call(url, lambda: asyncio.sleep(10, result=200), lambda _: False))
+    await asyncio.sleep(0)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    assert breaker.stats()["circuits"] == {"example.com": "half_open"}
+    assert await breaker.call(url, AsyncMock(return_value=200), lambda _: False) == 200
+
+    disabled: CircuitBreaker[int] = CircuitBreaker(failure_threshold=0, cooldown=30)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            await disabled.call(url, AsyncMock(side_effect=ConnectionError), lambda _: True)
+    assert disabled.get_state(url) == CircuitState.CLOSED
@@ -1,11 +1,14 @@
 """Tests for the web service functionality."""
 
 import asyncio
+import time
+from pathlib import Path
 from unittest.mock import patch
 
+import httpx
 import pytest
 
-from starbridge.web import RobotForbiddenError, Service
+from starbridge.web import HostUnavailableError, RobotForbiddenError, Service
 
 GET_TEST_TEXT_URL = (
     "https://github.com/helmut-hoffer-von-ankershoffen/starbridge/raw/refs/heads/main/tests/fixtures/starbridge.txt"
@@ -22,6 +25,29 @@ GET_TEST_WORD_URL = (
 GET_TEST_EXCEL_URL = (
     "https://github.com/helmut-hoffer-von-ankershoffen/starbridge/raw/refs/heads/main/tests/fixtures/starbridge.xlsx"
 )
+MOCK_SITE_URL = "https://example.com"
+MOCK_HTML = "<html><body><h1>Headline</h1><a href='/about'>About</a></body></html>"
+MOCK_LLMS_TXT = "# Example"
+
+
+def _mock_site(request: httpx.Request) -> httpx.Response:
+    """Serve a mock site, disallowing /private/ by robots.txt."""
+    match request.url.path:
+        case "/robots.txt":
+            return httpx.Response(200, text="User-agent: *\nDisallow: /private/\n")
+        case "/llms.txt":
+            return httpx.Response(200, text=MOCK_LLMS_TXT)
+        case "/llms-full.txt":
+            return httpx.Response(404)
+    return httpx.Response(200, html=MOCK_HTML)
+
+
+def _patch_http_client(handler=_mock_site):
+    """Patch the shared HTTP client of the web service to serve from the given handler."""
+    return patch(
+        "starbridge.web.service.create_http_client",
+        side_effect=lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
 
 
 def test_web_service_get_forbidden() -> None:
@@ -95,3 +121,576 @@ async def test_web_service_get_markdown(runner) -> None:
         url=GET_TEST_MARKDOWN_URL,
     )
     assert "Lorem Ipsum" in (result.resource.text or "")
+
+
+@pytest.mark.asyncio
+async def test_web_service_shares_http_client() -> None:
+    """Check the service reuses one pooled HTTP client and closes it on shutdown."""
+    service = Service()
+    client = service._get_client()
+    assert service._get_client() is client
+    await service.shutdown()
+    assert client.is_closed
+    assert service._get_client() is not client
+    await service.shutdown()
+
+
+def test_web_service_info_reports_caches() -> None:
+    """Check info reports hit and miss counters of caches."""
+    info = Service().info()
+    assert info["caches"]["robots_txt"]["hits"] == 0
+    assert info["caches"]["llms_txt"]["misses"] == 0
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_mocked_site() -> None:
+    """Check getting a page transforms it, extracts links and adds llms.txt as context."""
+    with _patch_http_client():
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", llms_full_txt=True)
+        await service.shutdown()
+    assert "# Headline" in (result.resource.text or "")
+    assert str(result.extracted_links[0].url) == f"{MOCK_SITE_URL}/about"
+    context = result.get_context_by_type("llms_txt")
+    assert context is not None
+    assert context.text == MOCK_LLMS_TXT
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_mocked_site_forbidden() -> None:
+    """Check speculatively fetched page is discarded if robots.txt disallows it."""
+    with _patch_http_client():
+        service = Service()
+        with pytest.raises(RobotForbiddenError):
+            await service.get(url=f"{MOCK_SITE_URL}/private/")
+        # robots.txt is cached now, so no speculative fetch is started
+        with pytest.raises(RobotForbiddenError):
+            await service.get(url=f"{MOCK_SITE_URL}/private/")
+        await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_word_and_excel_converted_in_memory() -> None:
+    """Check Word and Excel documents are converted without downloading them again."""
+    requested_paths = []
+
+    def serve_documents(request: httpx.Request) -> httpx.Response:
+        requested_paths.append(request.url.path)
+        if request.url.path.startswith("/starbridge."):
+            return httpx.Response(200, content=Path(f"tests/fixtures{request.url.path}").read_bytes())
+        return httpx.Response(404)
+
+    with _patch_http_client(serve_documents):
+        service = Service()
+        word = await service.get(url=f"{MOCK_SITE_URL}/starbridge.docx", additional_context=False)
+        excel = await service.get(url=f"{MOCK_SITE_URL}/starbridge.xlsx", additional_context=False)
+        await service.shutdown()
+    assert "# Headline" in (word.resource.text or "")
+    assert "Starbridge" in (excel.resource.text or "")
+    assert requested_paths.count("/starbridge.docx") == 1
+    assert requested_paths.count("/starbridge.xlsx") == 1
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_transforms_within_event_loop_if_no_workers(monkeypatch) -> None:
+    """Check content is transformed within the event loop if no worker processes are configured."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "0")
+    with _patch_http_client():
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        await service.shutdown()
+    assert service._transform_pool is None
+    assert "# Headline" in (result.resource.text or "")
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_revalidates_cached_response(monkeypatch, tmp_path: Path) -> None:
+    """Check cached responses are revalidated, unchanged pages costing a 304 without body only."""
+    monkeypatch.setenv("STARBRIDGE_WEB_RESPONSE_CACHE", "1")
+    monkeypatch.setenv("STARBRIDGE_WEB_RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+    conditional_headers: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/docs/":
+            conditional_headers.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, html=MOCK_HTML, headers={"ETag": '"v1"'})
+        return _mock_site(request)
+
+    with _patch_http_client(handler):
+        service = Service()
+        first = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        second = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        uncached = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False, use_cache=False)
+        info = service.info()
+        await service.shutdown()
+    assert conditional_headers == [None, '"v1"', None]
+    assert first.resource.text == second.resource.text == uncached.resource.text
+    assert "# Headline" in (second.resource.text or "")
+    assert info["caches"]["responses"]["revalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_converts_identical_documents_once(monkeypatch, tmp_path: Path) -> None:
+    """Check the same document served from different URLs is converted to markdown once."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "0")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORMATION_CACHE", "1")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORMATION_CACHE_PATH", str(tmp_path / "transformations.sqlite3"))
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith(".pdf"):
+            return httpx.Response(200, headers={"Content-Type": "application/pdf"}, content=b"%PDF-1.7")
+        return _mock_site(request)
+
+    with (
+        _patch_http_client(handler),
+        patch("starbridge.web.utils._get_markdown_from_pdf", return_value="# PDF") as mock_get_markdown_from_pdf,
+    ):
+        service = Service()
+        first = await service.get(url=f"{MOCK_SITE_URL}/a.pdf", additional_context=False)
+        mirrored = await service.get(url=f"{MOCK_SITE_URL}/mirror/a.pdf", additional_context=False)
+        info = service.info()
+        await service.shutdown()
+    assert mock_get_markdown_from_pdf.call_count == 1
+    assert first.resource.text == mirrored.resource.text == "# PDF"
+    assert str(mirrored.resource.url) == f"{MOCK_SITE_URL}/mirror/a.pdf"
+    assert info["caches"]["transformations"]["hits"] == 1
+
+
+def _serve_pdf(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith(".pdf"):
+        return httpx.Response(200, headers={"Content-Type": "application/pdf"}, content=b"%PDF-1.7")
+    return _mock_site(request)
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_converts_selected_pdf_pages_only(monkeypatch) -> None:
+    """Check only the pages selected of a PDF document are converted."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORMATION_CACHE", "0")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "0")
+    with (
+        _patch_http_client(_serve_pdf),
+        patch("starbridge.web.service.get_pdf_page_count", return_value=30),
+        patch(
+            "starbridge.web.utils._get_markdown_from_pdf",
+            side_effect=lambda response, pages=None: f"pages {pages}",
+        ),
+    ):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/spec.pdf", additional_context=False, pages="10-12,30-")
+        with pytest.raises(ValueError, match="Invalid page range"):
+            await service.get(url=f"{MOCK_SITE_URL}/spec.pdf", additional_context=False, pages="ten")
+        await service.shutdown()
+    assert result.resource.type == "text/markdown"
+    assert result.resource.text == "pages [9, 10, 11, 29]"
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_converts_selected_excel_sheets_only(monkeypatch) -> None:
+    """Check only the sheets selected of an Excel document are converted, raising for unknown ones."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORMATION_CACHE", "0")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "0")
+
+    def serve_excel(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=Path("tests/fixtures/starbridge.xlsx").read_bytes())
+
+    with _patch_http_client(serve_excel):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/starbridge.xlsx", additional_context=False, sheets="Sheet1")
+        with pytest.raises(ValueError, match="Sheets Other not found"):
+            await service.get(url=f"{MOCK_SITE_URL}/starbridge.xlsx", additional_context=False, sheets="Other")
+        await service.shutdown()
+    assert result.resource.type == "text/markdown"
+    assert (result.resource.text or "").startswith("## Sheet1\n\nDimensions: 1 rows x 1 columns\n")
+    assert "| Starbridge |" in (result.resource.text or "")
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_converts_pdf_pages_in_chunks_across_workers(monkeypatch) -> None:
+    """Check PDF documents are converted in chunks of pages across worker processes, stitched in order."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORMATION_CACHE", "0")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "3")
+    monkeypatch.setenv("STARBRIDGE_WEB_PDF_PAGES_PER_TASK", "4")
+    chunks: list[list[int]] = []
+
+    async def run_inline(function, *args):  # noqa: RUF029
+        return function(*args)
+
+    def convert(response: httpx.Response, pages: list[int] | None = None) -> str:
+        chunks.append(pages or [])
+        return "".join(f"page {page}\n" for page in pages or [])
+
+    with (
+        _patch_http_client(_serve_pdf),
+        patch("starbridge.web.service.get_pdf_page_count", side_effect=[20, 6]),
+        patch("starbridge.web.utils._get_markdown_from_pdf", side_effect=convert),
+        patch.object(Service, "_run_in_pool", side_effect=run_inline, autospec=False),
+    ):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/spec.pdf", additional_context=False)
+        small = await service.get(url=f"{MOCK_SITE_URL}/small.pdf", additional_context=False)
+        await service.shutdown()
+    assert chunks[:3] == [list(range(6)), list(range(6, 13)), list(range(13, 20))]
+    assert result.resource.text == "".join(f"page {page}\n" for page in range(20))
+    assert chunks[3:] == [list(range(3)), list(range(3, 6))]
+    assert small.resource.text == "".join(f"page {page}\n" for page in range(6))
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_fails_fast_while_host_is_down(monkeypatch) -> None:
+    """Check a host failing repeatedly is not requested until the cool-down passed, with its circuit in info."""
+    monkeypatch.setenv("STARBRIDGE_WEB_CIRCUIT_BREAKER_FAILURES", "2")
+    requested_paths: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested_paths.append(request.url.path)
+        if request.url.host == "down.example.com":
+            message = "Connection refused"
+            raise httpx.ConnectError(message, request=request)
+        return _mock_site(request)
+
+    with _patch_http_client(handler):
+        service = Service()
+        with pytest.raises(RobotForbiddenError):
+            await service.get(url="https://down.example.com/page", additional_context=False)
+        with pytest.raises(httpx.ConnectError):
+            await service.get(
+                url="https://down.example.com/page",
+                additional_context=False,
+                force_not_respecting_robots_txt=True,
+            )
+        requested = len(requested_paths)
+        with pytest.raises(HostUnavailableError, match=r"down\.example\.com failed 2 times"):
+            await service.get(url="https://down.example.com/page")
+        result = await service.get(url=f"{MOCK_SITE_URL}/page", additional_context=False)
+        info = service.info()
+        await service.shutdown()
+    assert len(requested_paths) == requested + 2  # robots.txt and page of the host up only
+    assert "# Headline" in (result.resource.text or "")
+    assert info["circuit_breaker"]["circuits"] == {"down.example.com": "open"}
+    assert info["circuit_breaker"]["rejected"] == 1
+
+
+def test_web_service_health_lists_open_circuits_while_online(monkeypatch) -> None:
+    """Check health is down while the circuit of a host is open, listing it, although online."""
+    monkeypatch.setenv("STARBRIDGE_WEB_CIRCUIT_BREAKER_FAILURES", "1")
+    service = Service()
+    with patch("starbridge.web.service.is_connected", return_value=True):
+        assert service.health().status == "UP"
+        service._circuit_breaker._record("down.example.com", failed=True)
+        health = service.health()
+    assert health.status == "DOWN"
+    assert health.reason == "Circuits of hosts failing: {'down.example.com': 'open'}"
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_serves_fresh_cached_response_while_host_is_down(monkeypatch, tmp_path: Path) -> None:
+    """Check fresh cached responses are served although the circuit of their host is open."""
+    monkeypatch.setenv("STARBRIDGE_WEB_CIRCUIT_BREAKER_FAILURES", "1")
+    monkeypatch.setenv("STARBRIDGE_WEB_RESPONSE_CACHE", "1")
+    monkeypatch.setenv("STARBRIDGE_WEB_RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+    down = False
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if down:
+            message = "Connection refused"
+            raise httpx.ConnectError(message, request=request)
+        if request.url.path == "/cached":
+            return httpx.Response(200, html=MOCK_HTML, headers={"Cache-Control": "max-age=60"})
+        return _mock_site(request)
+
+    with _patch_http_client(handler):
+        service = Service()
+        await service.get(url=f"{MOCK_SITE_URL}/cached", additional_context=False)
+        down = True
+        with pytest.raises(httpx.ConnectError):
+            await service.get(url=f"{MOCK_SITE_URL}/page", additional_context=False)
+        result = await service.get(url=f"{MOCK_SITE_URL}/cached", additional_context=False)
+        with pytest.raises(HostUnavailableError):
+            await service.get(url=f"{MOCK_SITE_URL}/page", additional_context=False)
+        await service.shutdown()
+    assert "# Headline" in (result.resource.text or "")
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_many_limits_concurrency_per_host(monkeypatch) -> None:
+    """Check getting many URLs limits concurrent fetches per host, returning partial results in order."""
+    monkeypatch.setenv("STARBRIDGE_WEB_MAX_CONCURRENT_REQUESTS_PER_HOST", "1")
+    in_flight: dict[str, int] = {}
+    max_in_flight: dict[str, int] = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return _mock_site(request)
+        in_flight[request.url.host] = in_flight.get(request.url.host, 0) + 1
+        max_in_flight[request.url.host] = max(max_in_flight.get(request.url.host, 0), in_flight[request.url.host])
+        await asyncio.sleep(0.01)
+        in_flight[request.url.host] -= 1
+        return _mock_site(request)
+
+    urls = [
+        f"{MOCK_SITE_URL}/a",
+        f"{MOCK_SITE_URL}/private/b",
+        f"{MOCK_SITE_URL}/c",
+        "https://example.org/d",
+        "https://example.org/e",
+    ]
+    with _patch_http_client(handler):
+        service = Service()
+        results = await service.get_many(urls=urls, additional_context=False)
+        await service.shutdown()
+    assert [result.url for result in results] == urls
+    assert results[1].result is None
+    assert results[1].error is not None
+    assert results[1].error.startswith("RobotForbiddenError")
+    assert all(result.result is not None for i, result in enumerate(results) if i != 1)
+    assert max_in_flight == {"example.com": 1, "example.org": 1}
+
+
+def _mock_linked_site(request: httpx.Request) -> httpx.Response:
+    """Serve a mock site of linked pages, disallowing /private/ by robots.txt."""
+    links = {
+        "/": ["/docs/a", "/docs/b#section", "/blog/", "https://example.org/"],
+        "/docs/a": ["/docs/c", "/"],
+        "/docs/b": ["/private/d", "/docs/a"],
+        "/blog/": ["/blog/e"],
+    }
+    if request.url.path == "/robots.txt":
+        return _mock_site(request)
+    html = f"<h1>Page {request.url.path}</h1>" + "".join(
+        f"<a href='{href}'>{href}</a>" for href in links.get(request.url.path, [])
+    )
+    return httpx.Response(200, html=html)
+
+
+@pytest.mark.asyncio
+async def test_web_service_crawl_breadth_first() -> None:
+    """Check crawling visits same-origin pages breadth-first up to the maximum depth, each once."""
+    with _patch_http_client(_mock_linked_site):
+        service = Service()
+        pages = await service.crawl(url=f"{MOCK_SITE_URL}/", max_depth=2)
+        await service.shutdown()
+    assert [(page.url.removeprefix(MOCK_SITE_URL), page.depth) for page in pages] == [
+        ("/", 0),
+        ("/docs/a", 1),
+        ("/docs/b", 1),
+        ("/blog/", 1),
+        ("/docs/c", 2),
+        ("/private/d", 2),
+        ("/blog/e", 2),
+    ]
+    assert pages[0].title == "Page /"
+    assert pages[0].link_count == 4
+    assert "# Page /docs/a" in (pages[1].text or "")
+    assert pages[5].error is not None
+    assert pages[5].error.startswith("RobotForbiddenError")
+
+
+@pytest.mark.asyncio
+async def test_web_service_crawl_limited_by_prefix_and_pages() -> None:
+    """Check crawling only follows links with the prefix given, visiting no more than the maximum pages."""
+    with _patch_http_client(_mock_linked_site):
+        service = Service()
+        pages = await service.crawl(url=f"{MOCK_SITE_URL}/", max_depth=3, url_prefix=f"{MOCK_SITE_URL}/docs/")
+        limited = await service.crawl(url=f"{MOCK_SITE_URL}/", max_depth=3, max_pages=2)
+        await service.shutdown()
+    assert [page.url.removeprefix(MOCK_SITE_URL) for page in pages] == ["/", "/docs/a", "/docs/b", "/docs/c"]
+    assert [page.url.removeprefix(MOCK_SITE_URL) for page in limited] == ["/", "/docs/a"]
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_returns_text_in_parts() -> None:
+    """Check long text is returned in parts cut at line breaks, getting further parts without fetching again."""
+    text = "".join(f"line {i:03}\n" for i in range(100))
+    fetched: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/long.txt":
+            fetched.append(request.url.path)
+            return httpx.Response(200, text=text)
+        return _mock_site(request)
+
+    with _patch_http_client(handler):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/long.txt", max_chars=95)
+        parts = [result]
+        while (pagination := parts[-1].pagination) and pagination.next_cursor:
+            parts.append(await service.get(url=f"{MOCK_SITE_URL}/long.txt", cursor=pagination.next_cursor))
+        with pytest.raises(ValueError, match="invalid or expired"):
+            await service.get(url=f"{MOCK_SITE_URL}/long.txt", cursor="unknown:0")
+        with pytest.raises(ValueError, match="at least 1"):
+            await service.get(url=f"{MOCK_SITE_URL}/long.txt", cursor=result.pagination.next_cursor, max_chars=0)
+        complete = await service.get(url=f"{MOCK_SITE_URL}/long.txt", max_chars=len(text), additional_context=False)
+        await service.shutdown()
+
+    assert fetched == ["/long.txt", "/long.txt"]
+    assert result.resource.text == text[:90]
+    assert result.pagination.model_dump() == {
+        "offset": 0,
+        "total_chars": 900,
+        "next_cursor": result.pagination.next_cursor,
+    }
+    assert result.additional_context is not None
+    assert parts[1].additional_context is None
+    assert parts[1].pagination.offset == 90
+    assert "".join(part.resource.text or "" for part in parts) == text
+    assert complete.resource.text == text
+    assert complete.pagination is None
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_coalesces_identical_requests() -> None:
+    """Check concurrent identical requests share one fetch and processing, while differing ones do not."""
+    fetched: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path != "/robots.txt":
+            fetched.append(request.url.path)
+        return _mock_site(request)
+
+    with _patch_http_client(handler):
+        service = Service()
+        results = await asyncio.gather(
+            service.get(url=f"{MOCK_SITE_URL}/a", additional_context=False),
+            service.get(url=f"{MOCK_SITE_URL}/a#section", additional_context=False),
+            service.get(url=f"{MOCK_SITE_URL}/a", additional_context=False, extract_links=False),
+            service.get(url=f"{MOCK_SITE_URL}/b", additional_context=False),
+        )
+        info = service.info()
+        await service.shutdown()
+    assert sorted(fetched) == ["/a", "/b"]
+    assert results[0] == results[1]
+    assert results[0] is not results[1]
+    assert results[2].extracted_links is None
+    assert info["coalescing"]["fetches"]["coalesced"] == 2
+    assert info["coalescing"]["processes"]["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_honors_crawl_delay() -> None:
+    """Check requests to a host are spaced out by the crawl delay its robots.txt asks for."""
+    started: list[float] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text="User-agent: *\nCrawl-delay: 0.2\n")
+        started.append(time.monotonic())
+        return _mock_site(request)
+
+    with _patch_http_client(handler):
+        service = Service()
+        await service.get(url=f"{MOCK_SITE_URL}/a", additional_context=False)
+        await asyncio.gather(
+            service.get(url=f"{MOCK_SITE_URL}/b", additional_context=False),
+            service.get(url=f"{MOCK_SITE_URL}/c", additional_context=False),
+        )
+        info = service.info()
+        await service.shutdown()
+    assert started[2] - started[1] >= 0.15
+    assert info["scheduler"]["waits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_truncates_body_exceeding_maximum(monkeypatch) -> None:
+    """Check downloading a body exceeding the maximum size for its MIME type is aborted and marked truncated."""
+    monkeypatch.setenv("STARBRIDGE_WEB_MAX_BODY_SIZE_PER_MIME_TYPE", '{"text/html": 40}')
+    with _patch_http_client():
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        await service.shutdown()
+    assert result.resource.truncated
+    assert "# Headline" in (result.resource.text or "")
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_extracts_all_links_unless_limited(monkeypatch) -> None:
+    """Check all links of a page are extracted by default, resp. the most frequent ones if limited."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "0")
+    html = "<a href='/popular'>Popular</a>" * 2 + "".join(f"<a href='/{i}'>{i}</a>" for i in range(1500))
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        return httpx.Response(200, html=html)
+
+    with _patch_http_client(handler):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        await service.shutdown()
+    assert result.get_link_count() == 1501
+    monkeypatch.setenv("STARBRIDGE_WEB_MAX_EXTRACTED_LINKS", "1")
+    with _patch_http_client(handler):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        await service.shutdown()
+    assert [str(link.url) for link in result.extracted_links or []] == [f"{MOCK_SITE_URL}/popular"]
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_returns_content_as_is_if_too_large(monkeypatch) -> None:
+    """Check content exceeding the maximum task size is returned as is."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_MAX_TASK_SIZE", "10")
+    with _patch_http_client():
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        await service.shutdown()
+    assert result.resource.text == MOCK_HTML
+    assert result.extracted_links is None
+
+
+@pytest.mark.asyncio
+async def test_web_service_get_returns_content_as_is_on_transform_timeout(monkeypatch) -> None:
+    """Check content is returned as is if transformation in a worker process times out."""
+    with _patch_http_client(), patch.object(Service, "_run_in_pool", side_effect=TimeoutError):
+        service = Service()
+        result = await service.get(url=f"{MOCK_SITE_URL}/docs/", additional_context=False)
+        await service.shutdown()
+    assert result.resource.text == MOCK_HTML
+
+
+async def _wait_for_workers_started(service: Service) -> None:
+    """Wait until the pool of worker processes created for the running task has all its workers started."""
+    await asyncio.sleep(0)  # let the task started create the pool
+    await asyncio.gather(*(asyncio.wrap_future(future) for future in service._transform_pool_started))
+
+
+@pytest.mark.sequential
+@pytest.mark.asyncio
+async def test_web_service_run_in_pool_times_out_stuck_task_only(monkeypatch) -> None:
+    """Check a stuck task times out and its worker is terminated, while tasks waiting for a worker still run."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "1")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_TIMEOUT", "3")
+    service = Service()
+    stuck = asyncio.create_task(service._run_in_pool(time.sleep, 60))
+    await _wait_for_workers_started(service)
+    processes = list(service._transform_pool._processes.values())
+    # each waits for the stuck task, then for a fresh pool to start, then runs for 1 of the 3 seconds allowed
+    waiting = [asyncio.create_task(service._run_in_pool(time.sleep, 1)) for _ in range(2)]
+    with pytest.raises(TimeoutError):
+        await stuck
+    assert await asyncio.gather(*waiting) == [None, None]
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+    await service.shutdown()
+
+
+@pytest.mark.sequential
+@pytest.mark.asyncio
+async def test_web_service_run_in_pool_reruns_task_of_discarded_pool(monkeypatch) -> None:
+    """Check a task running while another times out is run again in a fresh pool."""
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_WORKERS", "2")
+    monkeypatch.setenv("STARBRIDGE_WEB_TRANSFORM_TIMEOUT", "3")
+    service = Service()
+    stuck = asyncio.create_task(service._run_in_pool(time.sleep, 60))
+    await _wait_for_workers_started(service)
+    pool = service._transform_pool
+    await asyncio.sleep(1.5)
+    # still running when the stuck task times out after 3 seconds, so run again for 2 of the 3 seconds allowed
+    running = asyncio.create_task(service._run_in_pool(time.sleep, 2))
+    with pytest.raises(TimeoutError):
+        await stuck
+    assert await running is None
+    assert service._transform_pool is not pool
+    await service.shutdown()
@@ -1,25 +1,51 @@
 """Tests for web utilities functionality."""
 
 import asyncio
+import contextlib
+import logging
+import pickle  # noqa: S403
+import time
+from datetime import datetime
+from io import BytesIO
+from operator import itemgetter
+from pathlib import Path
 from unittest.mock import patch
 
+import brotli
+import httpx
 import pytest
+import zstandard
+from bs4 import BeautifulSoup
 from httpx import TimeoutException
+from openpyxl import Workbook
 
 from starbridge import __project_name__
 from starbridge.web import RobotForbiddenError
+from starbridge.web.cache import ResponseCache, TTLCache
+from starbridge.web.models import HtmlParser, LinkTarget
+from starbridge.web.scheduler import HostScheduler, SingleFlight
 from starbridge.web.utils import (
+    RobotsTxt,
+    TruncatedResponse,
     _ensure_allowed_to_crawl,
+    convert_excel_sheets,
     get_additional_context_for_url,
+    get_available_html_parser,
+    get_page_numbers,
+    get_respectfully,
+    process_response,
+    process_response_compact,
 )
 
 GET_TEST_URL = "https://starbridge.readthedocs.io/en/latest/"
+ROBOTS_TXT_URL = "https://starbridge.readthedocs.io/robots.txt"
 HTTPX_ASYNC_CLIENT_GET = "httpx.AsyncClient.get"
 TIMEOUT_MESSAGE = "Connection timed out"
 LLMS_TXT_URL = "https://docs.zapier.com"
 LLMS_TXT = "llms_txt"
 LLMS_FULL_TXT = "llms-full.txt"
 LLMS_DUMY_CONTENT = "llms content"
+HTML_FIXTURE = Path(__file__).parent.parent.parent / "fixtures" / "starbridge.html"
 
 
 def test_web_utils_robots_disallowed_on_timeout() -> None:
@@ -111,3 +137,485 @@ def test_web_utils_context_fallback_to_non_full() -> None:
         assert llms_txt_context is not None
         assert str(llms_txt_context.url) == "https://docs.zapier.com/llms.txt"
         assert llms_txt_context.text == LLMS_DUMY_CONTENT
+
+
+def test_web_utils_robots_cached_per_site() -> None:
+    """Check robots.txt is fetched and parsed once per site when cached."""
+    robots_txt_cache = TTLCache(max_entries=10, default_ttl=60)
+    with patch(HTTPX_ASYNC_CLIENT_GET) as mock_get:
+        mock_get.return_value = httpx.Response(
+            200,
+            text="User-agent: *\nDisallow: /en/latest/private/\n",
+            request=httpx.Request("GET", ROBOTS_TXT_URL),
+        )
+        asyncio.run(_ensure_allowed_to_crawl(GET_TEST_URL, __project_name__, robots_txt_cache=robots_txt_cache))
+        with pytest.raises(RobotForbiddenError):
+            asyncio.run(
+                _ensure_allowed_to_crawl(
+                    f"{GET_TEST_URL}private/", __project_name__, robots_txt_cache=robots_txt_cache
+                ),
+            )
+        assert mock_get.call_count == 1
+    assert robots_txt_cache.stats()["hits"] == 1
+
+
+def test_web_utils_robots_forbidden_cached() -> None:
+    """Check robots.txt forbidden is cached as well."""
+    robots_txt_cache = TTLCache(max_entries=10, default_ttl=60)
+    with patch(HTTPX_ASYNC_CLIENT_GET) as mock_get:
+        mock_get.return_value = httpx.Response(403, request=httpx.Request("GET", ROBOTS_TXT_URL))
+        for _ in range(2):
+            with pytest.raises(RobotForbiddenError):
+                asyncio.run(_ensure_allowed_to_crawl(GET_TEST_URL, __project_name__, robots_txt_cache=robots_txt_cache))
+        assert mock_get.call_count == 1
+
+
+def test_web_utils_context_misses_and_failures_cached() -> None:
+    """Check llms.txt lookups are cached including not found and connection failures."""
+    llms_txt_cache = TTLCache(max_entries=10, default_ttl=60)
+
+    def mock_get_side_effect(url, **kwargs):
+        if LLMS_FULL_TXT in url:
+            raise TimeoutException(TIMEOUT_MESSAGE)
+        return httpx.Response(404, request=httpx.Request("GET", url))
+
+    with patch(HTTPX_ASYNC_CLIENT_GET) as mock_get:
+        mock_get.side_effect = mock_get_side_effect
+        for _ in range(3):
+            context = asyncio.run(
+                get_additional_context_for_url(
+                    LLMS_TXT_URL, __project_name__, full=True, llms_txt_cache=llms_txt_cache
+                ),
+            )
+            assert len(context) == 0
+        assert mock_get.call_count == 2
+    assert llms_txt_cache.stats()["hits"] == 4
+
+
+def test_web_utils_context_found_cached() -> None:
+    """Check llms.txt found is cached."""
+    llms_txt_cache = TTLCache(max_entries=10, default_ttl=60)
+    with patch(HTTPX_ASYNC_CLIENT_GET) as mock_get:
+        mock_get.return_value = httpx.Response(
+            200,
+            text=LLMS_DUMY_CONTENT,
+            request=httpx.Request("GET", f"{LLMS_TXT_URL}/llms.txt"),
+        )
+        for _ in range(2):
+            context = asyncio.run(
+                get_additional_context_for_url(LLMS_TXT_URL, __project_name__, llms_txt_cache=llms_txt_cache),
+            )
+            assert context[0].text == LLMS_DUMY_CONTENT
+        assert mock_get.call_count == 1
+
+
+def test_web_utils_robots_and_context_spaced_out_by_scheduler() -> None:
+    """Check robots.txt, llms-full.txt and llms.txt are requested when the scheduler lets them start."""
+    scheduler = HostScheduler(min_interval=1, max_crawl_delay=10)
+
+    def mock_get_side_effect(url, **kwargs):
+        if url.endswith("/robots.txt"):
+            return httpx.Response(200, text="User-agent: *\nAllow: /\n", request=httpx.Request("GET", url))
+        return httpx.Response(404, request=httpx.Request("GET", url))
+
+    async def check_and_get_context() -> list:
+        await _ensure_allowed_to_crawl(f"{LLMS_TXT_URL}/page", __project_name__, scheduler=scheduler)
+        return await get_additional_context_for_url(LLMS_TXT_URL, __project_name__, full=True, scheduler=scheduler)
+
+    with (
+        patch(HTTPX_ASYNC_CLIENT_GET, side_effect=mock_get_side_effect) as mock_get,
+        patch("starbridge.web.scheduler.time") as mock_time,
+        patch("starbridge.web.scheduler.asyncio.sleep") as mock_sleep,
+    ):
+        mock_time.monotonic.return_value = 0.0  # the clock stands still, so each request has to wait
+        assert asyncio.run(check_and_get_context()) == []
+    assert mock_get.call_count == 3
+    assert scheduler.waits == 2
+    assert mock_sleep.call_count == 2
+
+
+def test_web_utils_process_response_parses_html_once() -> None:
+    """Check HTML is parsed once for both transformation to markdown and link extraction."""
+    response = httpx.Response(
+        200,
+        html="<h1>Headline</h1><a href='/a'>A</a><a href='/a'>Again</a>",
+        request=httpx.Request("GET", GET_TEST_URL),
+    )
+    with patch("starbridge.web.utils.BeautifulSoup", wraps=BeautifulSoup) as mock_beautiful_soup:
+        resource, extracted_links = process_response(response)
+        assert mock_beautiful_soup.call_count == 1
+    assert "# Headline" in (resource.text or "")
+    assert extracted_links is not None
+    assert extracted_links[0].occurrences == 2
+    assert extracted_links[0].anchor_texts == ["A", "Again"]
+
+
+def _get_html_fixture_response() -> httpx.Response:
+    return httpx.Response(
+        200,
+        html=HTML_FIXTURE.read_text(encoding="utf-8"),
+        request=httpx.Request("GET", GET_TEST_URL),
+    )
+
+
+@pytest.mark.parametrize("html_parser", list(HtmlParser))
+def test_web_utils_process_response_equivalent_across_html_parsers(html_parser: HtmlParser) -> None:
+    """Check all HTML parsers, falling back if not installed, extract the same links and markdown."""
+    expected_resource, expected_links = process_response(_get_html_fixture_response())
+    resource, extracted_links = process_response(_get_html_fixture_response(), html_parser=html_parser)
+    assert extracted_links == expected_links
+    assert extracted_links is not None
+    urls = {str(link.url) for link in extracted_links}
+    assert "https://starbridge.readthedocs.io/docs/web/" in urls
+    assert "https://starbridge.readthedocs.io/tracking" not in urls
+    assert "https://starbridge.readthedocs.io/template" not in urls
+    assert resource.text is not None
+    assert expected_resource.text is not None
+    assert "# ⭐ Starbridge" in resource.text
+    assert "window.dataLayer" not in resource.text
+    assert resource.text.split() == expected_resource.text.split()
+
+
+def test_web_utils_html_parser_falls_back_if_not_installed() -> None:
+    """Check falling back to html.parser if the requested HTML parser is not installed."""
+    get_available_html_parser.cache_clear()
+    try:
+        with patch("starbridge.web.utils._has_selectolax", False):
+            assert get_available_html_parser(HtmlParser.SELECTOLAX) == HtmlParser.HTML_PARSER
+    finally:
+        get_available_html_parser.cache_clear()
+
+
+@pytest.mark.long_running
+def test_web_utils_html_parsers_benchmark(record_property) -> None:
+    """Benchmark transformation to markdown and link extraction using each available HTML parser."""
+    rounds = 20
+    for html_parser in HtmlParser:
+        if get_available_html_parser(html_parser) != html_parser:
+            continue
+        response = _get_html_fixture_response()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            process_response(response, html_parser=html_parser)
+        record_property(html_parser.value, (time.perf_counter() - started) / rounds)
+
+
+def _get_link_heavy_response(link_count: int) -> httpx.Response:
+    links = "".join(
+        f"<li><a href='/page/{i}'>Page {i}</a> <a href='/page/{i // 2}'>Parent</a></li>" for i in range(link_count)
+    )
+    return httpx.Response(
+        200,
+        html=f"<html><body><ul>{links}</ul></body></html>",
+        request=httpx.Request("GET", GET_TEST_URL),
+    )
+
+
+def test_web_utils_process_response_compact_equivalent() -> None:
+    """Check links extracted in compact representation convert to the same link targets."""
+    response = _get_link_heavy_response(100)
+    resource, extracted_links = process_response(response)
+    compact_resource, compact_links = process_response_compact(response)
+    assert compact_resource == resource
+    assert compact_links is not None
+    assert compact_links[0] == ("https://starbridge.readthedocs.io/page/0", 3, ["Page 0", "Parent"])
+    assert LinkTarget.from_compact(compact_links) == extracted_links
+
+
+@pytest.mark.long_running
+def test_web_utils_compact_links_benchmark(record_property) -> None:
+    """Benchmark passing links of a link-heavy page from a worker process as models vs. compact representation."""
+    rounds = 5
+    response = _get_link_heavy_response(5000)
+    timings = {}
+    for name, process, convert in (
+        ("models", process_response, lambda links: links),
+        ("compact", process_response_compact, LinkTarget.from_compact),
+    ):
+        _, extracted_links = process(response)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            convert(pickle.loads(pickle.dumps(extracted_links)))  # noqa: S301, as when passed from a worker
+        timings[name] = (time.perf_counter() - started) / rounds
+        record_property(name, timings[name])
+    assert timings["compact"] < timings["models"]
+
+
+@pytest.mark.asyncio
+async def test_web_utils_get_respectfully_truncates_per_mime_type() -> None:
+    """Check bodies are cut off at the maximum size for their MIME type, aborting the download."""
+    streamed: list[int] = []
+
+    async def stream_pdf():
+        for _ in range(100):
+            await asyncio.sleep(0)
+            streamed.append(1024)
+            yield b"%" * 1024
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith(".pdf"):
+            return httpx.Response(200, headers={"Content-Type": "application/pdf"}, content=stream_pdf())
+        return httpx.Response(200, html="<h1>Headline</h1>")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pdf = await get_respectfully(
+            url=f"{GET_TEST_URL}large.pdf",
+            user_agent=__project_name__,
+            accept_language="en-US",
+            timeout=5,
+            respect_robots_txt=False,
+            client=client,
+            max_body_size=None,
+            max_body_size_per_mime_type={"application/pdf": 4096},
+        )
+        html = await get_respectfully(
+            url=GET_TEST_URL,
+            user_agent=__project_name__,
+            accept_language="en-US",
+            timeout=5,
+            respect_robots_txt=False,
+            client=client,
+            max_body_size=4096,
+            max_body_size_per_mime_type={"application/pdf": 4096},
+        )
+    assert isinstance(pdf, TruncatedResponse)
+    assert len(pdf.content) == 4096
+    assert len(streamed) < 100
+    resource, _ = process_response(pdf)
+    assert resource.truncated
+    assert resource.blob == pdf.content
+    assert not isinstance(html, TruncatedResponse)
+    resource, _ = process_response(html)
+    assert not resource.truncated
+    assert "# Headline" in (resource.text or "")
+
+
+@pytest.mark.asyncio
+async def test_web_utils_get_respectfully_negotiates_brotli_and_zstd(caplog) -> None:
+    """Check br and zstd are advertised and decompressed while streaming, logging bytes transferred."""
+    html = b"<html><body>" + b"<p>Starbridge</p>" * 1000 + b"</body></html>"
+    accepted: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        accepted.append(request.headers["Accept-Encoding"])
+        encoding = request.url.path.rsplit("/", 1)[-1]
+        content = brotli.compress(html) if encoding == "br" else zstandard.ZstdCompressor().compress(html)
+        return httpx.Response(
+            200,
+            headers={"Content-Type": "text/html", "Content-Encoding": encoding},
+            content=content,
+        )
+
+    caplog.set_level(logging.DEBUG)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        for encoding in ("br", "zstd"):
+            response = await get_respectfully(
+                url=f"{GET_TEST_URL}{encoding}",
+                user_agent=__project_name__,
+                accept_language="en-US",
+                timeout=5,
+                respect_robots_txt=False,
+                client=client,
+            )
+            assert response.content == html
+            assert "Content-Encoding" not in response.headers
+    assert all({"br", "zstd"} <= {value.strip() for value in header.split(",")} for header in accepted)
+    transfers = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Transferred")]
+    assert len(transfers) == 2
+    assert all(
+        f"bytes {encoding}, {len(html)} bytes decompressed" in transfer
+        for encoding, transfer in zip(("br", "zstd"), transfers, strict=True)
+    )
+
+
+@pytest.mark.asyncio
+async def test_web_utils_get_respectfully_hedges_slow_requests_with_adaptive_timeout() -> None:
+    """Check requests not responded to within the latency of the host are hedged, with the timeout adapted."""
+    timeouts: list[float] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"]["read"])
+        if len(timeouts) == 1:
+            await asyncio.sleep(10)
+            return httpx.Response(200, text="slow")
+        return httpx.Response(200, text="fast")
+
+    scheduler = HostScheduler(min_interval=0, max_crawl_delay=10, timeout_multiplier=4, min_timeout=0.5, hedge=True)
+    for _ in range(20):
+        scheduler.record_latency(GET_TEST_URL, 0.05)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response = await get_respectfully(
+            url=GET_TEST_URL,
+            user_agent=__project_name__,
+            accept_language="en-US",
+            timeout=60,
+            respect_robots_txt=False,
+            client=client,
+            scheduler=scheduler,
+        )
+    assert response.text == "fast"
+    assert time.perf_counter() - started < 5
+    assert timeouts == [0.5, 0.5]
+    assert scheduler.stats()["hedges"] == 1
+    assert scheduler.stats()["hedges_won"] == 1
+
+
+@pytest.mark.asyncio
+async def test_web_utils_get_respectfully_honors_crawl_delay_of_uncached_robots_txt() -> None:
+    """Check speculative requests honor the crawl delay of a robots.txt not cached, fetched once at a time."""
+    clock = [0.0]
+    requests: list[tuple[str, float]] = []
+
+    def advance(seconds: float) -> None:
+        clock[0] += seconds
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.url.path, clock[0]))
+        if request.url.path == "/robots.txt":
+            return httpx.Response(
+                200,
+                headers={"Cache-Control": "no-cache"},
+                text="User-agent: *\nCrawl-delay: 2\nAllow: /\n",
+            )
+        return httpx.Response(200, text="page")
+
+    scheduler = HostScheduler(min_interval=0, max_crawl_delay=10)
+    robots_txt_fetches: SingleFlight[RobotsTxt] = SingleFlight()
+    with (
+        patch("starbridge.web.scheduler.time") as mock_time,
+        patch("starbridge.web.scheduler.asyncio.sleep", side_effect=advance),
+    ):
+        mock_time.monotonic.side_effect = lambda: clock[0]
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+
+            def get(path: str):
+                return get_respectfully(
+                    url=f"{GET_TEST_URL}{path}",
+                    user_agent=__project_name__,
+                    accept_language="en-US",
+                    timeout=5,
+                    client=client,
+                    robots_txt_cache=TTLCache(max_entries=10, default_ttl=60),
+                    speculative_fetch=True,
+                    scheduler=scheduler,
+                    robots_txt_fetches=robots_txt_fetches,
+                )
+
+            await asyncio.gather(get("a"), get("b"))
+            await get("c")
+    # the first request is speculative, the concurrent one waits for the robots.txt fetched once,
+    # the next is speculative again, spaced out by the crawl delay recorded, as is robots.txt fetched again
+    assert sorted(requests, key=itemgetter(1, 0)) == [
+        ("/en/latest/a", 0.0),
+        ("/robots.txt", 0.0),
+        ("/en/latest/b", 2.0),
+        ("/en/latest/c", 4.0),
+        ("/robots.txt", 6.0),
+    ]
+    assert robots_txt_fetches.stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_web_utils_get_respectfully_stores_speculative_response_once_allowed(tmp_path: Path) -> None:
+    """Check responses fetched speculatively are stored in the response cache only if robots.txt allows."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            await asyncio.sleep(0.1)  # so the speculative response arrives first
+            return httpx.Response(200, text="User-agent: *\nDisallow: /en/\n")
+        return httpx.Response(200, headers={"Cache-Control": "max-age=60"}, text="page")
+
+    response_cache = ResponseCache(path=tmp_path / "responses.sqlite3", max_bytes=1024, default_ttl=60)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        for url in (GET_TEST_URL, "https://starbridge.readthedocs.io/"):
+            with contextlib.suppress(RobotForbiddenError):
+                await get_respectfully(
+                    url=url,
+                    user_agent=__project_name__,
+                    accept_language="en-US",
+                    timeout=5,
+                    client=client,
+                    speculative_fetch=True,
+                    response_cache=response_cache,
+                )
+    assert not response_cache.is_fresh(ResponseCache.get_key(GET_TEST_URL, "en-US"))
+    assert response_cache.is_fresh(ResponseCache.get_key("https://starbridge.readthedocs.io/", "en-US"))
+    response_cache.close()
+
+
+def test_web_utils_robots_crawl_delay_from_crawl_delay_and_request_rate() -> None:
+    """Check the crawl delay is the larger of Crawl-delay and Request-rate, if given."""
+
+    def get_crawl_delay(text: str) -> float | None:
+        response = httpx.Response(200, text=text, request=httpx.Request("GET", ROBOTS_TXT_URL))
+        return RobotsTxt.from_response(ROBOTS_TXT_URL, response).get_crawl_delay(__project_name__)
+
+    assert get_crawl_delay("User-agent: *\nDisallow: /private/\n") is None
+    assert get_crawl_delay("User-agent: *\nCrawl-delay: 2\n") == 2
+    assert get_crawl_delay("User-agent: *\nCrawl-delay: 2\nRequest-rate: 1/5s\n") == 5
+
+
+def test_web_utils_page_numbers_from_page_ranges() -> None:
+    """Check page ranges select zero-based page numbers in order, ignoring pages beyond the document."""
+    assert get_page_numbers("10-12", 100) == [9, 10, 11]
+    assert get_page_numbers("3, 1,5-", 7) == [0, 2, 4, 5, 6]
+    assert get_page_numbers("2-4,3-5", 100) == [1, 2, 3, 4]
+    assert get_page_numbers("5-500", 6) == [4, 5]
+    for invalid in ("", "0", "a-b", "1-2-3", "-5"):
+        with pytest.raises(ValueError, match="Invalid page range"):
+            get_page_numbers(invalid, 10)
+    with pytest.raises(ValueError, match="select no page"):
+        get_page_numbers("11-20", 10)
+
+
+def _get_excel_response() -> httpx.Response:
+    workbook = Workbook()
+    orders = workbook.active
+    orders.title = "Orders"
+    orders.append(["Customer", "Amount", "Ordered", "Note"])
+    for i in range(1, 11):
+        orders.append([f"Customer {i}", i * 10.5, datetime(2025, 1, i), "paid | shipped" if i % 2 else 3])  # noqa: DTZ001
+    workbook.create_sheet("Empty")
+    summary = workbook.create_sheet("Summary")
+    summary.append([None, "Total"])
+    summary.append(["all", 577.5])
+    content = BytesIO()
+    workbook.save(content)
+    return httpx.Response(
+        200,
+        headers={"Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+        content=content.getvalue(),
+        request=httpx.Request("GET", "https://example.com/orders.xlsx"),
+    )
+
+
+def test_web_utils_excel_sheets_summarized_with_rows_and_columns_capped() -> None:
+    """Check Excel sheets are converted to tables capped in rows and columns, preceded by a summary."""
+    response = _get_excel_response()
+    markdown = convert_excel_sheets(response, None, 4, 3) or ""
+    orders, empty, summary = markdown.split("\n\n## ")
+    assert orders.splitlines() == [
+        "## Orders",
+        "",
+        "Dimensions: 11 rows x 4 columns, showing the first 4 rows and 3 columns",
+        "",
+        "Column types: Customer (text), Amount (number), Ordered (date)",
+        "",
+        "| Customer | Amount | Ordered |",
+        "| --- | --- | --- |",
+        "| Customer 1 | 10.5 | 2025-01-01 |",
+        "| Customer 2 | 21 | 2025-01-02 |",
+        "| Customer 3 | 31.5 | 2025-01-03 |",
+    ]
+    assert empty == "Empty\n\nEmpty sheet."
+    assert "Dimensions: 2 rows x 2 columns\n" in summary
+    assert "Column types: A (text), Total (number)" in summary
+
+    markdown = convert_excel_sheets(response, ["Orders"], None, None) or ""
+    assert markdown.count("| Customer") == 11
+    assert "Note (mixed)" in markdown
+    assert "| paid \\| shipped |" in markdown
+    assert "## Summary" not in markdown
+    with pytest.raises(ValueError, match="Sheets Missing not found"):
+        convert_excel_sheets(response, ["Summary", "Missing"], None, None)